@@ -0,0 +1,448 @@
+"""Configuration, builders and request handlers shared by app.py and asgi_app.py.
+
+Importing this module creates no app, model service or thread, so each
+server entry point builds only what it serves. Handlers that both servers
+expose take plain data and return (status, payload).
+"""
+import hmac
+import os
+
+from feature_schema import FEATURE_SCHEMA, FeatureValidator
+from model_service import ModelService
+from online_learning import OnlineCentroidLearner
+from regional_recommendations import RegionalTable
+from request_profiling import RequestProfiler
+from tiered_inference import InferenceRouter, parse_tiers
+
+def _env_config():
+    """Default configuration, overridable through environment variables"""
+    return {
+        # Model file: crop_model.json or a compiled artifact (.kmdl, see model_artifact.py)
+        'MODEL_PATH': os.environ.get('MODEL_PATH', 'crop_model.json'),
+        # Exported RandomForest used by the 'forest' backend (see forest_engine.py)
+        'FOREST_MODEL_PATH': os.environ.get('FOREST_MODEL_PATH', 'crop_forest.npz'),
+        # Walk forest trees for a single input only until its top crops are decided
+        'FOREST_EARLY_EXIT': parse_flag(os.environ.get('FOREST_EARLY_EXIT', 'false')),
+        # How many leading crops the remaining trees must not be able to reorder
+        'FOREST_EARLY_EXIT_TOP_K': int(os.environ.get('FOREST_EARLY_EXIT_TOP_K', 1)),
+        # Also stop once the leading crop is this far ahead in probability (0: exact bound only).
+        # Any margin above 0 can change answers; see the README for measured rates
+        'FOREST_EARLY_EXIT_MARGIN': float(os.environ.get('FOREST_EARLY_EXIT_MARGIN', 0.0)),
+        # Model backends to serve, fastest first: any of 'rules', 'similarity', 'forest'
+        'ENGINE_TIERS': os.environ.get('ENGINE_TIERS', 'similarity'),
+        # Time a prediction may wait for a slower tier (override per request with ?budget_ms=)
+        'LATENCY_BUDGET_MS': float(os.environ.get('LATENCY_BUDGET_MS', 50)),
+        # Worker threads running the slower tiers; refinements beyond this are shed
+        'TIER_POOL_SIZE': int(os.environ.get('TIER_POOL_SIZE', 4)),
+        # Scoring engine: 'exact' or 'lookup' (precomputed tables, bounded error)
+        'SCORING_ENGINE': os.environ.get('SCORING_ENGINE', 'exact'),
+        'LOOKUP_RESOLUTION': int(os.environ.get('LOOKUP_RESOLUTION', 1000)),
+        # Prediction cache settings (set PREDICTION_CACHE_SIZE=0 to disable caching)
+        'PREDICTION_CACHE_SIZE': int(os.environ.get('PREDICTION_CACHE_SIZE', 4096)),
+        'PREDICTION_CACHE_TTL': float(os.environ.get('PREDICTION_CACHE_TTL', 300)),
+        # When to load the model: 'lazy' (first request), 'background' or 'eager'
+        'WARM_UP': os.environ.get('WARM_UP', 'lazy'),
+        # Seconds between checks of the model file for changes (0 disables watching)
+        'MODEL_WATCH_INTERVAL': float(os.environ.get('MODEL_WATCH_INTERVAL', 2)),
+        # Seconds before a model that failed to load is tried again on the next request (0: never)
+        'MODEL_RETRY_INTERVAL': float(os.environ.get('MODEL_RETRY_INTERVAL', 30)),
+        # Token required by /api/admin/reload (endpoint disabled when unset)
+        'ADMIN_TOKEN': os.environ.get('ADMIN_TOKEN', ''),
+        # JSON encoder/decoder: 'auto' (orjson if installed), 'orjson' or 'std'
+        'JSON_ENGINE': os.environ.get('JSON_ENGINE', 'auto'),
+        # Echo validated inputs back as input_parameters (override per request with ?echo_inputs=false)
+        'ECHO_INPUTS': parse_flag(os.environ.get('ECHO_INPUTS', 'true')),
+        # Regional climate and soil data for location-keyed recommendations (disabled when unset)
+        'REGION_DATA_PATH': os.environ.get('REGION_DATA_PATH', ''),
+        'REGIONAL_MAX_ENTRIES': int(os.environ.get('REGIONAL_MAX_ENTRIES', 200000)),
+        # Seconds between background refreshes of the regional table (0: refresh on lookup only)
+        'REGIONAL_REFRESH_INTERVAL': float(os.environ.get('REGIONAL_REFRESH_INTERVAL', 30)),
+        # Send Server-Timing headers (parse, validate, infer, serialize) on prediction responses
+        'SERVER_TIMING': parse_flag(os.environ.get('SERVER_TIMING', 'true')),
+        # Fraction of prediction requests to profile (admins can also send X-Profile: 1)
+        'PROFILE_SAMPLE_RATE': float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+        # Profiles kept for /api/admin/profiles, and functions kept per profile
+        'PROFILE_BUFFER_SIZE': int(os.environ.get('PROFILE_BUFFER_SIZE', 100)),
+        'PROFILE_TOP_FRAMES': int(os.environ.get('PROFILE_TOP_FRAMES', 20)),
+        # Update the similarity model's crop requirements from POST /api/admin/feedback
+        'ONLINE_LEARNING': parse_flag(os.environ.get('ONLINE_LEARNING', 'false')),
+        # Weight of the current requirements, in observations, against new feedback
+        'ONLINE_PRIOR_WEIGHT': float(os.environ.get('ONLINE_PRIOR_WEIGHT', 20)),
+        # Seconds between checkpoints of learned requirements to the model file (0: on request only)
+        'ONLINE_CHECKPOINT_INTERVAL': float(os.environ.get('ONLINE_CHECKPOINT_INTERVAL', 60)),
+        # Cache-Control max-age (seconds) for /api/crops and /api/crop-info
+        'CATALOG_MAX_AGE': int(os.environ.get('CATALOG_MAX_AGE', 300)),
+    }
+
+def parse_flag(value, default=True):
+    """Interpret a true/false setting or query parameter"""
+    if value is None or value == '':
+        return default
+    return str(value).strip().lower() not in ('0', 'false', 'no', 'off')
+
+# Setting holding the model file of each backend that reads one
+MODEL_PATH_SETTINGS = {
+    'similarity': 'MODEL_PATH',
+    'forest': 'FOREST_MODEL_PATH'
+}
+
+def build_model_service(config, metrics=None, backend='similarity'):
+    """Create the ModelService for one backend described by a configuration mapping"""
+    path_setting = MODEL_PATH_SETTINGS.get(backend)
+    return ModelService(
+        model_path=config[path_setting] if path_setting else None,
+        engine_mode=config['SCORING_ENGINE'],
+        lookup_resolution=config['LOOKUP_RESOLUTION'],
+        cache_size=config['PREDICTION_CACHE_SIZE'],
+        cache_ttl=config['PREDICTION_CACHE_TTL'],
+        watch_interval=config['MODEL_WATCH_INTERVAL'],
+        retry_interval=config['MODEL_RETRY_INTERVAL'],
+        metrics=metrics,
+        backend=backend,
+        early_exit_margin=config['FOREST_EARLY_EXIT_MARGIN'] if config['FOREST_EARLY_EXIT'] else None,
+        early_exit_top_k=config['FOREST_EARLY_EXIT_TOP_K']
+    )
+
+def build_inference_router(config, metrics=None):
+    """Create one ModelService per ENGINE_TIERS entry behind an InferenceRouter"""
+    services = [(backend, build_model_service(config, metrics, backend))
+                for backend in parse_tiers(config['ENGINE_TIERS'])]
+    return InferenceRouter(
+        services,
+        budget_ms=config['LATENCY_BUDGET_MS'],
+        pool_size=config['TIER_POOL_SIZE'],
+        metrics=metrics
+    )
+
+def build_regional_table(config, router, metrics=None):
+    """Create the location-keyed recommendation table in front of router"""
+    table = RegionalTable(
+        router,
+        regions_path=config['REGION_DATA_PATH'],
+        max_entries=config['REGIONAL_MAX_ENTRIES'],
+        refresh_interval=config['REGIONAL_REFRESH_INTERVAL']
+    )
+    if metrics is not None and table.enabled:
+        for key, metric_name, kind, help_text in (
+                ('hits', 'hits_total', 'counter', 'Predictions served from the regional table'),
+                ('misses', 'misses_total', 'counter', 'Regional lookups with no entry'),
+                ('stale', 'stale_total', 'counter', 'Regional lookups whose entry predates the model'),
+                ('size', 'size', 'gauge', 'Entries in the regional table')):
+            metrics.gauge(f'regional_{metric_name}', help_text, lambda key=key: table.stats()[key], kind=kind)
+    return table
+
+def build_profiler(config):
+    return RequestProfiler(
+        sample_rate=config['PROFILE_SAMPLE_RATE'],
+        capacity=config['PROFILE_BUFFER_SIZE'],
+        frames=config['PROFILE_TOP_FRAMES']
+    )
+
+def build_online_learner(config, router):
+    """Create the feedback learner for the similarity tier, or None when disabled"""
+    service = router.services.get('similarity')
+    if not config['ONLINE_LEARNING'] or service is None:
+        return None
+    learner = OnlineCentroidLearner(
+        service,
+        prior_weight=config['ONLINE_PRIOR_WEIGHT'],
+        checkpoint_interval=config['ONLINE_CHECKPOINT_INTERVAL']
+    )
+    learner.start()
+    return learner
+
+def apply_region(regional, data):
+    """Resolve a payload's location.
+
+    Returns (region, data) with missing features filled from the region's
+    defaults, or (None, data) when the location is not a known region.
+    """
+    if not isinstance(data, dict):
+        return None, data
+    region = regional.resolve(data.get('location'))
+    if region is None:
+        return None, data
+    return region, region.complete(data)
+
+def parse_budget(value):
+    """Interpret a ?budget_ms= query parameter. Returns (budget_ms, error)."""
+    if value is None or value == '':
+        return None, None
+    try:
+        budget_ms = float(value)
+    except ValueError:
+        return None, 'budget_ms must be a number'
+    if not (0 <= budget_ms <= 60000):
+        return None, 'budget_ms must be between 0 and 60000'
+    return budget_ms, None
+
+
+def profile_reason(profiler, headers, admin_token):
+    """Why a prediction request should be profiled, or None"""
+    admin_requested = (
+        parse_flag(headers.get('X-Profile'), False)
+        and check_admin_token(headers.get('X-Admin-Token'), admin_token)[0] is None
+    )
+    return profiler.reason(admin_requested)
+
+
+# Input validation is compiled from the declarative schema in feature_schema.py
+VALIDATOR = FeatureValidator(FEATURE_SCHEMA)
+
+FEATURE_COLUMNS = VALIDATOR.names
+
+# Allowed range and error message for each feature, in model input order
+FEATURE_RANGES = [(feature.low, feature.high, feature.message) for feature in FEATURE_SCHEMA]
+
+# Maximum number of parameter sets accepted by /api/predict/batch
+MAX_BATCH_SIZE = 1000
+
+# Maximum number of outcomes accepted by one /api/admin/feedback request
+MAX_FEEDBACK_SIZE = 10000
+
+# Descriptions served by /api/crop-info
+CROP_INFO = {
+    'rice': {
+        'name': 'Rice',
+        'description': 'Staple food crop requiring high water and nitrogen',
+        'optimal_conditions': 'High humidity, moderate temperature, high rainfall'
+    },
+    'maize': {
+        'name': 'Maize',
+        'description': 'Cereal crop with high yield potential',
+        'optimal_conditions': 'Warm temperature, moderate humidity, good rainfall'
+    },
+    'chickpea': {
+        'name': 'Chickpea',
+        'description': 'Protein-rich legume crop',
+        'optimal_conditions': 'Cool temperature, moderate humidity, low rainfall'
+    },
+    'banana': {
+        'name': 'Banana',
+        'description': 'Tropical fruit crop',
+        'optimal_conditions': 'High temperature, high humidity, good rainfall'
+    },
+    'mango': {
+        'name': 'Mango',
+        'description': 'Tropical fruit tree',
+        'optimal_conditions': 'Warm temperature, moderate humidity, seasonal rainfall'
+    },
+    'cotton': {
+        'name': 'Cotton',
+        'description': 'Fiber crop for textile industry',
+        'optimal_conditions': 'High temperature, low humidity, moderate rainfall'
+    }
+}
+
+MODEL_UNAVAILABLE_ERROR = {
+    'error': 'Model not available. Please install required dependencies: pip install scikit-learn pandas numpy joblib'
+}
+
+def validate_parameters(data):
+    """Validate one set of input parameters.
+
+    Returns (features, None) on success or (None, error_message) on failure.
+    """
+    return VALIDATOR.validate(data)
+
+def build_input_parameters(features, location):
+    """Echo validated inputs back in the response format"""
+    input_parameters = dict(zip(FEATURE_COLUMNS, features))
+    input_parameters['location'] = location
+    return input_parameters
+
+
+def run_what_if(router, regional, data):
+    """Score a base input with some features swept over a grid.
+
+    data holds the base input (a known location may fill in features),
+    "sweep" (see what_if.parse_axes) and optionally "crops", "top_k" and
+    "engine" (default: the fastest tier). Returns (status, payload).
+    """
+    # Deferred so app_simple runs without numpy
+    try:
+        import what_if
+    except ImportError:
+        return 503, {'error': 'What-if sweeps require numpy, which this server does not have installed'}
+
+    if not isinstance(data, dict):
+        return 400, {'error': 'Request body must be a JSON object with the base input and a "sweep" list'}
+    region, base = apply_region(regional, data)
+    features, error = validate_parameters(base)
+    if not error:
+        axes, error = what_if.parse_axes(data.get('sweep'))
+    if error:
+        return 400, {'error': error}
+    top_k = data.get('top_k', 3)
+    if not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1:
+        return 400, {'error': 'top_k must be a positive integer'}
+    engine = data.get('engine') or router.tiers[0]
+    if not isinstance(engine, str):
+        return 400, {'error': 'engine must be a string'}
+    service = router.services.get(engine)
+    if service is None:
+        return 400, {'error': f'Unknown engine: {engine}'}
+    
+    model, version = service.get_active()
+    try:
+        crop_names, score = what_if.grid_scorer(model)
+    except ValueError as e:
+        return 400, {'error': str(e)}
+    crops = data.get('crops')
+    if crops is not None:
+        unknown = [crop for crop in crops if crop not in crop_names] if isinstance(crops, list) else [crops]
+        if unknown:
+            return 400, {'error': f'Unknown crops: {", ".join(map(str, unknown))}'}
+    
+    result = {'success': True, 'model_version': version, 'engine': engine}
+    if region is not None:
+        result['region'] = region.name
+    result['input_parameters'] = build_input_parameters(features, data.get('location', ''))
+    result.update(what_if.sweep_grid(crop_names, score, features, axes, top_k, crops))
+    return 200, result
+
+
+def run_amendment(router, regional, data):
+    """Cheapest N/P/K/pH change that makes a crop the recommendation.
+
+    data holds the base input (a known location may fill in features),
+    "crop" and optionally "goal", "target_score", "lead", "features",
+    "costs", "bounds" (see soil_amendment.parse_options) and "engine"
+    (default: similarity). Returns (status, payload).
+    """
+    # Deferred so app_simple runs without numpy
+    try:
+        import soil_amendment
+    except ImportError:
+        return 503, {'error': 'Soil amendments require numpy, which this server does not have installed'}
+
+    if not isinstance(data, dict):
+        return 400, {'error': 'Request body must be a JSON object with the base input and a "crop"'}
+    region, base = apply_region(regional, data)
+    features, error = validate_parameters(base)
+    if error:
+        return 400, {'error': error}
+    engine_name = data.get('engine') or 'similarity'
+    if not isinstance(engine_name, str):
+        return 400, {'error': 'engine must be a string'}
+    service = router.services.get(engine_name)
+    if service is None:
+        return 400, {'error': f'Unknown engine: {engine_name}'}
+
+    model, version = service.get_active()
+    engine = getattr(model, 'engine', None)
+    if engine is None or not hasattr(engine, 'requirements'):
+        return 400, {'error': 'Amendments need the similarity engine, whose score is separable per feature'}
+    options, error = soil_amendment.parse_options(data, engine.crop_names)
+    if error:
+        return 400, {'error': error}
+
+    plan = soil_amendment.optimize_amendment(engine, features, **options)
+    location = data.get('location', '')
+    result = {'success': True, 'model_version': version, 'engine': engine_name, 'crop': options['target'],
+              'goal': options['goal']}
+    if region is not None:
+        result['region'] = region.name
+    result['input_parameters'] = build_input_parameters(features, location)
+    result['before'] = [{'crop': crop, 'score': round(score * 100, 2)} for crop, score in engine.rank(features)]
+    amended = plan.pop('amended', None)
+    result.update(plan)
+    if amended is not None:
+        result['amended_parameters'] = build_input_parameters(amended, location)
+        result['after'] = [{'crop': crop, 'score': round(score * 100, 2)} for crop, score in engine.rank(amended)]
+    return 200, result
+
+
+def check_admin_token(token, expected):
+    """Return an (error, status) pair if an admin request is not allowed"""
+    if not expected:
+        return 'Admin endpoints are disabled. Set ADMIN_TOKEN to enable them.', 404
+    if not hmac.compare_digest(token or '', expected):
+        return 'Invalid admin token', 403
+    return None, None
+
+
+def record_feedback(learner, regional, data):
+    """Validate harvest outcomes and fold them into the learner.
+
+    data is one outcome, a list of outcomes or {"items": [...], "checkpoint": true};
+    each outcome holds the inputs and the "crop" that did well. Returns
+    (status, payload).
+    """
+    if learner is None:
+        return 404, {'error': 'Online learning is disabled. Set ONLINE_LEARNING=true to enable it.'}
+    checkpoint = False
+    if isinstance(data, dict) and 'items' in data:
+        items = data['items']
+        checkpoint = bool(data.get('checkpoint'))
+    else:
+        items = [data] if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return 400, {'error': 'Request body must be an outcome, a JSON array of outcomes or an object with an "items" array'}
+    if len(items) > MAX_FEEDBACK_SIZE:
+        return 413, {'error': f'Too many outcomes: at most {MAX_FEEDBACK_SIZE} allowed'}
+    
+    errors = {}
+    observations = []
+    indices = []
+    for i, item in enumerate(items):
+        region, item = apply_region(regional, item)
+        features, error = validate_parameters(item)
+        if not error and not isinstance(item.get('crop'), str):
+            error = 'Missing required field: crop'
+        if error:
+            errors[i] = error
+        else:
+            observations.append((features, item['crop']))
+            indices.append(i)
+    for j, error in learner.observe_many(observations).items():
+        errors[indices[j]] = error
+    
+    result = {
+        'success': True,
+        'accepted': len(items) - len(errors),
+        'error_count': len(errors),
+        'errors': [{'index': i, 'error': errors[i]} for i in sorted(errors)]
+    }
+    if checkpoint:
+        try:
+            result['model_version'] = learner.checkpoint()
+        except Exception as e:
+            return 500, dict(result, success=False, error=f'Checkpoint failed: {str(e)}')
+    result['pending'] = learner.pending
+    return 200, result
+
+def run_reload(router, data):
+    """Load a new model version for one tier and swap it in.
+
+    data may hold "engine" (default: the fastest tier), "model_path" and
+    "wait". With wait the reload runs in the caller's thread and the
+    payload reports the new version; otherwise it runs in the background
+    and 202 is returned at once. Returns (status, payload).
+    """
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return 400, {'error': 'Request body must be a JSON object'}
+    engine = data.get('engine') or router.tiers[0]
+    if not isinstance(engine, str):
+        return 400, {'error': 'engine must be a string'}
+    service = router.services.get(engine)
+    if service is None:
+        return 400, {'error': f'Unknown engine: {engine}'}
+    if not isinstance(data.get('model_path') or '', str):
+        return 400, {'error': 'model_path must be a string'}
+    model_path = data.get('model_path') or service.model_path
+    if model_path is None:
+        return 400, {'error': f'Engine {engine} has no model file to reload'}
+    if not os.path.exists(model_path):
+        return 400, {'error': f'Model file {model_path} not found'}
+    
+    if not data.get('wait'):
+        service.reload_in_background(model_path)
+        return 202, {'success': True, 'status': 'reloading', 'model_version': service.model_version}
+    try:
+        version = service.reload(model_path)
+    except Exception as e:
+        return 500, {'error': f'Reload failed: {str(e)}', 'model_version': service.model_version}
+    return 200, {'success': True, 'status': 'reloaded', 'model_version': version}
@@ -1,136 +1,309 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify
 from flask_cors import CORS
-import os
+import time
 
-try:
-    from crop_model_simple import CropRecommendationModel
-    MODEL_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: Crop model not available: {e}")
-    MODEL_AVAILABLE = False
+import fast_json
+from api_common import (CROP_INFO, MAX_BATCH_SIZE, MODEL_UNAVAILABLE_ERROR, VALIDATOR, _env_config, apply_region,
+                        build_inference_router, build_input_parameters, build_online_learner, build_profiler,
+                        build_regional_table, check_admin_token, parse_budget, parse_flag, profile_reason,
+                        record_feedback, run_amendment, run_reload, run_what_if, validate_parameters)
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Metrics, StageTimer
+from model_service import ModelUnavailableError
+from request_profiling import server_timing
+from static_responses import ResponseCache
 
-app = Flask(__name__)
-CORS(app)
+api = Blueprint('api', __name__)
 
-# Initialize the model
-crop_model = None
-if MODEL_AVAILABLE:
-    try:
-        crop_model = CropRecommendationModel()
-        
-        # Check if model exists, if not save it
-        model_path = 'crop_model.json'
-        if not os.path.exists(model_path):
-            print("Saving model data...")
-            crop_model.save_model(model_path)
-        else:
-            print("Loading existing model...")
-            crop_model.load_model(model_path)
-    except Exception as e:
-        print(f"Error initializing model: {e}")
-        crop_model = None
-else:
-    print("Model not available - please install required dependencies")
+def create_app(config=None):
+    """Create the Flask application.
+
+    Creating the app does no model I/O. The model is loaded by an explicit
+    warm-up step chosen by the WARM_UP setting; /api/health reports
+    readiness in the meantime.
+    """
+    app = Flask(__name__)
+    CORS(app)
+    app.config.update(_env_config())
+    app.config.update(config or {})
+    
+    json_engine = fast_json.resolve_engine(app.config['JSON_ENGINE'])
+    if json_engine == 'orjson':
+        app.json = fast_json.OrjsonProvider(app)
+    app.extensions['json_engine'] = json_engine
+    app.extensions['response_cache'] = ResponseCache(
+        lambda payload: fast_json.dumps(payload, json_engine), max_age=app.config['CATALOG_MAX_AGE']
+    )
+    
+    metrics = Metrics()
+    router = build_inference_router(app.config, metrics)
+    app.extensions['metrics'] = metrics
+    app.extensions['inference_router'] = router
+    regional = build_regional_table(app.config, router, metrics)
+    app.extensions['regional_table'] = regional
+    app.extensions['profiler'] = build_profiler(app.config)
+    app.extensions['online_learner'] = build_online_learner(app.config, router)
+    # The fastest tier serves the catalog endpoints and health readiness
+    app.extensions['model_service'] = router.primary
+    app.register_blueprint(api)
+    
+    warm_up = app.config['WARM_UP']
+    if warm_up == 'eager':
+        router.warm_up()
+        regional.start()
+    elif warm_up == 'background':
+        router.start_background_warm_up()
+        regional.start()
+    elif warm_up != 'lazy':
+        raise ValueError(f"Unknown WARM_UP mode: {warm_up}")
+    return app
+
+def _service():
+    return current_app.extensions['model_service']
+
+def _router():
+    return current_app.extensions['inference_router']
+
+def _regional():
+    return current_app.extensions['regional_table']
+
+def _metrics():
+    return current_app.extensions['metrics']
+
+# Routes that can be profiled and get Server-Timing headers
+PROFILED_ROUTES = {'/api/predict', '/api/predict/batch'}
+
+@api.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if request.url_rule is not None and request.url_rule.rule in PROFILED_ROUTES:
+        profiler = current_app.extensions['profiler']
+        reason = profile_reason(profiler, request.headers, current_app.config['ADMIN_TOKEN'])
+        if reason:
+            g.profile = profiler.start()
+            g.profile_reason = reason
+
+@api.after_app_request
+def record_request_metrics(response):
+    """Count every response and its latency under its route pattern"""
+    started = g.get('request_started')
+    if started is not None:
+        duration = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        timer = g.get('stage_timer')
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile_id = current_app.extensions['profiler'].finish(
+                profile, route, request.method, response.status_code, g.profile_reason, duration, timer
+            )
+            response.headers['X-Profile-Id'] = str(profile_id)
+        if timer is not None and current_app.config['SERVER_TIMING']:
+            response.headers['Server-Timing'] = server_timing(timer, duration)
+        _metrics().observe_request(route, request.method, response.status_code, duration)
+    return response
+
+@api.teardown_app_request
+def abort_unfinished_profile(exc):
+    """Stop a profile that record_request_metrics never finished, e.g. after an error"""
+    profile = g.pop('profile', None)
+    if profile is not None:
+        current_app.extensions['profiler'].abort(profile)
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/metrics', methods=['GET'])
+def export_metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(_metrics().render(), content_type=METRICS_CONTENT_TYPE)
+
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    service = _service()
+    learner = current_app.extensions['online_learner']
+    if service.ready:
+        status = 'healthy'
+    elif service.state == 'failed':
+        status = 'degraded'
+    else:
+        status = 'starting'
     return jsonify({
-        'status': 'healthy' if crop_model else 'degraded',
+        'status': status,
         'message': 'Crop Recommendation API is running',
-        'model_available': crop_model is not None
+        'model_available': service.ready,
+        'readiness': service.status(),
+        'engines': _router().status(),
+        'regional': _regional().stats(),
+        'online_learning': learner.status() if learner is not None else None,
+        'prediction_cache': service.cache.stats()
     })
 
-@app.route('/api/predict', methods=['POST'])
+@api.route('/api/predict', methods=['POST'])
 def predict_crop():
     """Predict crop recommendation based on input parameters"""
-    if not crop_model:
-        return jsonify({
-            'error': 'Model not available. Please install required dependencies: pip install scikit-learn pandas numpy joblib'
-        }), 503
-    
     try:
+        timer = g.stage_timer = StageTimer()
         data = request.get_json()
+        timer.mark('parse')
         
-        # Validate required fields
-        required_fields = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({
-                    'error': f'Missing required field: {field}'
-                }), 400
-        
-        # Extract features in the correct order
-        features = [
-            data['N'],
-            data['P'], 
-            data['K'],
-            data['temperature'],
-            data['humidity'],
-            data['ph'],
-            data['rainfall']
-        ]
+        # A known location supplies defaults for the features it covers
+        region, data = apply_region(_regional(), data)
+        features, error = validate_parameters(data)
+        if not error:
+            budget_ms, error = parse_budget(request.args.get('budget_ms'))
+        timer.mark('validate')
+        if error:
+            return jsonify({'error': error}), 400
         
         # Get location if provided
         location = data.get('location', '')
         
-        # Validate data types and ranges
-        try:
-            features = [float(f) for f in features]
-        except (ValueError, TypeError):
+        # Make prediction
+        if region is not None:
+            prediction, info = _regional().predict(region, features, lambda f: _router().predict(f, budget_ms))
+        else:
+            prediction, info = _router().predict(features, budget_ms)
+        timer.mark('infer')
+        
+        result = {
+            'success': True,
+            'prediction': prediction,
+            'model_version': info['model_version'],
+            'engine': info['engine']
+        }
+        if info['fallback']:
+            result['fallback'] = True
+        if region is not None:
+            # Scored at the bucket centre, not the inputs sent
+            result['region'] = region.name
+            result['approximate'] = True
+        if parse_flag(request.args.get('echo_inputs'), current_app.config['ECHO_INPUTS']):
+            result['input_parameters'] = build_input_parameters(features, location)
+        response = jsonify(result)
+        timer.mark('serialize')
+        _metrics().observe_stages('/api/predict', timer)
+        return response
+        
+    except ModelUnavailableError:
+        return jsonify(MODEL_UNAVAILABLE_ERROR), 503
+    except Exception as e:
+        return jsonify({
+            'error': f'Prediction failed: {str(e)}'
+        }), 500
+
+@api.route('/api/predict/batch', methods=['POST'])
+def predict_crop_batch():
+    """Predict crop recommendations for many parameter sets in one request.
+
+    Accepts either a JSON array of parameter sets or {"items": [...]}.
+    Each item gets its own result or error; the model runs once over all
+    valid items.
+    """
+    try:
+        timer = g.stage_timer = StageTimer()
+        data = request.get_json()
+        timer.mark('parse')
+        items = data.get('items') if isinstance(data, dict) else data
+        
+        if not isinstance(items, list):
             return jsonify({
-                'error': 'All parameters must be numeric values'
+                'error': 'Request body must be a JSON array of parameter sets or an object with an "items" array'
             }), 400
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({
+                'error': f'Batch too large: at most {MAX_BATCH_SIZE} items allowed'
+            }), 413
+        budget_ms, error = parse_budget(request.args.get('budget_ms'))
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Basic range validation
-        if not (0 <= features[0] <= 200):  # N
-            return jsonify({'error': 'N (Nitrogen) must be between 0 and 200'}), 400
-        if not (0 <= features[1] <= 200):  # P
-            return jsonify({'error': 'P (Phosphorus) must be between 0 and 200'}), 400
-        if not (0 <= features[2] <= 200):  # K
-            return jsonify({'error': 'K (Potassium) must be between 0 and 200'}), 400
-        if not (0 <= features[3] <= 50):  # temperature
-            return jsonify({'error': 'Temperature must be between 0 and 50°C'}), 400
-        if not (0 <= features[4] <= 100):  # humidity
-            return jsonify({'error': 'Humidity must be between 0 and 100%'}), 400
-        if not (0 <= features[5] <= 14):  # ph
-            return jsonify({'error': 'pH must be between 0 and 14'}), 400
-        if not (0 <= features[6] <= 500):  # rainfall
-            return jsonify({'error': 'Rainfall must be between 0 and 500mm'}), 400
+        results = [None] * len(items)
+        regional = _regional()
+        resolved = [apply_region(regional, item) for item in items]
+        regions = [region for region, _ in resolved]
+        items = [item for _, item in resolved]
+        valid_indices, valid_features, errors = VALIDATOR.validate_batch(items)
+        for i, error in errors.items():
+            results[i] = {'success': False, 'error': error}
+        timer.mark('validate')
         
-        # Make prediction
-        prediction = crop_model.predict_crop(features)
+        # Make all predictions not in the regional table in one model call
+        predictions, info = regional.predict_batch(
+            [regions[i] for i in valid_indices], valid_features,
+            lambda features_list: _router().predict_batch(features_list, budget_ms)
+        )
+        timer.mark('infer')
         
-        return jsonify({
+        echo = parse_flag(request.args.get('echo_inputs'), current_app.config['ECHO_INPUTS'])
+        for i, features, prediction in zip(valid_indices, valid_features, predictions):
+            results[i] = {'success': True, 'prediction': prediction}
+            if regions[i] is not None:
+                results[i]['region'] = regions[i].name
+                results[i]['approximate'] = True
+            if echo:
+                results[i]['input_parameters'] = build_input_parameters(features, items[i].get('location', ''))
+        
+        result = {
             'success': True,
-            'prediction': prediction,
-            'input_parameters': {
-                'N': features[0],
-                'P': features[1],
-                'K': features[2],
-                'temperature': features[3],
-                'humidity': features[4],
-                'ph': features[5],
-                'rainfall': features[6],
-                'location': location
-            }
-        })
+            'model_version': info['model_version'],
+            'engine': info['engine'],
+            'count': len(results),
+            'error_count': len(results) - len(valid_indices),
+            'results': results
+        }
+        if info['fallback']:
+            result['fallback'] = True
+        response = jsonify(result)
+        timer.mark('serialize')
+        _metrics().observe_stages('/api/predict/batch', timer)
+        return response
         
+    except ModelUnavailableError:
+        return jsonify(MODEL_UNAVAILABLE_ERROR), 503
     except Exception as e:
         return jsonify({
-            'error': f'Prediction failed: {str(e)}'
+            'error': f'Batch prediction failed: {str(e)}'
         }), 500
 
-@app.route('/api/crops', methods=['GET'])
+@api.route('/api/what-if', methods=['POST'])
+def what_if_sweep():
+    """Per-crop score curves and top-crop changes as features are swept over a grid"""
+    try:
+        status, payload = run_what_if(_router(), _regional(), request.get_json(silent=True))
+    except ModelUnavailableError:
+        return jsonify(MODEL_UNAVAILABLE_ERROR), 503
+    except Exception as e:
+        return jsonify({'error': f'What-if sweep failed: {str(e)}'}), 500
+    return jsonify(payload), status
+
+@api.route('/api/amendment', methods=['POST'])
+def soil_amendment_plan():
+    """Cheapest soil amendment that makes the requested crop the top recommendation"""
+    try:
+        status, payload = run_amendment(_router(), _regional(), request.get_json(silent=True))
+    except ModelUnavailableError:
+        return jsonify(MODEL_UNAVAILABLE_ERROR), 503
+    except Exception as e:
+        return jsonify({'error': f'Amendment search failed: {str(e)}'}), 500
+    return jsonify(payload), status
+
+def prebuilt_response(name, version, build):
+    """Serve a response built once per version, with ETag, 304 and precompressed variants"""
+    prebuilt = current_app.extensions['response_cache'].get(name, version, build)
+    status, headers, body = prebuilt.respond(
+        request.headers.get('If-None-Match'), request.headers.get('Accept-Encoding')
+    )
+    return current_app.response_class(body, status=status, headers=headers, mimetype='application/json')
+
+@api.route('/api/crops', methods=['GET'])
 def get_available_crops():
     """Get list of available crops that can be recommended"""
-    if not crop_model:
+    try:
+        crop_model, version = _service().get_active()
+    except ModelUnavailableError:
         return jsonify({
             'error': 'Model not available. Please install required dependencies.'
         }), 503
     
     try:
-        return jsonify({
+        return prebuilt_response('crops', version, lambda: {
             'success': True,
             'crops': crop_model.crop_labels
         })
@@ -139,54 +312,77 @@ def get_available_crops():
             'error': f'Failed to get crops: {str(e)}'
         }), 500
 
-@app.route('/api/crop-info', methods=['GET'])
+@api.route('/api/crop-info', methods=['GET'])
 def get_crop_info():
     """Get information about different crops"""
-    crop_info = {
-        'rice': {
-            'name': 'Rice',
-            'description': 'Staple food crop requiring high water and nitrogen',
-            'optimal_conditions': 'High humidity, moderate temperature, high rainfall'
-        },
-        'maize': {
-            'name': 'Maize',
-            'description': 'Cereal crop with high yield potential',
-            'optimal_conditions': 'Warm temperature, moderate humidity, good rainfall'
-        },
-        'chickpea': {
-            'name': 'Chickpea',
-            'description': 'Protein-rich legume crop',
-            'optimal_conditions': 'Cool temperature, moderate humidity, low rainfall'
-        },
-        'banana': {
-            'name': 'Banana',
-            'description': 'Tropical fruit crop',
-            'optimal_conditions': 'High temperature, high humidity, good rainfall'
-        },
-        'mango': {
-            'name': 'Mango',
-            'description': 'Tropical fruit tree',
-            'optimal_conditions': 'Warm temperature, moderate humidity, seasonal rainfall'
-        },
-        'cotton': {
-            'name': 'Cotton',
-            'description': 'Fiber crop for textile industry',
-            'optimal_conditions': 'High temperature, low humidity, moderate rainfall'
-        }
-    }
+    # CROP_INFO does not depend on the model, so it is built only once
+    return prebuilt_response('crop-info', None, lambda: {
+        'success': True,
+        'crop_info': CROP_INFO
+    })
+
+@api.route('/api/admin/profiles', methods=['GET'])
+def get_profiles():
+    """Recent request profiles, newest first (?limit=N)"""
+    error, status = check_admin_token(request.headers.get('X-Admin-Token'), current_app.config['ADMIN_TOKEN'])
+    if error:
+        return jsonify({'error': error}), status
     
+    profiler = current_app.extensions['profiler']
+    limit = request.args.get('limit', type=int)
     return jsonify({
         'success': True,
-        'crop_info': crop_info
+        'profiler': profiler.stats(),
+        'profiles': profiler.recent(limit)
     })
 
+@api.route('/api/admin/feedback', methods=['POST'])
+def submit_feedback():
+    """Fold harvest outcomes into the similarity model's crop requirements"""
+    error, status = check_admin_token(request.headers.get('X-Admin-Token'), current_app.config['ADMIN_TOKEN'])
+    if error:
+        return jsonify({'error': error}), status
+    
+    try:
+        status, payload = record_feedback(
+            current_app.extensions['online_learner'], _regional(), request.get_json(silent=True)
+        )
+    except ModelUnavailableError:
+        return jsonify(MODEL_UNAVAILABLE_ERROR), 503
+    return jsonify(payload), status
+
+@api.route('/api/admin/reload', methods=['POST'])
+def reload_model():
+    """Load a new model version in the background and swap it in.
+
+    Optional JSON body: {"engine": "...", "model_path": "...", "wait": true}.
+    engine picks the tier to reload (default: the fastest). With wait the
+    response is sent after the swap; otherwise 202 is returned at once.
+    """
+    error, status = check_admin_token(request.headers.get('X-Admin-Token'), current_app.config['ADMIN_TOKEN'])
+    if error:
+        return jsonify({'error': error}), status
+    
+    status, payload = run_reload(_router(), request.get_json(silent=True))
+    return jsonify(payload), status
+
 if __name__ == '__main__':
+    # WSGI servers import the app from wsgi.py
+    app = create_app()
     print("Starting Crop Recommendation API...")
+    app.extensions['inference_router'].warm_up()
     print("API will be available at: http://localhost:5000")
     print("Available endpoints:")
     print("- GET  /api/health")
     print("- POST /api/predict")
+    print("- POST /api/predict/batch")
+    print("- POST /api/what-if")
+    print("- POST /api/amendment")
     print("- GET  /api/crops")
     print("- GET  /api/crop-info")
+    print("- GET  /metrics")
+    print("- POST /api/admin/reload")
+    print("- GET  /api/admin/profiles")
+    print("- POST /api/admin/feedback")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
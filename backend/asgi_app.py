@@ -0,0 +1,423 @@
+"""Async (ASGI) serving mode with dynamic micro-batching.
+
+Exposes the same routes as app.py. Concurrent /api/predict requests are
+collected into micro-batches (see micro_batching.py) and scored with one
+vectorized model call per batch. Batch sizes and queue waits are reported
+by /api/batching and in /api/health. Each micro-batch goes through the
+tiered InferenceRouter with the deployment LATENCY_BUDGET_MS; a request
+that sets ?budget_ms= is scored on its own with that budget.
+
+Run with:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import os
+import time
+import urllib.parse
+
+import fast_json
+from api_common import (CROP_INFO, MAX_BATCH_SIZE, MODEL_UNAVAILABLE_ERROR, VALIDATOR, _env_config, apply_region,
+                        build_input_parameters, build_inference_router, build_online_learner, build_profiler,
+                        build_regional_table, check_admin_token, parse_budget, parse_flag, profile_reason,
+                        record_feedback, run_amendment, run_reload, run_what_if, validate_parameters)
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Metrics, StageTimer
+from micro_batching import MicroBatcher
+from model_service import ModelUnavailableError
+from request_profiling import server_timing
+from static_responses import PrebuiltResponse, ResponseCache
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'Content-Type, X-Admin-Token, X-Profile, If-None-Match'),
+    (b'access-control-expose-headers', b'ETag, Server-Timing, X-Profile-Id'),
+    (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+]
+
+
+def _batching_config():
+    return {
+        'MICROBATCH_MAX_SIZE': int(os.environ.get('MICROBATCH_MAX_SIZE', 64)),
+        'MICROBATCH_MAX_WAIT_MS': float(os.environ.get('MICROBATCH_MAX_WAIT_MS', 2)),
+    }
+
+
+class AsgiApp:
+    """Minimal ASGI application serving the crop recommendation API"""
+
+    def __init__(self, config=None):
+        self.config = _env_config()
+        self.config.update(_batching_config())
+        self.config.update(config or {})
+        self.json_engine = fast_json.resolve_engine(self.config['JSON_ENGINE'])
+        self.response_cache = ResponseCache(
+            lambda payload: fast_json.dumps(payload, self.json_engine), max_age=self.config['CATALOG_MAX_AGE']
+        )
+        self.metrics = Metrics()
+        self.router = build_inference_router(self.config, self.metrics)
+        self.service = self.router.primary
+        self.regional = build_regional_table(self.config, self.router, self.metrics)
+        self.profiler = build_profiler(self.config)
+        self.learner = build_online_learner(self.config, self.router)
+        self.batcher = MicroBatcher(
+            self._predict_micro_batch,
+            max_batch_size=self.config['MICROBATCH_MAX_SIZE'],
+            max_wait_ms=self.config['MICROBATCH_MAX_WAIT_MS']
+        )
+        for key, metric_name, kind, help_text in (
+                ('batches', 'microbatch_batches_total', 'counter', 'Micro-batches scored'),
+                ('items', 'microbatch_items_total', 'counter', 'Requests scored through micro-batches'),
+                ('queued', 'microbatch_queued', 'gauge', 'Requests waiting for a micro-batch'),
+                ('mean_batch_size', 'microbatch_mean_size', 'gauge', 'Mean micro-batch size')):
+            self.metrics.gauge(metric_name, help_text, lambda key=key: self.batcher.stats()[key], kind=kind)
+        self.routes = {
+            ('GET', '/api/health'): self.health_check,
+            ('GET', '/api/batching'): self.batching_stats,
+            ('POST', '/api/predict'): self.predict_crop,
+            ('POST', '/api/predict/batch'): self.predict_crop_batch,
+            ('POST', '/api/what-if'): self.what_if_sweep,
+            ('POST', '/api/amendment'): self.soil_amendment_plan,
+            ('GET', '/api/crops'): self.get_available_crops,
+            ('GET', '/api/crop-info'): self.get_crop_info,
+            ('POST', '/api/admin/reload'): self.reload_model,
+            ('GET', '/api/admin/profiles'): self.get_profiles,
+            ('POST', '/api/admin/feedback'): self.submit_feedback,
+            ('GET', '/metrics'): self.export_metrics,
+        }
+        # Routes whose per-stage timings are recorded and which can be profiled
+        self.timed_routes = {'/api/predict', '/api/predict/batch'}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        started = time.perf_counter()
+        method = scope['method']
+        path = scope['path'].rstrip('/') or '/'
+        if method == 'OPTIONS':
+            await self._send(send, 200, b'')
+            return
+        handler = self.routes.get((method, path))
+        if handler is None:
+            known_path = any(route_path == path for _, route_path in self.routes)
+            status = 405 if known_path else 404
+            await self._send_json(send, status, {'error': 'Method not allowed' if known_path else 'Not found'})
+            self.metrics.observe_request(path if known_path else 'unmatched', method, status,
+                                         time.perf_counter() - started)
+            return
+
+        status = await self._dispatch(scope, receive, send, method, path, handler, started)
+        self.metrics.observe_request(path, method, status, time.perf_counter() - started)
+
+    async def _dispatch(self, scope, receive, send, method, path, handler, started):
+        """Run a matched route and send its response; returns the status code"""
+        headers = dict(scope.get('headers') or [])
+        if path.startswith('/api/admin/'):
+            token = headers.get(b'x-admin-token', b'').decode('latin-1')
+            error, status = check_admin_token(token, self.config['ADMIN_TOKEN'])
+            if error:
+                await self._send_json(send, status, {'error': error})
+                return status
+
+        query = urllib.parse.parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        profile = reason = None
+        if path in self.timed_routes:
+            reason = profile_reason(self.profiler, {
+                'X-Profile': headers.get(b'x-profile', b'').decode('latin-1'),
+                'X-Admin-Token': headers.get(b'x-admin-token', b'').decode('latin-1')
+            }, self.config['ADMIN_TOKEN'])
+            if reason:
+                # Profiles the event loop until the response is sent, other requests included
+                profile = self.profiler.start()
+
+        try:
+            try:
+                if method == 'POST':
+                    timer = StageTimer()
+                    body = await self._read_body(receive)
+                    try:
+                        data = fast_json.loads(body, self.json_engine) if body else None
+                    except ValueError:
+                        status, payload = 400, {'error': 'Request body must be valid JSON'}
+                    else:
+                        timer.mark('parse')
+                        status, payload = await handler(data, timer, query)
+                else:
+                    timer = None
+                    status, payload = await handler(query)
+
+                content_type = b'application/json'
+                extra_headers = {}
+                if isinstance(payload, PrebuiltResponse):
+                    status, extra_headers, body = payload.respond(
+                        headers.get(b'if-none-match', b'').decode('latin-1'),
+                        headers.get(b'accept-encoding', b'').decode('latin-1')
+                    )
+                elif isinstance(payload, str):
+                    body, content_type = payload.encode('utf-8'), METRICS_CONTENT_TYPE.encode()
+                else:
+                    body = fast_json.dumps(payload, self.json_engine)
+                    if path in self.timed_routes:
+                        timer.mark('serialize')
+                        self.metrics.observe_stages(path, timer)
+                        duration = time.perf_counter() - started
+                        if profile is not None:
+                            # Cleared first so the finally below never releases it twice
+                            recorded, profile = profile, None
+                            profile_id = self.profiler.finish(recorded, path, method, status, reason, duration, timer)
+                            extra_headers['X-Profile-Id'] = str(profile_id)
+                        if self.config['SERVER_TIMING']:
+                            extra_headers['Server-Timing'] = server_timing(timer, duration)
+            except Exception as e:
+                # An unexpected handler error still gets a JSON body, CORS headers and a metrics entry
+                status, content_type, extra_headers = 500, b'application/json', {}
+                body = fast_json.dumps({'error': f'Internal server error: {str(e)}'}, self.json_engine)
+            await self._send(send, status, body, content_type, extra_headers)
+            return status
+        finally:
+            # A handler error, cancellation or failed send must not leave the profiler running
+            if profile is not None:
+                self.profiler.abort(profile)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Warm up before accepting traffic
+                await asyncio.get_running_loop().run_in_executor(None, self.router.warm_up)
+                self.regional.start()
+                self.batcher.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.batcher.stop()
+                self.router.stop_watching()
+                self.regional.stop()
+                if self.learner is not None:
+                    self.learner.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def health_check(self, query):
+        service = self.service
+        if service.ready:
+            status = 'healthy'
+        elif service.state == 'failed':
+            status = 'degraded'
+        else:
+            status = 'starting'
+        return 200, {
+            'status': status,
+            'message': 'Crop Recommendation API is running',
+            'model_available': service.ready,
+            'readiness': service.status(),
+            'engines': self.router.status(),
+            'regional': self.regional.stats(),
+            'online_learning': self.learner.status() if self.learner is not None else None,
+            'prediction_cache': service.cache.stats(),
+            'batching': self.batcher.stats()
+        }
+
+    async def batching_stats(self, query):
+        return 200, {'success': True, 'batching': self.batcher.stats()}
+
+    async def export_metrics(self, query):
+        return 200, self.metrics.render()
+
+    def _echo_inputs(self, query):
+        return parse_flag(query.get('echo_inputs', [None])[-1], self.config['ECHO_INPUTS'])
+
+    def _predict_micro_batch(self, features_list):
+        """Score a micro-batch; every item carries the tier info of the batch"""
+        predictions, info = self.router.predict_batch(features_list)
+        return [(prediction, info) for prediction in predictions]
+
+    def _budget(self, query):
+        return parse_budget(query.get('budget_ms', [None])[-1])
+
+    async def predict_crop(self, data, timer, query):
+        """Predict one input from the regional table or through the micro-batcher"""
+        region, data = apply_region(self.regional, data)
+        features, error = validate_parameters(data)
+        if not error:
+            budget_ms, error = self._budget(query)
+        timer.mark('validate')
+        if error:
+            return 400, {'error': error}
+        key = entry = None
+        scored = features
+        if region is not None:
+            key, entry = self.regional.lookup(region, features)
+            # A missing entry is scored on its bucket centre, then stored
+            scored = self.regional.center(key[1])
+        try:
+            if entry is not None:
+                prediction, info = entry
+            elif budget_ms is None:
+                prediction, info = await self.batcher.submit(scored)
+            else:
+                prediction, info = await asyncio.get_running_loop().run_in_executor(
+                    None, self.router.predict, scored, budget_ms
+                )
+        except ModelUnavailableError:
+            return 503, MODEL_UNAVAILABLE_ERROR
+        except Exception as e:
+            return 500, {'error': f'Prediction failed: {str(e)}'}
+        if key is not None and entry is None:
+            self.regional.put(key, prediction, info)
+        # Includes the wait for the micro-batch to close
+        timer.mark('infer')
+        result = {
+            'success': True,
+            'prediction': prediction,
+            'model_version': info['model_version'],
+            'engine': info['engine']
+        }
+        if info['fallback']:
+            result['fallback'] = True
+        if region is not None:
+            # Scored at the bucket centre, not the inputs sent
+            result['region'] = region.name
+            result['approximate'] = True
+        if self._echo_inputs(query):
+            result['input_parameters'] = build_input_parameters(features, data.get('location', ''))
+        return 200, result
+
+    async def predict_crop_batch(self, data, timer, query):
+        """Predict an explicit batch; it is already vectorized, so skip the batcher"""
+        items = data.get('items') if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return 400, {
+                'error': 'Request body must be a JSON array of parameter sets or an object with an "items" array'
+            }
+        if len(items) > MAX_BATCH_SIZE:
+            return 413, {'error': f'Batch too large: at most {MAX_BATCH_SIZE} items allowed'}
+        budget_ms, error = self._budget(query)
+        if error:
+            return 400, {'error': error}
+
+        results = [None] * len(items)
+        resolved = [apply_region(self.regional, item) for item in items]
+        regions = [region for region, _ in resolved]
+        items = [item for _, item in resolved]
+        valid_indices, valid_features, errors = VALIDATOR.validate_batch(items)
+        for i, error in errors.items():
+            results[i] = {'success': False, 'error': error}
+        timer.mark('validate')
+
+        try:
+            predictions, info = await asyncio.get_running_loop().run_in_executor(
+                None, self.regional.predict_batch, [regions[i] for i in valid_indices], valid_features,
+                lambda features_list: self.router.predict_batch(features_list, budget_ms)
+            )
+        except ModelUnavailableError:
+            return 503, MODEL_UNAVAILABLE_ERROR
+        except Exception as e:
+            return 500, {'error': f'Batch prediction failed: {str(e)}'}
+        timer.mark('infer')
+
+        echo = self._echo_inputs(query)
+        for i, features, prediction in zip(valid_indices, valid_features, predictions):
+            results[i] = {'success': True, 'prediction': prediction}
+            if regions[i] is not None:
+                results[i]['region'] = regions[i].name
+                results[i]['approximate'] = True
+            if echo:
+                results[i]['input_parameters'] = build_input_parameters(features, items[i].get('location', ''))
+        result = {
+            'success': True,
+            'model_version': info['model_version'],
+            'engine': info['engine'],
+            'count': len(results),
+            'error_count': len(results) - len(valid_indices),
+            'results': results
+        }
+        if info['fallback']:
+            result['fallback'] = True
+        return 200, result
+
+    async def what_if_sweep(self, data, timer, query):
+        """Score a swept grid of inputs off the event loop"""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, run_what_if, self.router, self.regional, data
+            )
+        except ModelUnavailableError:
+            return 503, MODEL_UNAVAILABLE_ERROR
+        except Exception as e:
+            return 500, {'error': f'What-if sweep failed: {str(e)}'}
+
+    async def soil_amendment_plan(self, data, timer, query):
+        """Search for the cheapest amendment off the event loop"""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, run_amendment, self.router, self.regional, data
+            )
+        except ModelUnavailableError:
+            return 503, MODEL_UNAVAILABLE_ERROR
+        except Exception as e:
+            return 500, {'error': f'Amendment search failed: {str(e)}'}
+
+    async def get_available_crops(self, query):
+        try:
+            crop_model, version = await asyncio.get_running_loop().run_in_executor(None, self.service.get_active)
+        except ModelUnavailableError:
+            return 503, {'error': 'Model not available. Please install required dependencies.'}
+        return 200, self.response_cache.get('crops', version, lambda: {
+            'success': True, 'crops': crop_model.crop_labels
+        })
+
+    async def get_crop_info(self, query):
+        return 200, self.response_cache.get('crop-info', None, lambda: {'success': True, 'crop_info': CROP_INFO})
+
+    async def get_profiles(self, query):
+        """Recent request profiles, newest first (?limit=N)"""
+        try:
+            limit = int(query.get('limit', [0])[-1]) or None
+        except ValueError:
+            limit = None
+        return 200, {'success': True, 'profiler': self.profiler.stats(), 'profiles': self.profiler.recent(limit)}
+
+    async def submit_feedback(self, data, timer, query):
+        """Fold harvest outcomes into the similarity model off the event loop"""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, record_feedback, self.learner, self.regional, data
+            )
+        except ModelUnavailableError:
+            return 503, MODEL_UNAVAILABLE_ERROR
+
+    async def reload_model(self, data, timer, query):
+        """Load a new model version off the event loop and swap it in"""
+        return await asyncio.get_running_loop().run_in_executor(None, run_reload, self.router, data)
+
+    async def _read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def _send_json(self, send, status, payload):
+        await self._send(send, status, fast_json.dumps(payload, self.json_engine), b'application/json')
+
+    async def _send(self, send, status, body, content_type=b'text/plain', extra_headers=None):
+        headers = [(b'content-type', content_type), (b'content-length', str(len(body)).encode())]
+        for name, value in (extra_headers or {}).items():
+            headers.append((name.lower().encode('latin-1'), value.encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers + CORS_HEADERS})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def create_asgi_app(config=None):
+    return AsgiApp(config)
+
+
+app = create_asgi_app()
+
+if __name__ == '__main__':
+    import uvicorn
+    print("Starting Crop Recommendation API (ASGI, micro-batching)...")
+    uvicorn.run(app, host='0.0.0.0', port=5000)
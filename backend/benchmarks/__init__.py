@@ -0,0 +1,6 @@
+"""Performance benchmarks for the models and the API.
+
+Run from the backend directory:
+    python -m benchmarks.run                  # all suites, compared to baseline.json
+    python -m benchmarks.run --save-baseline  # record a new baseline
+"""
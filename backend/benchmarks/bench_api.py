@@ -0,0 +1,63 @@
+"""Endpoint latency percentiles and throughput through the Flask test client.
+
+Measures the request path in-process (routing, validation, model, JSON),
+without a network or WSGI server in between.
+"""
+import os
+import tempfile
+import time
+
+from benchmarks.bench_models import random_inputs
+from benchmarks.harness import latency_summary, quiet
+
+FEATURE_COLUMNS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+REQUESTS = 2000
+QUICK_REQUESTS = 300
+WARM_UP_REQUESTS = 50
+
+
+def _timed_requests(send, n):
+    samples = []
+    started = time.perf_counter()
+    for i in range(n):
+        request_started = time.perf_counter()
+        response = send(i)
+        samples.append(time.perf_counter() - request_started)
+        if response.status_code != 200:
+            raise RuntimeError(f"Benchmark request failed with status {response.status_code}")
+    return latency_summary(samples, time.perf_counter() - started)
+
+
+def run(quick=False):
+    from app import create_app
+
+    n = QUICK_REQUESTS if quick else REQUESTS
+    bodies = [dict(zip(FEATURE_COLUMNS, features)) for features in random_inputs(n, seed=2)]
+    repeated = bodies[0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with quiet():
+            app = create_app({
+                'MODEL_PATH': os.path.join(tmp, 'crop_model.json'),
+                'WARM_UP': 'eager',
+                'MODEL_WATCH_INTERVAL': 0,
+            })
+        client = app.test_client()
+        cache = app.extensions['model_service'].cache
+
+        endpoints = {
+            # Distinct inputs: every request runs the model
+            'api/predict': lambda i: client.post('/api/predict', json=bodies[i]),
+            # One input: served from the prediction cache after the first request
+            'api/predict_cached': lambda i: client.post('/api/predict', json=repeated),
+            'api/crops': lambda i: client.get('/api/crops'),
+            'api/crop-info': lambda i: client.get('/api/crop-info'),
+        }
+        results = {}
+        for name, send in endpoints.items():
+            for i in range(WARM_UP_REQUESTS):
+                send(i)
+            cache.clear()
+            results[name] = _timed_requests(send, n)
+        return results
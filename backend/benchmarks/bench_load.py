@@ -0,0 +1,89 @@
+"""Model load time and memory footprint for every model file format.
+
+load_ms covers reading the file; first_prediction_ms covers building the
+scoring engine on first use. Memory is the Python heap allocated by load
+plus first prediction (tracemalloc peak, which includes NumPy buffers but
+not memory-mapped file pages), alongside the size of the file itself.
+"""
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.harness import quiet
+
+LOADS = 7
+QUICK_LOADS = 3
+
+WARM_UP_FEATURES = [60, 30, 30, 25, 60, 6.5, 150]
+
+
+def measure_load(factory, filepath, loads):
+    """Median load and first-prediction time, and peak traced memory"""
+    load_times = []
+    first_prediction_times = []
+    for _ in range(loads):
+        model = factory()
+        started = time.perf_counter()
+        with quiet():
+            model.load_model(filepath)
+        loaded = time.perf_counter()
+        model.predict_crop(WARM_UP_FEATURES)
+        load_times.append(loaded - started)
+        first_prediction_times.append(time.perf_counter() - loaded)
+
+    tracemalloc.start()
+    try:
+        model = factory()
+        with quiet():
+            model.load_model(filepath)
+        model.predict_crop(WARM_UP_FEATURES)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'load_ms': statistics.median(load_times) * 1000,
+        'first_prediction_ms': statistics.median(first_prediction_times) * 1000,
+        'peak_heap_bytes': peak,
+        'file_bytes': os.path.getsize(filepath)
+    }
+
+
+def run(quick=False):
+    from crop_model_simple import CropRecommendationModel as SimilarityModel
+    import crop_model
+    from forest_engine import ForestModel
+
+    loads = QUICK_LOADS if quick else LOADS
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        similarity = SimilarityModel(deterministic=True)
+        with quiet():
+            similarity.save_model(os.path.join(tmp, 'crop_model.json'))
+            similarity.save_artifact(os.path.join(tmp, 'crop_model.kmdl'))
+        for engine_mode in ('exact', 'lookup'):
+            def factory():
+                return SimilarityModel(deterministic=True, engine_mode=engine_mode)
+            for name in ('crop_model.json', 'crop_model.kmdl'):
+                results[f'load/similarity/{engine_mode}/{name}'] = measure_load(
+                    factory, os.path.join(tmp, name), loads
+                )
+
+        if not crop_model.training_dependencies_available():
+            print("Skipping forest load benchmarks: pandas, scikit-learn and joblib are required to train")
+            return results
+
+        forest = crop_model.CropRecommendationModel()
+        with quiet():
+            forest.train_model(n_samples=2200, n_jobs=-1)
+            forest.save_model(os.path.join(tmp, 'crop_model.pkl'))
+            forest.export_forest(os.path.join(tmp, 'crop_forest.npz'))
+            forest.save_artifact(os.path.join(tmp, 'crop_forest.kmdl'))
+        results['load/forest/crop_model.pkl'] = measure_load(
+            crop_model.CropRecommendationModel, os.path.join(tmp, 'crop_model.pkl'), loads
+        )
+        for name in ('crop_forest.npz', 'crop_forest.kmdl'):
+            results[f'load/forest/{name}'] = measure_load(ForestModel, os.path.join(tmp, name), loads)
+    return results
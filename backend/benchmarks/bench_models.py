@@ -0,0 +1,166 @@
+"""Microbenchmarks for the similarity model and the RandomForest model.
+
+- predict_crop and calculate_similarity on the similarity model
+- predict_batch on both models at batch sizes from 1 to 100k
+- forest predict_crop with early exit, over inputs drawn like the training data
+- scoring against synthetic crop catalogs of 22 to 10k crops
+
+The forest's catalog is fixed by its training data, so only the similarity
+model is swept over catalog sizes.
+"""
+import numpy as np
+
+from benchmarks.harness import quiet, time_call
+from crop_model_simple import CropRecommendationModel as SimilarityModel
+from lookup_engine import FEATURE_RANGES
+from similarity_engine import SimilarityEngine
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+CATALOG_SIZES = [22, 100, 1000, 10000]
+QUICK_BATCH_SIZES = [1, 100, 10000]
+QUICK_CATALOG_SIZES = [22, 1000]
+
+# Inputs scored against each catalog size
+CATALOG_BATCH = 100
+
+# (top_k, margin) settings timed for forest early exit, and the single inputs it is timed over
+EARLY_EXIT_SETTINGS = [(1, 0.0), (3, 0.0), (1, 0.3), (1, 0.5)]
+EARLY_EXIT_INPUTS = 200
+
+
+def random_inputs(n, seed=0):
+    """n feature vectors drawn uniformly from the API's accepted ranges"""
+    rng = np.random.default_rng(seed)
+    low = [lo for lo, _ in FEATURE_RANGES]
+    high = [hi for _, hi in FEATURE_RANGES]
+    return rng.uniform(low, high, size=(n, len(FEATURE_RANGES))).round(2).tolist()
+
+
+def synthetic_catalog(n_crops, seed=0):
+    """Crop requirements for n_crops crops, jittered copies of the built-in 22"""
+    base = SimilarityModel().crop_requirements
+    names = list(base)
+    requirements = np.asarray([base[name] for name in names], dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    picks = np.arange(n_crops) % len(names)
+    jitter = rng.normal(0.0, [5, 5, 5, 1, 5, 0.2, 10], size=(n_crops, requirements.shape[1]))
+    jitter[:len(names)] = 0.0
+    rows = np.maximum(0.0, requirements[picks] + jitter)
+    return {f'{names[p]}_{i}' if i >= len(names) else names[p]: row.tolist()
+            for i, (p, row) in enumerate(zip(picks, rows))}
+
+
+def sample_inputs(n, seed=0):
+    """n feature vectors drawn around the sample crops' requirements, like the training data"""
+    from crop_model import SAMPLE_CROP_REQUIREMENTS, SAMPLE_NOISE_STD
+    rng = np.random.default_rng(seed)
+    requirements = np.asarray(list(SAMPLE_CROP_REQUIREMENTS.values()), dtype=np.float64)
+    centres = requirements[rng.integers(0, len(requirements), n)]
+    return np.maximum(0.0, centres + rng.normal(0.0, SAMPLE_NOISE_STD, centres.shape)).tolist()
+
+
+def _repeat_for(n):
+    return 5 if n <= 10000 else 3
+
+
+def bench_similarity_model(batch_sizes):
+    results = {}
+    inputs = random_inputs(max(batch_sizes))
+    model = SimilarityModel(deterministic=True)
+    requirements = model.crop_requirements['rice']
+
+    median, best = time_call(lambda: model.calculate_similarity(inputs[0], requirements))
+    results['similarity/calculate_similarity'] = {'median_us': median * 1e6, 'best_us': best * 1e6}
+
+    median, best = time_call(lambda: model.predict_crop(inputs[0]))
+    results['similarity/predict_crop'] = {'median_us': median * 1e6, 'best_us': best * 1e6}
+
+    for engine_mode in ('exact', 'lookup'):
+        model = SimilarityModel(deterministic=True, engine_mode=engine_mode)
+        model.predict_crop(inputs[0])
+        median, best = time_call(lambda: model.predict_crop(inputs[0]))
+        results[f'similarity/{engine_mode}/predict_crop'] = {'median_us': median * 1e6, 'best_us': best * 1e6}
+        for n in batch_sizes:
+            batch = inputs[:n]
+            median, best = time_call(lambda: model.predict_batch(batch), repeat=_repeat_for(n))
+            results[f'similarity/{engine_mode}/predict_batch/{n}'] = {
+                'median_ms': median * 1000, 'best_ms': best * 1000, 'per_item_us': median / n * 1e6
+            }
+    return results
+
+
+def bench_catalog_sizes(catalog_sizes):
+    results = {}
+    inputs = random_inputs(CATALOG_BATCH, seed=1)
+    model = SimilarityModel(deterministic=True)
+    for n_crops in catalog_sizes:
+        catalog = synthetic_catalog(n_crops)
+        engine = SimilarityEngine(catalog)
+        median, best = time_call(lambda: engine.rank(inputs, k=3))
+        results[f'catalog/{n_crops}/engine_rank'] = {
+            'median_ms': median * 1000, 'best_ms': best * 1000, 'per_item_us': median / CATALOG_BATCH * 1e6
+        }
+
+        # Pure-Python scoring of one input against the whole catalog
+        rows = list(catalog.values())
+        median, best = time_call(
+            lambda: [model.calculate_similarity(inputs[0], row) for row in rows], repeat=3
+        )
+        results[f'catalog/{n_crops}/calculate_similarity'] = {'median_ms': median * 1000, 'best_ms': best * 1000}
+    return results
+
+
+def bench_forest_model(batch_sizes):
+    """Forest engine vs scikit-learn predict_proba; skipped without the training dependencies"""
+    import crop_model
+    if not crop_model.training_dependencies_available():
+        print("Skipping forest benchmarks: pandas, scikit-learn and joblib are required to train")
+        return {}
+
+    model = crop_model.CropRecommendationModel()
+    with quiet():
+        model.train_model(n_samples=2200, n_jobs=-1)
+    model.predict_batch(random_inputs(1))
+    inputs = np.asarray(random_inputs(max(batch_sizes)), dtype=np.float64)
+
+    results = {}
+    for n in batch_sizes:
+        batch = inputs[:n]
+        median, best = time_call(lambda: model.predict_batch(batch), repeat=_repeat_for(n))
+        results[f'forest/predict_batch/{n}'] = {
+            'median_ms': median * 1000, 'best_ms': best * 1000, 'per_item_us': median / n * 1e6
+        }
+        median, best = time_call(lambda: model.model.predict_proba(batch), repeat=_repeat_for(n))
+        results[f'forest/sklearn_predict_proba/{n}'] = {
+            'median_ms': median * 1000, 'best_ms': best * 1000, 'per_item_us': median / n * 1e6
+        }
+
+    median, best = time_call(lambda: model.predict_crop(inputs[0].tolist()))
+    results['forest/predict_crop'] = {'median_us': median * 1e6, 'best_us': best * 1e6}
+
+    # Early exit depends on the input, so it is timed over many inputs drawn like the training data
+    singles = sample_inputs(EARLY_EXIT_INPUTS)
+    median, best = time_call(lambda: [model.predict_crop(features) for features in singles])
+    results['forest/predict_crop/samples'] = {
+        'median_us': median / len(singles) * 1e6, 'best_us': best / len(singles) * 1e6
+    }
+    for top_k, margin in EARLY_EXIT_SETTINGS:
+        model.early_exit_margin, model.early_exit_top_k = margin, top_k
+        median, best = time_call(lambda: [model.predict_crop(features) for features in singles])
+        trees = [model.predict_crop(features)['trees_evaluated'] for features in singles]
+        results[f'forest/early-exit/top{top_k}/margin{margin}/predict_crop'] = {
+            'median_us': median / len(singles) * 1e6, 'best_us': best / len(singles) * 1e6,
+            'mean_trees': sum(trees) / len(trees)
+        }
+    model.early_exit_margin = None
+    return results
+
+
+def run(quick=False):
+    batch_sizes = QUICK_BATCH_SIZES if quick else BATCH_SIZES
+    catalog_sizes = QUICK_CATALOG_SIZES if quick else CATALOG_SIZES
+    results = {}
+    results.update(bench_similarity_model(batch_sizes))
+    results.update(bench_catalog_sizes(catalog_sizes))
+    results.update(bench_forest_model(batch_sizes))
+    return results
@@ -0,0 +1,124 @@
+"""Timing, percentile and baseline comparison helpers shared by the suites"""
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+
+# Metric name suffixes and which direction is better
+LOWER_IS_BETTER = ('_ms', '_us', '_bytes')
+HIGHER_IS_BETTER = ('_per_s',)
+# Tail latencies are reported but too noisy to gate on
+UNGATED_METRICS = ('p99_ms', 'max_ms')
+
+
+def time_call(func, repeat=5, min_time=0.05):
+    """Median and best seconds per call of func().
+
+    The number of calls per sample is chosen so one sample takes at least
+    min_time; the median of `repeat` samples is reported.
+    """
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1000000:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    samples = [elapsed / number] + [t / number for t in timer.repeat(repeat - 1, number)]
+    return statistics.median(samples), min(samples)
+
+
+def percentile(values, q):
+    """q-th percentile (0-100) by linear interpolation"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def latency_summary(samples, wall_time):
+    """Percentiles in ms and throughput for a list of per-request seconds"""
+    ms = [s * 1000 for s in samples]
+    return {
+        'requests': len(samples),
+        'p50_ms': round(percentile(ms, 50), 4),
+        'p90_ms': round(percentile(ms, 90), 4),
+        'p99_ms': round(percentile(ms, 99), 4),
+        'max_ms': round(max(ms), 4),
+        'throughput_per_s': round(len(samples) / wall_time, 1)
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the models' load/save messages"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def environment():
+    """Where the numbers were measured; baselines only compare like with like"""
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    for name in ('numpy', 'sklearn', 'flask'):
+        module = sys.modules.get(name)
+        if module is not None:
+            info[name] = getattr(module, '__version__', 'unknown')
+    return info
+
+
+def save_results(filepath, results, meta):
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(filepath, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2, sort_keys=True)
+
+
+def load_results(filepath):
+    with open(filepath, 'r') as f:
+        return json.load(f)['results']
+
+
+def compare(results, baseline, threshold):
+    """Compare a run against a baseline metric by metric.
+
+    Each entry is (benchmark, metric, baseline value, current value, change).
+    Only metrics present in both runs and with a known direction are checked.
+    Returns (regressions, improvements) as lists of those entries.
+    """
+    regressions = []
+    improvements = []
+    for name, metrics in sorted(results.items()):
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric, value in sorted(metrics.items()):
+            old = previous.get(metric)
+            if metric in UNGATED_METRICS or not isinstance(old, (int, float)) or old <= 0:
+                continue
+            if metric.endswith(LOWER_IS_BETTER):
+                change = (value - old) / old
+            elif metric.endswith(HIGHER_IS_BETTER):
+                change = (old - value) / old
+            else:
+                continue
+            entry = (name, metric, old, value, change)
+            if change > threshold:
+                regressions.append(entry)
+            elif change < -threshold:
+                improvements.append(entry)
+    return regressions, improvements
@@ -0,0 +1,347 @@
+"""Load generator that replays the frontend's traffic against a running backend.
+
+Simulated users run sessions modelled on the React app:
+
+- dashboard: CropDashboard loads and sends one /api/predict/batch for the
+  user's crops; adding a crop posts the default soil vector to /api/predict
+  and re-sends the batch
+- management: CropManagement opens and sends one /api/predict per crop in
+  sequence; adding a crop posts the default soil vector and repeats the burst
+- advisor: the input form (and the questions the chatbot steers users to)
+  posts a typed-in soil card, then a few follow-ups changing one value
+
+Requests are released at the target rate by a shared pacer and executed
+by `concurrency` worker threads, each running sessions back to back over
+its own keep-alive connection. Only the standard library is used.
+
+Usage:
+    python -m benchmarks.load_generator --url http://localhost:5000 --rate 100 --concurrency 16
+    python -m benchmarks.load_generator --ramp 50:500:50 --step-duration 10 --slo-p99-ms 100
+"""
+import argparse
+import http.client
+import json
+import math
+import random
+import sys
+import threading
+import time
+import urllib.parse
+
+from benchmarks.harness import percentile
+
+# Soil vector the frontend posts for every newly added crop
+DEFAULT_SOIL = {'N': 60, 'P': 30, 'K': 30, 'temperature': 25, 'humidity': 60, 'ph': 6.5, 'rainfall': 150}
+
+# The dashboard's demo crops
+DEMO_SOIL = [
+    {'N': 80, 'P': 40, 'K': 40, 'temperature': 25, 'humidity': 80, 'ph': 6.5, 'rainfall': 200},
+    {'N': 60, 'P': 30, 'K': 30, 'temperature': 28, 'humidity': 60, 'ph': 6.0, 'rainfall': 150},
+]
+
+DEFAULT_MIX = {'dashboard': 0.3, 'management': 0.3, 'advisor': 0.4}
+
+# A step is saturated if it reaches less than this share of its target rate
+SATURATION_THROUGHPUT_RATIO = 0.9
+
+
+def typed_soil(rng):
+    """A soil card as a user would type it: whole numbers, one decimal for temperature and pH"""
+    return {
+        'N': rng.randint(0, 140),
+        'P': rng.randint(5, 145),
+        'K': rng.randint(5, 200) if rng.random() < 0.1 else rng.randint(5, 85),
+        'temperature': round(rng.uniform(8, 44), 1),
+        'humidity': rng.randint(14, 100),
+        'ph': round(rng.uniform(3.5, 9.9), 1),
+        'rainfall': rng.randint(20, 300),
+    }
+
+
+def user_crops(rng):
+    """Soil data of the crops a returning user has saved, demo crops first"""
+    return DEMO_SOIL + [typed_soil(rng) for _ in range(rng.randint(0, 4))]
+
+
+def dashboard_session(rng):
+    crops = user_crops(rng)
+    requests = [('POST', '/api/predict/batch', {'items': crops})]
+    if rng.random() < 0.5:
+        crops = crops + [DEFAULT_SOIL]
+        requests.append(('POST', '/api/predict', DEFAULT_SOIL))
+        requests.append(('POST', '/api/predict/batch', {'items': crops}))
+    return requests
+
+
+def management_session(rng):
+    crops = user_crops(rng)
+    requests = [('POST', '/api/predict', soil) for soil in crops]
+    if rng.random() < 0.5:
+        requests.append(('POST', '/api/predict', DEFAULT_SOIL))
+        requests.extend(('POST', '/api/predict', soil) for soil in crops + [DEFAULT_SOIL])
+    return requests
+
+
+def advisor_session(rng):
+    soil = typed_soil(rng)
+    requests = [('POST', '/api/predict', soil)]
+    for _ in range(rng.randint(0, 3)):
+        soil = dict(soil)
+        field = rng.choice(list(soil))
+        soil[field] = typed_soil(rng)[field]
+        requests.append(('POST', '/api/predict', soil))
+    return requests
+
+
+SESSIONS = {
+    'dashboard': dashboard_session,
+    'management': management_session,
+    'advisor': advisor_session,
+}
+
+
+class Pacer:
+    """Hands out request start times at a fixed rate, shared by all workers.
+
+    Slots are not skipped when workers fall behind, so the backlog shows up
+    as schedule lag instead of silently lowering the offered load.
+    """
+
+    def __init__(self, rate):
+        self._lock = threading.Lock()
+        self._next = time.perf_counter()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.interval = 1.0 / rate
+            self._next = max(self._next, time.perf_counter())
+
+    def wait(self, stop):
+        """Block until this caller's slot; returns the scheduled time"""
+        with self._lock:
+            slot = self._next
+            self._next += self.interval
+        delay = slot - time.perf_counter()
+        if delay > 0:
+            stop.wait(delay)
+        return slot
+
+
+class Worker(threading.Thread):
+    def __init__(self, target, pacer, mix, seed, stop, step):
+        super().__init__(daemon=True)
+        self.target = target
+        self.pacer = pacer
+        self.mix = mix
+        self.rng = random.Random(seed)
+        self.stop = stop
+        self.step = step
+        self.records = []
+        self.connection = None
+
+    def run(self):
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        while not self.stop.is_set():
+            session = self.rng.choices(names, weights)[0]
+            for method, path, body in SESSIONS[session](self.rng):
+                scheduled = self.pacer.wait(self.stop)
+                if self.stop.is_set():
+                    break
+                step = self.step[0]
+                started = time.perf_counter()
+                status = self.send(method, path, body)
+                finished = time.perf_counter()
+                self.records.append((step, session, path, status, finished - started, started - scheduled))
+        if self.connection is not None:
+            self.connection.close()
+
+    def send(self, method, path, body):
+        """Send one request; returns the HTTP status, or 0 on a connection error"""
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.target.hostname, self.target.port or 80,
+                                                             timeout=30)
+            self.connection.request(method, self.target.path.rstrip('/') + path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = None
+            return 0
+
+
+def summarize(records, duration, target_rate=None):
+    """Latency percentiles, throughput and error rate for a set of records"""
+    if not records:
+        return {'requests': 0, 'throughput_per_s': 0.0, 'error_rate': 0.0, 'target_rate': target_rate}
+    latencies = [r[4] * 1000 for r in records]
+    lags = [max(0.0, r[5]) * 1000 for r in records]
+    errors = sum(1 for r in records if r[3] == 0 or r[3] >= 400)
+    return {
+        'target_rate': target_rate,
+        'requests': len(records),
+        'throughput_per_s': round(len(records) / duration, 1),
+        'error_rate': round(errors / len(records), 4),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p90_ms': round(percentile(latencies, 90), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(max(latencies), 2),
+        'p99_schedule_lag_ms': round(percentile(lags, 99), 2),
+    }
+
+
+def is_saturated(summary, slo_p99_ms, max_error_rate):
+    if not summary['requests']:
+        return True
+    return (summary['throughput_per_s'] < SATURATION_THROUGHPUT_RATIO * summary['target_rate']
+            or summary['error_rate'] > max_error_rate
+            or (slo_p99_ms is not None and summary['p99_ms'] > slo_p99_ms))
+
+
+def run_load(url, rates, step_duration, concurrency, mix, seed=0, warm_up=2.0):
+    """Drive the backend at each rate in turn; returns (per-step records, step durations)"""
+    target = urllib.parse.urlsplit(url)
+    stop = threading.Event()
+    # Current step index, read by workers when they send; -1 is warm-up
+    step = [-1]
+    pacer = Pacer(rates[0])
+    workers = [Worker(target, pacer, mix, seed + i, stop, step) for i in range(concurrency)]
+    for worker in workers:
+        worker.start()
+
+    durations = []
+    if warm_up:
+        time.sleep(warm_up)
+    for i, rate in enumerate(rates):
+        pacer.set_rate(rate)
+        step[0] = i
+        started = time.perf_counter()
+        time.sleep(step_duration)
+        durations.append(time.perf_counter() - started)
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    records = [record for worker in workers for record in worker.records if record[0] >= 0]
+    return records, durations
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SESSIONS:
+            raise argparse.ArgumentTypeError(f"Unknown session type: {name} (choose from {', '.join(SESSIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _is_positive(value):
+    return math.isfinite(value) and value > 0
+
+
+def parse_rate(text):
+    try:
+        rate = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Rate must be a number: {text}")
+    if not _is_positive(rate):
+        raise argparse.ArgumentTypeError("Rate must be greater than 0 requests per second")
+    return rate
+
+
+def parse_ramp(text):
+    try:
+        start, stop, step = (float(value) for value in text.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("Ramp must be start:stop:step, e.g. 50:500:50")
+    if not (_is_positive(start) and _is_positive(step) and math.isfinite(stop)):
+        raise argparse.ArgumentTypeError("Ramp start and step must be greater than 0, e.g. 50:500:50")
+    if stop < start:
+        raise argparse.ArgumentTypeError("Ramp stop must not be below its start")
+    rates = []
+    rate = start
+    while rate <= stop + 1e-9:
+        rates.append(rate)
+        rate += step
+    return rates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay dashboard-like traffic against a running backend")
+    parser.add_argument('--url', default='http://localhost:5000', help="Backend base URL")
+    parser.add_argument('--rate', type=parse_rate, default=50, help="Target requests per second")
+    parser.add_argument('--ramp', type=parse_ramp, help="Step through rates start:stop:step to find saturation")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds at --rate")
+    parser.add_argument('--step-duration', type=float, default=10, help="Seconds per --ramp step")
+    parser.add_argument('--warm-up', type=float, default=2, help="Seconds of unrecorded traffic first")
+    parser.add_argument('--concurrency', type=int, default=16, help="Simulated users sending at once")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help="Session weights, e.g. dashboard=0.3,management=0.3,advisor=0.4")
+    parser.add_argument('--slo-p99-ms', type=float, help="A ramp step is saturated above this p99")
+    parser.add_argument('--max-error-rate', type=float, default=0.01,
+                        help="A ramp step is saturated above this error rate (default: 0.01)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    rates = args.ramp or [args.rate]
+    step_duration = args.step_duration if args.ramp else args.duration
+    print(f"Driving {args.url} with {args.concurrency} users at "
+          f"{', '.join(f'{rate:g}' for rate in rates)} req/s, {step_duration:g}s per step...")
+    records, durations = run_load(args.url, rates, step_duration, args.concurrency, args.mix,
+                                  seed=args.seed, warm_up=args.warm_up)
+
+    steps = []
+    for i, (rate, duration) in enumerate(zip(rates, durations)):
+        steps.append(summarize([r for r in records if r[0] == i], duration, rate))
+    total_duration = sum(durations)
+    report = {
+        'url': args.url,
+        'concurrency': args.concurrency,
+        'mix': args.mix,
+        'steps': steps,
+        'by_endpoint': {path: summarize([r for r in records if r[2] == path], total_duration)
+                        for path in sorted({r[2] for r in records})},
+        'by_session': {name: summarize([r for r in records if r[1] == name], total_duration)
+                       for name in sorted({r[1] for r in records})},
+    }
+
+    print(f"{'target/s':>9}{'achieved/s':>12}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'errors':>9}{'lag p99':>9}")
+    saturation = None
+    for summary in steps:
+        saturated = summary['saturated'] = is_saturated(summary, args.slo_p99_ms, args.max_error_rate)
+        if saturated and saturation is None:
+            saturation = summary['target_rate']
+        print(f"{summary['target_rate']:>9g}{summary['throughput_per_s']:>12.1f}{summary.get('p50_ms', 0):>9.2f}"
+              f"{summary.get('p90_ms', 0):>9.2f}{summary.get('p99_ms', 0):>9.2f}{summary['error_rate']:>9.2%}"
+              f"{summary.get('p99_schedule_lag_ms', 0):>9.1f}{'  saturated' if saturated else ''}")
+    for group in ('by_endpoint', 'by_session'):
+        for name, summary in report[group].items():
+            print(f"  {name:<22}{summary['requests']:>8} requests  p50 {summary.get('p50_ms', 0):.2f} ms"
+                  f"  p99 {summary.get('p99_ms', 0):.2f} ms  errors {summary['error_rate']:.2%}")
+
+    sustained = [summary['throughput_per_s'] for summary in steps if not summary['saturated']]
+    report['saturation_rate'] = saturation
+    report['max_sustained_throughput_per_s'] = max(sustained) if sustained else None
+    if saturation is None:
+        print("No saturation reached")
+    else:
+        sustained_text = (f"highest sustained throughput {max(sustained):g} req/s" if sustained
+                          else "no step was sustained")
+        print(f"Saturated at a target of {saturation:g} req/s; {sustained_text}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
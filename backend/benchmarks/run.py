@@ -0,0 +1,95 @@
+"""Run the benchmark suites and gate on regressions against a JSON baseline.
+
+Usage:
+    python -m benchmarks.run                          # compare with benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline          # record the current numbers as the baseline
+    python -m benchmarks.run --suite api --quick --threshold 0.3
+
+Exits with status 1 if any metric is worse than the baseline by more than
+the threshold (a fraction; 0.25 means 25% slower, larger or less throughput).
+Baselines are only meaningful on the machine that recorded them.
+"""
+import argparse
+import os
+import sys
+import time
+
+from benchmarks import bench_api, bench_load, bench_models
+from benchmarks.harness import compare, environment, load_results, save_results
+
+SUITES = {
+    'models': bench_models.run,
+    'api': bench_api.run,
+    'load': bench_load.run,
+}
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, 'results', 'latest.json')
+DEFAULT_THRESHOLD = 0.25
+
+
+def print_results(results):
+    for name, metrics in sorted(results.items()):
+        values = ', '.join(
+            f"{metric}={value:.4g}" if isinstance(value, float) else f"{metric}={value}"
+            for metric, value in sorted(metrics.items())
+        )
+        print(f"{name:<48}{values}")
+
+
+def print_changes(title, entries):
+    if not entries:
+        return
+    print(title)
+    for name, metric, old, new, change in entries:
+        print(f"  {name} {metric}: {old:.4g} -> {new:.4g} ({change:+.0%} worse)" if change > 0
+              else f"  {name} {metric}: {old:.4g} -> {new:.4g} ({-change:.0%} better)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the crop models and API")
+    parser.add_argument('--suite', action='append', choices=sorted(SUITES),
+                        help="Suite to run (repeatable, default: all)")
+    parser.add_argument('--quick', action='store_true', help="Smaller batch sizes and fewer requests")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Where to write this run's results")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline results to compare with")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Write this run to the baseline file instead of comparing")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed fractional regression per metric (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for suite in args.suite or list(SUITES):
+        started = time.perf_counter()
+        print(f"Running {suite} benchmarks...")
+        results.update(SUITES[suite](quick=args.quick))
+        print(f"  done in {time.perf_counter() - started:.1f}s")
+
+    meta = environment()
+    meta['quick'] = args.quick
+    print_results(results)
+    save_results(args.output, results, meta)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        save_results(args.baseline, results, meta)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    regressions, improvements = compare(results, load_results(args.baseline), args.threshold)
+    print_changes("Improvements:", improvements)
+    print_changes("Regressions:", regressions)
+    if regressions:
+        print(f"FAIL: {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    print(f"OK: no metric regressed by more than {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""Bulk crop scoring for large soil-survey exports.
+
+Streams a CSV or NDJSON file in fixed-size chunks, scores every chunk with
+the vectorized similarity engine in a pool of worker processes and writes
+the results as they come back, in input order. Only a bounded number of
+chunks is held in memory at once, so files larger than RAM can be scored.
+
+Usage:
+    python -m bulk_score soil_cards.csv -o recommendations.csv
+    python -m bulk_score soil_cards.ndjson -o - --format ndjson --workers 8
+"""
+import argparse
+import collections
+import contextlib
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from crop_model_simple import CropRecommendationModel
+from feature_schema import FeatureValidator
+
+FEATURE_COLUMNS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+RANK_COLUMNS = [('recommended_crop', 'score'), ('crop_2', 'score_2'), ('crop_3', 'score_3')]
+# A quoted CSV field still open after this many lines is taken to be a stray quote
+MAX_RECORD_LINES = 1000
+OUTPUT_COLUMNS = ['row', 'id', 'recommended_crop', 'score', 'crop_2', 'score_2', 'crop_3', 'score_3', 'error']
+
+_worker_model = None
+# Same checks and messages as /api/predict
+_validator = FeatureValidator()
+
+
+def _init_worker(model_path):
+    """Load the model once per worker process"""
+    global _worker_model
+    _worker_model = CropRecommendationModel()
+    # Keep load messages out of the results when writing to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        _worker_model.load_model(model_path)
+    if _worker_model.engine is None:
+        raise RuntimeError("Bulk scoring requires numpy for the vectorized engine")
+
+
+def _parse_csv_lines(lines, header):
+    return list(csv.DictReader(io.StringIO(''.join(lines)), fieldnames=header))
+
+
+def _parse_ndjson_lines(lines):
+    records = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError as e:
+            records.append({'__error__': f'Invalid JSON: {e}'})
+    return records
+
+
+def _extract_features(record):
+    """Return (features, None) or (None, error) for one input record"""
+    if isinstance(record, dict) and '__error__' in record:
+        return None, record['__error__']
+    return _validator.validate(record)
+
+
+def score_chunk(chunk):
+    """Parse and score one chunk of raw input lines in a worker process.
+
+    Returns the output rows for the chunk, in input order. Rows are numbered
+    by the writer, since blank lines and quoted newlines mean a chunk's line
+    count is not its record count.
+    """
+    lines, fmt, header, id_column = chunk
+    if fmt == 'csv':
+        records = _parse_csv_lines(lines, header)
+    else:
+        records = _parse_ndjson_lines(lines)
+
+    rows = []
+    valid_positions = []
+    valid_features = []
+    for offset, record in enumerate(records):
+        features, error = _extract_features(record)
+        rows.append({
+            'id': record.get(id_column, '') if id_column and isinstance(record, dict) else '',
+            'error': error or '',
+        })
+        if features is not None:
+            valid_positions.append(offset)
+            valid_features.append(features)
+
+    if valid_features:
+        ranked = _worker_model.engine.rank(valid_features, k=3)
+        for offset, top in zip(valid_positions, ranked):
+            row = rows[offset]
+            for (crop_key, score_key), (crop, score) in zip(RANK_COLUMNS, top):
+                row[crop_key] = crop
+                row[score_key] = round(score * 100, 2)
+    return rows
+
+
+def read_chunks(stream, fmt, chunk_size, id_column, max_record_lines=MAX_RECORD_LINES):
+    """Yield chunks of raw lines without parsing them in the main process.
+
+    A CSV chunk is extended until its quotes balance, so a quoted field
+    with embedded newlines is never split between chunks. A record still
+    open after max_record_lines lines raises ValueError naming it, rather
+    than reading the rest of the file into one chunk.
+    """
+    header = None
+    if fmt == 'csv':
+        header = next(csv.reader([stream.readline()]), None)
+        if not header:
+            return
+        header = [column.strip() for column in header]
+        missing = [column for column in FEATURE_COLUMNS if column not in header]
+        if missing:
+            raise ValueError(f"Input is missing required columns: {', '.join(missing)}")
+
+    # CSV records started so far, numbered like the output rows
+    record = 0
+    while True:
+        lines = list(itertools.islice(stream, chunk_size))
+        if not lines:
+            return
+        if fmt == 'csv':
+            # Quotes inside a quoted field are doubled, so an odd count opens or closes a record's field
+            open_line = None
+            for index, line in enumerate(lines):
+                if open_line is None:
+                    # The csv module skips blank lines
+                    if line.rstrip('\r\n'):
+                        record += 1
+                    if line.count('"') % 2:
+                        open_line = index
+                elif line.count('"') % 2:
+                    open_line = None
+            while open_line is not None:
+                if len(lines) - open_line >= max_record_lines:
+                    raise ValueError(f"Record {record} has a quoted field still open after {max_record_lines:,} "
+                                     "lines; check it for a stray '\"'")
+                line = stream.readline()
+                if not line:
+                    break
+                lines.append(line)
+                if line.count('"') % 2:
+                    open_line = None
+        yield lines, fmt, header, id_column
+
+
+class ResultWriter:
+    """Stream scored rows to CSV or NDJSON, numbering them in input order"""
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        self.next_row = 1
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(stream, fieldnames=OUTPUT_COLUMNS, extrasaction='ignore')
+            self.writer.writeheader()
+
+    def write(self, rows):
+        rows = [{'row': number, **row} for number, row in enumerate(rows, self.next_row)]
+        self.next_row += len(rows)
+        if self.fmt == 'csv':
+            self.writer.writerows(rows)
+        else:
+            self.stream.write(''.join(json.dumps(row) + '\n' for row in rows))
+
+
+class Progress:
+    """Periodic progress and throughput report on stderr"""
+
+    def __init__(self, interval=2.0, enabled=True):
+        self.interval = interval
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.last_report = self.started
+        self.rows = 0
+        self.errors = 0
+
+    def update(self, rows):
+        self.rows += len(rows)
+        self.errors += sum(1 for row in rows if row['error'])
+        now = time.perf_counter()
+        if self.enabled and now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report(now)
+
+    def report(self, now=None):
+        elapsed = (now or time.perf_counter()) - self.started
+        rate = self.rows / elapsed if elapsed > 0 else 0.0
+        print(f"{self.rows:,} rows scored ({self.errors:,} errors) in {elapsed:.1f}s - {rate:,.0f} rows/s",
+              file=sys.stderr)
+
+
+def detect_format(path):
+    if path.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'csv'
+
+
+def run(input_path, output_path, model_path='crop_model.json', input_format=None, output_format=None,
+        chunk_size=50000, workers=None, id_column=None, quiet=False):
+    """Score an input file and return the Progress summary"""
+    input_format = input_format or detect_format(input_path)
+    output_format = output_format or (detect_format(output_path) if output_path != '-' else 'csv')
+    workers = workers or os.cpu_count() or 1
+    # Bound the number of chunks held in memory (queued, being scored or waiting to be written)
+    max_in_flight = workers * 2
+
+    progress = Progress(enabled=not quiet)
+    in_stream = sys.stdin if input_path == '-' else open(input_path, 'r', newline='')
+    out_stream = sys.stdout if output_path == '-' else open(output_path, 'w', newline='')
+    try:
+        writer = ResultWriter(out_stream, output_format)
+        pending = collections.deque()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_path,)) as pool:
+            for chunk in read_chunks(in_stream, input_format, chunk_size, id_column):
+                pending.append(pool.submit(score_chunk, chunk))
+                # Write finished chunks in order before reading further
+                while pending and (len(pending) >= max_in_flight or pending[0].done()):
+                    rows = pending.popleft().result()
+                    writer.write(rows)
+                    progress.update(rows)
+            while pending:
+                rows = pending.popleft().result()
+                writer.write(rows)
+                progress.update(rows)
+        out_stream.flush()
+    finally:
+        if in_stream is not sys.stdin:
+            in_stream.close()
+        if out_stream is not sys.stdout:
+            out_stream.close()
+
+    if not quiet:
+        progress.report()
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score large soil-survey files with the crop recommendation model")
+    parser.add_argument('input', help="Input CSV or NDJSON file ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='-', help="Output file ('-' for stdout, the default)")
+    parser.add_argument('--model', default='crop_model.json', help="Model file (default: crop_model.json)")
+    parser.add_argument('--input-format', choices=['csv', 'ndjson'], help="Input format (default: from file extension)")
+    parser.add_argument('--format', dest='output_format', choices=['csv', 'ndjson'],
+                        help="Output format (default: from file extension, csv for stdout)")
+    parser.add_argument('--chunk-size', type=int, default=50000, help="Rows per chunk (default: 50000)")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('--id-column', help="Input column copied to the output 'id' column")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Do not report progress")
+    args = parser.parse_args(argv)
+
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be positive")
+
+    try:
+        run(args.input, args.output, model_path=args.model, input_format=args.input_format,
+            output_format=args.output_format, chunk_size=args.chunk_size, workers=args.workers,
+            id_column=args.id_column, quiet=args.quiet)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except BrokenProcessPool as e:
+        # A worker killed by the OOM killer, or one whose model failed to load
+        print(f"Error: {e} If a worker ran out of memory, try a smaller --chunk-size or fewer --workers",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
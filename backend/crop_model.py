@@ -1,92 +1,144 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+import time
+
+# Serving only needs numpy; pandas, scikit-learn and joblib are imported
+# inside the training and pickle methods that use them
 try:
-    import pandas as pd
     import numpy as np
-    from sklearn.model_selection import train_test_split
-    from sklearn.ensemble import RandomForestClassifier
-    from sklearn.metrics import accuracy_score, classification_report
-    import joblib
-    import os
+    from forest_engine import ForestEngine, export_forest, save_forest, forest_predictions
+    import model_artifact
     DEPENDENCIES_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: Some dependencies are missing: {e}")
     print("Please install required packages: pip install scikit-learn pandas numpy joblib")
     DEPENDENCIES_AVAILABLE = False
 
+SAMPLE_CROP_REQUIREMENTS = {
+    'rice': [80, 40, 40, 25, 80, 6.5, 200],
+    'maize': [60, 30, 30, 28, 60, 6.0, 150],
+    'chickpea': [20, 40, 20, 25, 50, 7.0, 100],
+    'kidneybeans': [25, 35, 25, 26, 55, 6.5, 120],
+    'pigeonpeas': [30, 30, 30, 28, 50, 6.8, 110],
+    'mothbeans': [20, 30, 20, 30, 45, 7.2, 80],
+    'mungbean': [25, 25, 25, 30, 50, 6.5, 90],
+    'blackgram': [30, 25, 30, 32, 45, 6.8, 85],
+    'lentil': [20, 35, 20, 24, 55, 7.0, 100],
+    'pomegranate': [40, 20, 20, 30, 60, 6.5, 120],
+    'banana': [60, 30, 40, 30, 70, 6.0, 180],
+    'mango': [50, 25, 30, 32, 65, 6.5, 150],
+    'grapes': [30, 20, 20, 28, 50, 6.8, 100],
+    'watermelon': [40, 20, 30, 35, 60, 6.5, 120],
+    'muskmelon': [35, 25, 25, 32, 55, 6.8, 110],
+    'apple': [30, 20, 20, 20, 70, 6.5, 140],
+    'orange': [40, 25, 25, 25, 65, 6.0, 160],
+    'papaya': [50, 30, 35, 30, 70, 6.5, 170],
+    'coconut': [60, 40, 50, 30, 80, 6.0, 200],
+    'cotton': [80, 50, 60, 35, 50, 6.5, 100],
+    'jute': [70, 40, 50, 30, 80, 6.8, 180],
+    'coffee': [40, 30, 30, 22, 80, 6.0, 200]
+}
+
+# Standard deviation of the synthetic noise per feature (N, P, K, temp, humidity, ph, rainfall)
+SAMPLE_NOISE_STD = [10, 10, 10, 3, 10, 0.5, 30]
+
+TRAINING_DEPENDENCIES = ['pandas', 'sklearn', 'joblib']
+
+def training_dependencies_available():
+    """Check for the training-only packages without importing them"""
+    return all(importlib.util.find_spec(name) is not None for name in TRAINING_DEPENDENCIES)
+
+def generate_sample_shard(task):
+    """Draw one shard of synthetic samples: `size` rows for every crop.
+
+    Returns (features, label_codes) with features as an (n, 7) float array.
+    Top-level so it can run in a worker process.
+    """
+    seed, requirements, size = task
+    rng = np.random.default_rng(seed)
+    n_crops, n_features = requirements.shape
+    # One draw for the whole shard; block c holds crop c's samples
+    noise = rng.normal(0.0, SAMPLE_NOISE_STD, size=(n_crops, size, n_features))
+    features = np.maximum(0.0, requirements[:, np.newaxis, :] + noise).reshape(-1, n_features)
+    codes = np.repeat(np.arange(n_crops, dtype=np.int16), size)
+    return features, codes
+
 class CropRecommendationModel:
     def __init__(self):
         if not DEPENDENCIES_AVAILABLE:
             raise ImportError("Required dependencies are not available. Please install them first.")
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
+        # Created on first training run so serving never imports scikit-learn
+        self.model = None
         self.feature_columns = [
             'N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall'
         ]
         self.crop_labels = []
+        self.training_timings = {}
+        self.training_memory = {}
+        # None evaluates every tree; see ForestEngine.predict_proba_early
+        self.early_exit_margin = None
+        self.early_exit_top_k = 1
+        self._forest_engine = None
         
-    def create_sample_data(self):
-        """Create sample dataset for crop recommendation"""
-        np.random.seed(42)
-        n_samples = 1000
-        
-        # Generate synthetic data based on typical crop requirements
-        data = []
-        
-        # Define crop requirements (N, P, K, temp, humidity, ph, rainfall)
-        crop_requirements = {
-            'rice': [80, 40, 40, 25, 80, 6.5, 200],
-            'maize': [60, 30, 30, 28, 60, 6.0, 150],
-            'chickpea': [20, 40, 20, 25, 50, 7.0, 100],
-            'kidneybeans': [25, 35, 25, 26, 55, 6.5, 120],
-            'pigeonpeas': [30, 30, 30, 28, 50, 6.8, 110],
-            'mothbeans': [20, 30, 20, 30, 45, 7.2, 80],
-            'mungbean': [25, 25, 25, 30, 50, 6.5, 90],
-            'blackgram': [30, 25, 30, 32, 45, 6.8, 85],
-            'lentil': [20, 35, 20, 24, 55, 7.0, 100],
-            'pomegranate': [40, 20, 20, 30, 60, 6.5, 120],
-            'banana': [60, 30, 40, 30, 70, 6.0, 180],
-            'mango': [50, 25, 30, 32, 65, 6.5, 150],
-            'grapes': [30, 20, 20, 28, 50, 6.8, 100],
-            'watermelon': [40, 20, 30, 35, 60, 6.5, 120],
-            'muskmelon': [35, 25, 25, 32, 55, 6.8, 110],
-            'apple': [30, 20, 20, 20, 70, 6.5, 140],
-            'orange': [40, 25, 25, 25, 65, 6.0, 160],
-            'papaya': [50, 30, 35, 30, 70, 6.5, 170],
-            'coconut': [60, 40, 50, 30, 80, 6.0, 200],
-            'cotton': [80, 50, 60, 35, 50, 6.5, 100],
-            'jute': [70, 40, 50, 30, 80, 6.8, 180],
-            'coffee': [40, 30, 30, 22, 80, 6.0, 200]
-        }
+    @property
+    def forest_engine(self):
+        """Array-based engine flattened from the trained forest"""
+        if self._forest_engine is None:
+            self._forest_engine = ForestEngine(export_forest(self.model, self.feature_columns))
+        return self._forest_engine
+    
+    def create_sample_data(self, n_samples=1000, random_state=42, n_shards=1, n_jobs=1):
+        """Create sample dataset for crop recommendation
+
+        Each crop's samples are drawn in one vectorized call per shard. The
+        data depends only on n_samples, random_state and n_shards (each shard
+        gets its own seed spawned from random_state), so shards can be
+        generated in n_jobs parallel processes without changing the result.
+        """
+        import pandas as pd
+        
+        crop_names = list(SAMPLE_CROP_REQUIREMENTS.keys())
+        requirements = np.asarray([SAMPLE_CROP_REQUIREMENTS[crop] for crop in crop_names], dtype=np.float64)
+        per_crop = n_samples // len(crop_names)
+        shard_sizes = [len(part) for part in np.array_split(np.arange(per_crop), n_shards)]
+        seeds = np.random.SeedSequence(random_state).spawn(n_shards)
+        tasks = [(seed, requirements, size) for seed, size in zip(seeds, shard_sizes)]
         
-        for crop, requirements in crop_requirements.items():
-            for _ in range(n_samples // len(crop_requirements)):
-                # Add some variation to the requirements
-                sample = []
-                for i, req in enumerate(requirements):
-                    if i == 3:  # temperature
-                        variation = np.random.normal(0, 3)
-                    elif i == 4:  # humidity
-                        variation = np.random.normal(0, 10)
-                    elif i == 5:  # ph
-                        variation = np.random.normal(0, 0.5)
-                    elif i == 6:  # rainfall
-                        variation = np.random.normal(0, 30)
-                    else:  # N, P, K
-                        variation = np.random.normal(0, 10)
-                    
-                    sample.append(max(0, req + variation))
-                
-                sample.append(crop)
-                data.append(sample)
-        
-        # Create DataFrame
-        columns = self.feature_columns + ['label']
-        df = pd.DataFrame(data, columns=columns)
+        if n_jobs and n_jobs != 1 and n_shards > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            workers = None if n_jobs < 0 else n_jobs
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                shards = list(pool.map(generate_sample_shard, tasks))
+        else:
+            shards = [generate_sample_shard(task) for task in tasks]
+        
+        features = np.concatenate([shard[0] for shard in shards])
+        codes = np.concatenate([shard[1] for shard in shards])
+        
+        # Create DataFrame; labels are categorical codes, not one string per row
+        df = pd.DataFrame(features, columns=self.feature_columns)
+        df['label'] = pd.Categorical.from_codes(codes, categories=crop_names)
         
         return df
     
-    def train_model(self, df=None):
-        """Train the crop recommendation model"""
+    def train_model(self, df=None, n_jobs=None, **sample_options):
+        """Train the crop recommendation model
+
+        n_jobs is passed to the forest for parallel fitting; sample_options
+        go to create_sample_data when no DataFrame is given. Per-stage wall
+        times are stored in self.training_timings.
+        """
+        from sklearn.model_selection import train_test_split
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.metrics import accuracy_score, classification_report
+        
+        timings = {}
+        started = time.perf_counter()
         if df is None:
-            df = self.create_sample_data()
+            df = self.create_sample_data(**sample_options)
+        timings['generate'] = time.perf_counter() - started
         
         # Prepare features and target
         X = df[self.feature_columns]
@@ -96,54 +148,135 @@ class CropRecommendationModel:
         self.crop_labels = sorted(y.unique().tolist())
         
         # Split the data
+        stage = time.perf_counter()
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=0.2, random_state=42, stratify=y
         )
+        timings['split'] = time.perf_counter() - stage
         
         # Train the model
+        stage = time.perf_counter()
+        self.model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs)
         self.model.fit(X_train, y_train)
+        self._forest_engine = None
+        timings['fit'] = time.perf_counter() - stage
         
         # Evaluate the model
+        stage = time.perf_counter()
         y_pred = self.model.predict(X_test)
         accuracy = accuracy_score(y_test, y_pred)
+        timings['evaluate'] = time.perf_counter() - stage
+        timings['total'] = time.perf_counter() - started
+        self.training_timings = timings
         
         print(f"Model Accuracy: {accuracy:.2f}")
         print("\nClassification Report:")
         print(classification_report(y_test, y_pred))
+        print("Training stage timings: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
         
         return accuracy
-    
+
+    def train_from_file(self, filepath, n_jobs=None, label_column='label', chunksize=None, work_dir=None):
+        """Train on a CSV or Parquet file of real samples
+
+        The file is streamed into memory-mapped float32 features and int16
+        label codes (see training_data), so only the training rows are ever
+        copied into memory. Per-stage wall times and peak resident memory
+        (MB) are stored in self.training_timings and self.training_memory.
+        Without a work_dir the arrays go to a temp directory that is removed
+        once training is done.
+        """
+        if work_dir is not None:
+            return self._train_on_file(filepath, work_dir, n_jobs, label_column, chunksize)
+        work_dir = tempfile.mkdtemp(prefix='kisan-train-')
+        try:
+            return self._train_on_file(filepath, work_dir, n_jobs, label_column, chunksize)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _train_on_file(self, filepath, work_dir, n_jobs, label_column, chunksize):
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.metrics import accuracy_score, classification_report
+        from training_data import DEFAULT_CHUNK_SIZE, StageMemory, ingest_dataset, stratified_split
+
+        chunksize = chunksize or DEFAULT_CHUNK_SIZE
+        memory = StageMemory()
+        timings = {}
+        started = time.perf_counter()
+        with memory.stage('ingest'):
+            dataset = ingest_dataset(filepath, work_dir, self.feature_columns, label_column, chunksize)
+        timings['ingest'] = time.perf_counter() - started
+        if not len(dataset):
+            raise ValueError(f"No usable rows in {filepath}")
+        print(f"Ingested {len(dataset)} rows ({dataset.nbytes / (1 << 20):.1f} MB on disk, "
+              f"{dataset.dropped} dropped) into {dataset.directory}")
+        self.crop_labels = list(dataset.labels)
+
+        stage = time.perf_counter()
+        with memory.stage('split'):
+            train_idx, test_idx = stratified_split(dataset.codes, test_size=0.2, random_state=42)
+        timings['split'] = time.perf_counter() - stage
+
+        # Fit on the codes; classes are renamed to crop names once evaluated
+        stage = time.perf_counter()
+        with memory.stage('fit'):
+            self.model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs)
+            self.model.fit(dataset.features[train_idx], dataset.codes[train_idx])
+        timings['fit'] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        with memory.stage('evaluate'):
+            y_test = np.asarray(dataset.codes[test_idx])
+            y_pred = np.empty_like(y_test)
+            for start in range(0, len(test_idx), chunksize):
+                rows = test_idx[start:start + chunksize]
+                y_pred[start:start + len(rows)] = self.model.predict(dataset.features[rows])
+            accuracy = accuracy_score(y_test, y_pred)
+        timings['evaluate'] = time.perf_counter() - stage
+        timings['total'] = time.perf_counter() - started
+        self.training_timings = timings
+        self.training_memory = memory.peaks
+
+        # Same classes as a forest fitted on the names, so exports and predictions use crop names
+        self.model.classes_ = np.asarray(self.crop_labels, dtype=object)[self.model.classes_]
+        self._forest_engine = None
+
+        print(f"Model Accuracy: {accuracy:.2f}")
+        print("\nClassification Report:")
+        print(classification_report(y_test, y_pred, labels=np.arange(len(self.crop_labels)),
+                                    target_names=self.crop_labels, zero_division=0))
+        print("Training stage timings: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+        print("Peak memory per stage: " + ", ".join(f"{name} {mb:.1f} MB" for name, mb in memory.peaks.items()))
+
+        return accuracy
+
     def predict_crop(self, features):
         """Predict crop based on input features"""
-        if not hasattr(self, 'model') or self.model is None:
-            raise ValueError("Model not trained yet. Please train the model first.")
-        
-        # Convert to numpy array and reshape
-        features_array = np.array(features).reshape(1, -1)
-        
-        # Make prediction
-        prediction = self.model.predict(features_array)[0]
-        probabilities = self.model.predict_proba(features_array)[0]
+        if len(features) != len(self.feature_columns):
+            raise ValueError("Exactly 7 features required: N, P, K, temperature, humidity, ph, rainfall")
         
-        # Get top 3 predictions with probabilities
-        top_indices = np.argsort(probabilities)[-3:][::-1]
-        top_predictions = []
-        
-        for idx in top_indices:
-            crop = self.crop_labels[idx]
-            probability = probabilities[idx]
-            top_predictions.append({
-                'crop': crop,
-                'probability': round(probability * 100, 2)
-            })
+        return self.predict_batch([features])[0]
+    
+    def predict_batch(self, features_list):
+        """Predict crops for many inputs with a single pass over the forest"""
+        if self._forest_engine is None and not hasattr(self.model, 'estimators_'):
+            raise ValueError("Model not trained yet. Please train the model first.")
+        if not len(features_list):
+            return []
         
-        return {
-            'recommended_crop': prediction,
-            'top_predictions': top_predictions
-        }
+        # Label and top 3 both come from the same class probabilities
+        return forest_predictions(self.forest_engine, features_list, self.crop_labels,
+                                  self.early_exit_margin, self.early_exit_top_k)
+    
+    def export_forest(self, filepath='crop_forest.npz'):
+        """Export the trained forest as NumPy arrays for sklearn-free serving"""
+        save_forest(export_forest(self.model, self.feature_columns), filepath)
+        print(f"Forest arrays exported to {filepath}")
     
     def save_model(self, filepath='crop_model.pkl'):
         """Save the trained model"""
+        import joblib
+        
         model_data = {
             'model': self.model,
             'feature_columns': self.feature_columns,
@@ -152,29 +285,71 @@ class CropRecommendationModel:
         joblib.dump(model_data, filepath)
         print(f"Model saved to {filepath}")
     
+    def save_artifact(self, filepath='crop_model.kmdl'):
+        """Save the flattened forest as a compiled, memory-mappable model artifact"""
+        section, arrays = model_artifact.forest_section(export_forest(self.model, self.feature_columns))
+        model_artifact.write_artifact(filepath, {'forest': section}, arrays)
+        print(f"Model artifact saved to {filepath}")
+    
     def load_model(self, filepath='crop_model.pkl'):
-        """Load a trained model"""
+        """Load a trained model from a pickle or a compiled model artifact"""
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"Model file {filepath} not found")
         
+        if model_artifact.is_artifact(filepath):
+            metadata, arrays = model_artifact.read_artifact(filepath)
+            forest_arrays = model_artifact.forest_from_artifact(metadata, arrays)
+            if forest_arrays is None:
+                raise ValueError(f"{filepath} does not contain a forest model")
+            # Serve from the memory-mapped arrays; there is no sklearn estimator
+            self.model = None
+            self._forest_engine = ForestEngine(forest_arrays)
+            self.feature_columns = [str(c) for c in forest_arrays['feature_columns']]
+            self.crop_labels = list(self._forest_engine.classes)
+            print(f"Model artifact loaded from {filepath}")
+            return
+        
+        import joblib
         model_data = joblib.load(filepath)
         self.model = model_data['model']
         self.feature_columns = model_data['feature_columns']
         self.crop_labels = model_data['crop_labels']
+        self._forest_engine = None
         print(f"Model loaded from {filepath}")
 
 if __name__ == "__main__":
-    if not DEPENDENCIES_AVAILABLE:
+    if not DEPENDENCIES_AVAILABLE or not training_dependencies_available():
         print("Cannot run model training without required dependencies.")
         print("Please install: pip install scikit-learn pandas numpy joblib")
         exit(1)
     
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the RandomForest crop model on synthetic or real data")
+    parser.add_argument('--data', help="CSV or Parquet file of real samples to train on instead of synthetic data")
+    parser.add_argument('--label-column', default='label', help="Crop name column in --data (default: label)")
+    parser.add_argument('--chunksize', type=int, default=None, help="Rows read per chunk from --data (default: 200000)")
+    parser.add_argument('--work-dir', default=None, help="Directory for the memory-mapped training arrays (default: a temp dir)")
+    parser.add_argument('--samples', type=int, default=1000, help="Synthetic samples to generate (default: 1000)")
+    parser.add_argument('--shards', type=int, default=1, help="Generation shards, each with its own seed (default: 1)")
+    parser.add_argument('--jobs', type=int, default=1, help="Parallel processes for generation and fitting (-1: all cores)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for data generation (default: 42)")
+    args = parser.parse_args()
+    
     # Create and train the model
     crop_model = CropRecommendationModel()
-    accuracy = crop_model.train_model()
+    if args.data:
+        accuracy = crop_model.train_from_file(
+            args.data, n_jobs=args.jobs, label_column=args.label_column,
+            chunksize=args.chunksize, work_dir=args.work_dir
+        )
+    else:
+        accuracy = crop_model.train_model(
+            n_jobs=args.jobs, n_samples=args.samples, random_state=args.seed, n_shards=args.shards
+        )
     
     # Save the model
     crop_model.save_model('crop_model.pkl')
+    crop_model.export_forest('crop_forest.npz')
     
     # Test the model with sample data
     sample_features = [80, 40, 40, 25, 80, 6.5, 200]  # Rice-like conditions
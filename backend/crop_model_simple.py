@@ -1,10 +1,29 @@
 import os
 import json
 import random
-import math
+
+try:
+    from similarity_engine import SimilarityEngine
+    from lookup_engine import LookupTableEngine
+    import model_artifact
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
 
 class CropRecommendationModel:
-    def __init__(self):
+    def __init__(self, deterministic=False, engine_mode='exact', lookup_resolution=1000):
+        # Deterministic mode drops the random probability variation so the
+        # same input always gives the same (cacheable) prediction
+        self.deterministic = deterministic
+        # 'exact' scores with SimilarityEngine, 'lookup' with the precomputed
+        # LookupTableEngine (see lookup_engine.py for its error bound)
+        if engine_mode not in ('exact', 'lookup'):
+            raise ValueError(f"Unknown engine mode: {engine_mode}")
+        self.engine_mode = engine_mode
+        self.lookup_resolution = lookup_resolution
+        # Bumped whenever the requirements are reloaded
+        self.model_version = 0
+        self.model_path = None
         self.feature_columns = [
             'N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall'
         ]
@@ -40,7 +59,20 @@ class CropRecommendationModel:
             'jute': [70, 40, 50, 30, 80, 6.8, 180],
             'coffee': [40, 30, 30, 22, 80, 6.0, 200]
         }
+        self._engine = None
         
+    @property
+    def engine(self):
+        """Vectorized scoring engine built from crop_requirements (None without numpy)"""
+        if not NUMPY_AVAILABLE:
+            return None
+        if self._engine is None:
+            if self.engine_mode == 'lookup':
+                self._engine = LookupTableEngine(self.crop_requirements, resolution=self.lookup_resolution)
+            else:
+                self._engine = SimilarityEngine(self.crop_requirements)
+        return self._engine
+    
     def calculate_similarity(self, input_features, crop_requirements):
         """Calculate similarity between input and crop requirements"""
         total_score = 0
@@ -72,22 +104,42 @@ class CropRecommendationModel:
         if len(features) != 7:
             raise ValueError("Exactly 7 features required: N, P, K, temperature, humidity, ph, rainfall")
         
-        # Calculate similarity scores for all crops
-        crop_scores = {}
-        for crop, requirements in self.crop_requirements.items():
-            score = self.calculate_similarity(features, requirements)
-            crop_scores[crop] = score
+        if self.engine is not None:
+            sorted_crops = self.engine.rank(features, k=3)
+        else:
+            # Calculate similarity scores for all crops
+            crop_scores = {}
+            for crop, requirements in self.crop_requirements.items():
+                score = self.calculate_similarity(features, requirements)
+                crop_scores[crop] = score
+            
+            # Sort crops by score (highest first)
+            sorted_crops = sorted(crop_scores.items(), key=lambda x: x[1], reverse=True)
         
-        # Sort crops by score (highest first)
-        sorted_crops = sorted(crop_scores.items(), key=lambda x: x[1], reverse=True)
+        return self._format_prediction(sorted_crops)
+    
+    def predict_batch(self, features_list):
+        """Predict crops for many inputs at once, scoring the whole batch in one pass"""
+        for features in features_list:
+            if len(features) != 7:
+                raise ValueError("Exactly 7 features required: N, P, K, temperature, humidity, ph, rainfall")
+        if not features_list:
+            return []
         
+        if self.engine is None:
+            return [self.predict_crop(features) for features in features_list]
+        
+        return [self._format_prediction(ranked) for ranked in self.engine.rank(features_list, k=3)]
+    
+    def _format_prediction(self, sorted_crops):
+        """Turn crops ranked by similarity score into the prediction response"""
         # Get top 3 predictions with probabilities
         top_predictions = []
         for i, (crop, score) in enumerate(sorted_crops[:3]):
             # Convert score to percentage (with some randomness for realism)
             base_prob = score * 100
             # Add some variation to make it more realistic
-            variation = random.uniform(-5, 5)
+            variation = 0 if self.deterministic else random.uniform(-5, 5)
             probability = max(10, min(95, base_prob + variation))
             
             top_predictions.append({
@@ -120,18 +172,43 @@ class CropRecommendationModel:
             json.dump(model_data, f, indent=2)
         print(f"Model data saved to {filepath}")
     
+    def save_artifact(self, filepath='crop_model.kmdl'):
+        """Save model data as a compiled, memory-mappable model artifact"""
+        if not NUMPY_AVAILABLE:
+            raise ImportError("Saving model artifacts requires numpy")
+        section, arrays = model_artifact.similarity_section(
+            self.crop_requirements, self.feature_columns, self.crop_labels
+        )
+        model_artifact.write_artifact(filepath, {'similarity': section}, arrays)
+        print(f"Model artifact saved to {filepath}")
+    
     def load_model(self, filepath='crop_model.json'):
-        """Load model data from JSON file"""
+        """Load model data from a JSON file or a compiled model artifact"""
         if not os.path.exists(filepath):
             print(f"Model file {filepath} not found, using default data")
             return
         
-        with open(filepath, 'r') as f:
-            model_data = json.load(f)
+        engine = None
+        if NUMPY_AVAILABLE and model_artifact.is_artifact(filepath):
+            metadata, arrays = model_artifact.read_artifact(filepath)
+            section = model_artifact.similarity_from_artifact(metadata, arrays)
+            if section is None:
+                raise ValueError(f"{filepath} does not contain a similarity model")
+            crop_names, requirements, model_data = section
+            model_data = dict(model_data, crop_requirements=dict(zip(crop_names, requirements.tolist())))
+            if self.engine_mode == 'exact':
+                # Score straight from the memory-mapped table
+                engine = SimilarityEngine.from_arrays(crop_names, requirements)
+        else:
+            with open(filepath, 'r') as f:
+                model_data = json.load(f)
         
+        self.model_path = filepath
         self.feature_columns = model_data['feature_columns']
         self.crop_labels = model_data['crop_labels']
         self.crop_requirements = model_data['crop_requirements']
+        self._engine = engine
+        self.model_version += 1
         print(f"Model data loaded from {filepath}")
 
 if __name__ == "__main__":
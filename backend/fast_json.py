@@ -0,0 +1,63 @@
+"""Optional faster JSON encoding and decoding.
+
+Uses orjson when it is installed and the standard library otherwise.
+OrjsonProvider plugs orjson into Flask for request.get_json() and jsonify().
+"""
+import json
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+from flask.json.provider import DefaultJSONProvider
+
+# Values accepted by the JSON_ENGINE setting
+JSON_ENGINES = ('auto', 'orjson', 'std')
+
+
+def resolve_engine(engine):
+    """Map a JSON_ENGINE setting to the engine that will actually be used"""
+    if engine not in JSON_ENGINES:
+        raise ValueError(f"Unknown JSON_ENGINE: {engine}")
+    if engine == 'orjson' and not ORJSON_AVAILABLE:
+        raise ValueError("JSON_ENGINE=orjson requires orjson: pip install orjson")
+    if engine == 'auto':
+        return 'orjson' if ORJSON_AVAILABLE else 'std'
+    return engine
+
+
+def loads(data, engine='std'):
+    if engine == 'orjson':
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, engine='std'):
+    """Serialize obj to UTF-8 JSON bytes"""
+    if engine == 'orjson':
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj).encode('utf-8')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    Keys are not sorted and responses are never pretty-printed. Types
+    orjson does not handle natively fall back to Flask's default encoder.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return self._dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps(obj), mimetype=self.mimetype)
+
+    def _dumps(self, obj):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,84 @@
+"""Declarative schema for the model's input features and a validator compiled from it.
+
+FEATURE_SCHEMA is the single source of the feature names, their order in
+the model input, accepted ranges, units and error messages.
+"""
+from collections import namedtuple
+
+Feature = namedtuple('Feature', ['name', 'low', 'high', 'unit', 'message'])
+
+# In model input order
+FEATURE_SCHEMA = [
+    Feature('N', 0, 200, 'kg/ha', 'N (Nitrogen) must be between 0 and 200'),
+    Feature('P', 0, 200, 'kg/ha', 'P (Phosphorus) must be between 0 and 200'),
+    Feature('K', 0, 200, 'kg/ha', 'K (Potassium) must be between 0 and 200'),
+    Feature('temperature', 0, 50, '°C', 'Temperature must be between 0 and 50°C'),
+    Feature('humidity', 0, 100, '%', 'Humidity must be between 0 and 100%'),
+    Feature('ph', 0, 14, 'pH', 'pH must be between 0 and 14'),
+    Feature('rainfall', 0, 500, 'mm', 'Rainfall must be between 0 and 500mm'),
+]
+
+
+class FeatureValidator:
+    """Validate request payloads against a feature schema.
+
+    Valid payloads are converted and range-checked in a single pass over
+    the features. Only when that pass fails is the payload checked again in
+    order (missing fields, then types, then ranges) to report the same
+    first error as always.
+    """
+
+    def __init__(self, schema=None):
+        self.schema = list(schema or FEATURE_SCHEMA)
+        self.names = [feature.name for feature in self.schema]
+        self._bounds = [(feature.low, feature.high) for feature in self.schema]
+
+    def validate(self, data):
+        """Return (features, None) for a valid payload or (None, error_message)"""
+        try:
+            features = [float(data[name]) for name in self.names]
+        except (KeyError, TypeError, ValueError):
+            return None, self._first_error(data)
+        for value, (low, high) in zip(features, self._bounds):
+            if not (low <= value <= high):
+                return None, self._first_error(data)
+        return features, None
+
+    def validate_batch(self, items):
+        """Validate every item in one pass.
+
+        Returns (valid_indices, valid_features, errors) where errors maps
+        an item's index to its error message.
+        """
+        valid_indices = []
+        valid_features = []
+        errors = {}
+        validate = self.validate
+        for i, item in enumerate(items):
+            features, error = validate(item)
+            if error:
+                errors[i] = error
+            else:
+                valid_indices.append(i)
+                valid_features.append(features)
+        return valid_indices, valid_features, errors
+
+    def _first_error(self, data):
+        if not isinstance(data, dict):
+            return 'Input parameters must be a JSON object'
+
+        # Validate required fields
+        for name in self.names:
+            if name not in data:
+                return f'Missing required field: {name}'
+
+        # Validate data types and ranges
+        try:
+            features = [float(data[name]) for name in self.names]
+        except (ValueError, TypeError):
+            return 'All parameters must be numeric values'
+
+        for value, feature in zip(features, self.schema):
+            if not (feature.low <= value <= feature.high):
+                return feature.message
+        return None
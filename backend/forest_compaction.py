@@ -0,0 +1,258 @@
+"""Shrink an exported RandomForest for memory-constrained deployments.
+
+A compact forest is exported from the trained scikit-learn model with
+fewer trees (the least accurate on held-out data are dropped), pruned
+depth and leaf sizes (see forest_engine.export_forest), float32 split
+thresholds, integer-quantized leaf probabilities and the narrowest index
+dtypes that fit. ForestEngine and ForestModel serve the result unchanged.
+
+compaction_report() measures size, latency and accuracy loss for a list
+of settings so an operating point can be picked:
+
+    python forest_compaction.py crop_model.pkl --report
+    python forest_compaction.py crop_model.pkl --trees 50 --max-depth 12 -o crop_forest.npz
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from forest_engine import QUANTIZED_FORMAT_VERSION, ForestEngine, export_forest, save_forest
+
+THRESHOLD_DTYPES = ['float64', 'float32', 'float16']
+VALUE_DTYPES = ['float64', 'float32', 'float16', 'uint16', 'uint8']
+
+# Settings compared by --report, from the full forest down to the smallest
+COMPACTION_SETTINGS = [
+    {'name': 'full'},
+    {'name': 'float32', 'threshold_dtype': 'float32', 'value_dtype': 'float32'},
+    {'name': 'uint8 leaves', 'threshold_dtype': 'float32', 'value_dtype': 'uint8'},
+    {'name': 'depth 12', 'max_depth': 12, 'threshold_dtype': 'float32', 'value_dtype': 'uint8'},
+    {'name': 'depth 10, leaf 5', 'max_depth': 10, 'min_samples_leaf': 5,
+     'threshold_dtype': 'float32', 'value_dtype': 'uint8'},
+    {'name': '50 trees, depth 10', 'n_trees': 50, 'max_depth': 10,
+     'threshold_dtype': 'float32', 'value_dtype': 'uint8'},
+    {'name': '25 trees, depth 8', 'n_trees': 25, 'max_depth': 8,
+     'threshold_dtype': 'float32', 'value_dtype': 'uint8'},
+]
+
+
+def tree_accuracy(forest, X, y):
+    """Held-out accuracy of each tree of a fitted RandomForestClassifier on its own"""
+    index = {str(c): i for i, c in enumerate(forest.classes_)}
+    y_index = np.asarray([index[str(label)] for label in y])
+    X = np.asarray(X, dtype=np.float32)
+    return np.asarray([np.mean(estimator.predict(X).astype(np.int64) == y_index)
+                       for estimator in forest.estimators_])
+
+
+def select_trees(forest, n_trees, X, y):
+    """Indices of the n_trees most accurate trees, in their original order"""
+    if n_trees is None or n_trees >= len(forest.estimators_):
+        return None
+    if X is None:
+        raise ValueError("Dropping trees needs held-out data to rank them")
+    ranked = np.argsort(-tree_accuracy(forest, X, y), kind='stable')
+    return np.sort(ranked[:n_trees]).tolist()
+
+
+def _round_down(values, dtype):
+    """Cast to a narrower float, rounding toward -inf.
+
+    For inputs representable in dtype, x <= t and x <= result agree, so
+    float32 thresholds make the same decisions as the originals.
+    """
+    narrow = values.astype(dtype)
+    over = narrow.astype(np.float64) > values
+    narrow[over] = np.nextafter(narrow[over], np.asarray(-np.inf, dtype=dtype))
+    return narrow
+
+
+def _narrow_int(largest):
+    """Smallest signed integer dtype that holds -1..largest"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if largest <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def quantize_forest(arrays, threshold_dtype='float32', value_dtype='uint8'):
+    """Return exported forest arrays with narrower dtypes.
+
+    Integer value dtypes store each leaf probability scaled to the dtype's
+    maximum; the scale is kept in 'leaf_scale'.
+    """
+    arrays = dict(arrays)
+    if threshold_dtype != 'float64':
+        arrays['threshold'] = _round_down(arrays['threshold'], np.dtype(threshold_dtype))
+    value_dtype = np.dtype(value_dtype)
+    if value_dtype.kind == 'u':
+        scale = np.iinfo(value_dtype).max
+        arrays['leaf_value'] = np.round(arrays['leaf_value'] * scale).astype(value_dtype)
+        arrays['leaf_scale'] = np.float64(scale)
+        arrays['format_version'] = np.int64(QUANTIZED_FORMAT_VERSION)
+    elif value_dtype != np.float64:
+        arrays['leaf_value'] = arrays['leaf_value'].astype(value_dtype)
+    arrays['feature'] = arrays['feature'].astype(_narrow_int(int(arrays['feature'].max(initial=0))))
+    # Node and leaf indices share one dtype so traversal never mixes widths
+    index_dtype = _narrow_int(max(len(arrays['left']), len(arrays['leaf_value'])))
+    for name in ('left', 'right', 'leaf_slot', 'roots'):
+        arrays[name] = arrays[name].astype(index_dtype)
+    return arrays
+
+
+def compact_forest(forest, feature_columns=None, n_trees=None, max_depth=None, min_samples_leaf=1,
+                   threshold_dtype='float64', value_dtype='float64', X=None, y=None):
+    """Export a fitted forest with the given compaction applied.
+
+    X and y are held-out data, needed only when n_trees drops trees.
+    """
+    trees = select_trees(forest, n_trees, X, y)
+    arrays = export_forest(forest, feature_columns, trees, max_depth, min_samples_leaf)
+    if threshold_dtype == 'float64' and value_dtype == 'float64':
+        return arrays
+    return quantize_forest(arrays, threshold_dtype, value_dtype)
+
+
+def forest_nbytes(arrays):
+    """Bytes of node and leaf data, about the size of the artifact on disk"""
+    return ForestEngine(arrays).nbytes
+
+
+def measure(arrays, X, y, repeats=200):
+    """Accuracy, single-input latency and batch throughput of exported forest arrays"""
+    engine = ForestEngine(arrays)
+    predicted = np.asarray(engine.classes)[np.argmax(engine.predict_proba(X), axis=1)]
+    accuracy = float(np.mean(predicted == np.asarray(y).astype(str)))
+
+    single = []
+    for row in X[:repeats]:
+        started = time.perf_counter()
+        engine.predict_proba([row])
+        single.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    engine.predict_proba(X)
+    batch = time.perf_counter() - started
+
+    return {
+        'trees': engine.n_trees,
+        'nodes': len(engine.feature),
+        'max_depth': engine.max_depth,
+        'size_kb': round(engine.nbytes / 1024, 1),
+        'single_ms': round(float(np.median(single)) * 1000, 3),
+        'batch_us_per_row': round(batch / len(X) * 1e6, 3),
+        'accuracy': round(accuracy, 4)
+    }
+
+
+def split_holdout(X, y):
+    """((X, y) that ranks trees, (X, y) that scores settings): the two halves of held-out data"""
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    half = len(X) // 2
+    return (X[:half], y[:half]), (X[half:], y[half:])
+
+
+def compaction_report(forest, feature_columns, X, y, settings=None):
+    """Measure every setting on held-out data.
+
+    The first half of X ranks trees for settings that drop some; all
+    settings are scored on the second half (see split_holdout).
+    accuracy_loss is relative to the first setting.
+    """
+    (X_rank, y_rank), (X_score, y_score) = split_holdout(X, y)
+    rows = []
+    for setting in settings or COMPACTION_SETTINGS:
+        options = {key: value for key, value in setting.items() if key != 'name'}
+        arrays = compact_forest(forest, feature_columns, X=X_rank, y=y_rank, **options)
+        row = {'name': setting.get('name', str(options))}
+        row.update(measure(arrays, X_score, y_score))
+        rows.append(row)
+    baseline = rows[0]['accuracy'] if rows else 0.0
+    for row in rows:
+        row['accuracy_loss'] = round(baseline - row['accuracy'], 4)
+    return rows
+
+
+def format_report(rows):
+    columns = ['name', 'trees', 'nodes', 'max_depth', 'size_kb', 'single_ms', 'batch_us_per_row',
+               'accuracy', 'accuracy_loss']
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    lines = ['  '.join(column.ljust(width) for column, width in zip(columns, widths))]
+    for row in rows:
+        lines.append('  '.join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+    return '\n'.join(lines)
+
+
+def load_holdout(data_path=None, feature_columns=None, label_column='label', samples=4400, seed=7):
+    """Held-out (X, y): read from a CSV/Parquet file, or freshly drawn synthetic samples"""
+    import pandas as pd
+
+    if data_path:
+        columns = list(feature_columns) + [label_column]
+        if data_path.endswith(('.parquet', '.pq')):
+            df = pd.read_parquet(data_path, columns=columns)
+        else:
+            df = pd.read_csv(data_path, usecols=columns)
+        df = df.dropna()
+    else:
+        from crop_model import CropRecommendationModel
+        df = CropRecommendationModel().create_sample_data(n_samples=samples, random_state=seed)
+    # Shuffle so both halves cover every crop
+    df = df.sample(frac=1.0, random_state=seed)
+    return df[list(feature_columns)].to_numpy(dtype=np.float32), df[label_column].astype(str).to_numpy()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact a trained RandomForest for serving")
+    parser.add_argument('model', help="Trained model pickle (crop_model.pkl)")
+    parser.add_argument('--report', action='store_true', help="Compare size, latency and accuracy of preset settings")
+    parser.add_argument('--data', help="Held-out CSV/Parquet data (default: fresh synthetic samples)")
+    parser.add_argument('--label-column', default='label')
+    parser.add_argument('--samples', type=int, default=4400, help="Synthetic held-out samples (default: 4400)")
+    parser.add_argument('--seed', type=int, default=7, help="Seed for synthetic held-out samples (default: 7)")
+    parser.add_argument('--trees', type=int, default=None, help="Keep the most accurate N trees")
+    parser.add_argument('--max-depth', type=int, default=None)
+    parser.add_argument('--min-samples-leaf', type=int, default=1)
+    parser.add_argument('--threshold-dtype', choices=THRESHOLD_DTYPES, default='float32')
+    parser.add_argument('--value-dtype', choices=VALUE_DTYPES, default='uint8')
+    parser.add_argument('-o', '--output', default='crop_forest.npz',
+                        help="Compacted forest .npz, or a .kmdl artifact (default: crop_forest.npz)")
+    args = parser.parse_args(argv)
+
+    import joblib
+    try:
+        model_data = joblib.load(args.model)
+        forest, feature_columns = model_data['model'], model_data['feature_columns']
+        X, y = load_holdout(args.data, feature_columns, args.label_column, args.samples, args.seed)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    if args.report:
+        print(format_report(compaction_report(forest, feature_columns, X, y)))
+        return 0
+
+    settings = {'name': 'full'}, {
+        'name': 'compacted', 'n_trees': args.trees, 'max_depth': args.max_depth,
+        'min_samples_leaf': args.min_samples_leaf, 'threshold_dtype': args.threshold_dtype,
+        'value_dtype': args.value_dtype
+    }
+    print(format_report(compaction_report(forest, feature_columns, X, y, settings)))
+    # Trees ranked on the same half as the report, so it describes the file written
+    (X_rank, y_rank), _ = split_holdout(X, y)
+    arrays = compact_forest(forest, feature_columns, args.trees, args.max_depth, args.min_samples_leaf,
+                            args.threshold_dtype, args.value_dtype, X_rank, y_rank)
+    if args.output.endswith('.kmdl'):
+        import model_artifact
+        section, section_arrays = model_artifact.forest_section(arrays)
+        model_artifact.write_artifact(args.output, {'forest': section}, section_arrays)
+    else:
+        save_forest(arrays, args.output)
+    print(f"Compacted forest written to {args.output} ({forest_nbytes(arrays):,} bytes of arrays)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""Array-based RandomForest inference without scikit-learn.
+
+export_forest() flattens a trained RandomForestClassifier into compact
+NumPy node arrays and ForestEngine evaluates every tree for a whole batch
+of inputs in one vectorized pass, giving class probabilities that match
+RandomForestClassifier.predict_proba. ForestModel wraps the engine with the
+same predict_crop/predict_batch interface as CropRecommendationModel so a
+serving process only needs numpy.
+"""
+import heapq
+import math
+import os
+
+import numpy as np
+
+FOREST_FORMAT_VERSION = 1
+# Leaf probabilities stored as integers, divided by leaf_scale when evaluated
+QUANTIZED_FORMAT_VERSION = 2
+
+# Trees an early-exit margin is first checked after; a single tree's
+# leaves are nearly pure, so the margin would otherwise stop at once
+EARLY_EXIT_MIN_TREES = 10
+
+
+def export_forest(forest, feature_columns=None, trees=None, max_depth=None, min_samples_leaf=1):
+    """Flatten a fitted RandomForestClassifier into node arrays.
+
+    All trees are concatenated into one node table. Leaves point to
+    themselves, so a fixed number of traversal steps (the forest depth)
+    lands every input on a leaf without per-node branching.
+
+    trees selects a subset of the estimators by index. max_depth and
+    min_samples_leaf prune each tree on export: nodes at max_depth, and
+    splits leaving fewer than min_samples_leaf training samples on either
+    side, become leaves with the class distribution of their samples.
+    """
+    features, thresholds, lefts, rights, leaf_slots, leaf_values, roots = [], [], [], [], [], [], []
+    node_offset = 0
+    leaf_offset = 0
+    forest_depth = 0
+    estimators = forest.estimators_ if trees is None else [forest.estimators_[i] for i in trees]
+
+    for estimator in estimators:
+        tree = estimator.tree_
+        kept, is_leaf, depth = _prune_tree(tree, max_depth, min_samples_leaf)
+        n_nodes = len(kept)
+        own = np.arange(n_nodes)
+        renumber = np.full(tree.node_count, -1, dtype=np.int64)
+        renumber[kept] = own
+        left = renumber[np.maximum(tree.children_left[kept], 0)]
+        right = renumber[np.maximum(tree.children_right[kept], 0)]
+
+        features.append(np.where(is_leaf, 0, tree.feature[kept]))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold[kept]))
+        lefts.append(np.where(is_leaf, own, left) + node_offset)
+        rights.append(np.where(is_leaf, own, right) + node_offset)
+
+        slots = np.full(n_nodes, -1, dtype=np.int64)
+        slots[is_leaf] = np.arange(is_leaf.sum()) + leaf_offset
+        leaf_slots.append(slots)
+        leaf_values.append(_leaf_probabilities(tree.value[kept[is_leaf], 0, :]))
+
+        roots.append(node_offset)
+        node_offset += n_nodes
+        leaf_offset += int(is_leaf.sum())
+        forest_depth = max(forest_depth, depth)
+
+    return {
+        'format_version': np.int64(FOREST_FORMAT_VERSION),
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'left': np.concatenate(lefts).astype(np.int32),
+        'right': np.concatenate(rights).astype(np.int32),
+        'leaf_slot': np.concatenate(leaf_slots).astype(np.int32),
+        'leaf_value': np.concatenate(leaf_values).astype(np.float64),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'max_depth': np.int64(forest_depth),
+        'classes': np.asarray([str(c) for c in forest.classes_]),
+        'feature_columns': np.asarray(feature_columns or [], dtype=str),
+    }
+
+
+def _prune_tree(tree, max_depth=None, min_samples_leaf=1):
+    """Return (kept node ids in order, leaf mask over them, depth) for one tree"""
+    left = tree.children_left
+    right = tree.children_right
+    is_leaf = left < 0
+    if max_depth is None and min_samples_leaf <= 1:
+        return np.arange(tree.node_count), is_leaf, int(tree.max_depth)
+
+    is_leaf = is_leaf.copy()
+    if min_samples_leaf > 1:
+        split = np.flatnonzero(~is_leaf)
+        samples = tree.n_node_samples
+        is_leaf[split] = (samples[left[split]] < min_samples_leaf) | (samples[right[split]] < min_samples_leaf)
+
+    # Walk down level by level; children always have higher ids than their parent
+    levels = []
+    frontier = np.zeros(1, dtype=np.int64)
+    depth = 0
+    while True:
+        if max_depth is not None and depth >= max_depth:
+            is_leaf[frontier] = True
+        levels.append(frontier)
+        inner = frontier[~is_leaf[frontier]]
+        if not len(inner):
+            break
+        frontier = np.concatenate([left[inner], right[inner]])
+        depth += 1
+    kept = np.sort(np.concatenate(levels))
+    return kept, is_leaf[kept], depth
+
+
+def _leaf_probabilities(values):
+    """Per-leaf class probabilities exactly as the tree's predict_proba returns them.
+
+    Older scikit-learn stores weighted class counts and normalizes at
+    predict time; newer versions store the fractions directly. Rows that
+    already sum to 1 are left untouched so no rounding is introduced.
+    """
+    values = np.array(values, dtype=np.float64)
+    sums = values.sum(axis=1)
+    counts = np.abs(sums - 1.0) > 1e-9
+    normalizer = sums[counts]
+    normalizer[normalizer == 0.0] = 1.0
+    values[counts] /= normalizer[:, np.newaxis]
+    return values
+
+
+def save_forest(arrays, filepath='crop_forest.npz'):
+    """Save exported forest arrays to a .npz file"""
+    np.savez(filepath, **arrays)
+
+
+def load_forest(filepath='crop_forest.npz'):
+    """Load forest arrays saved by save_forest"""
+    with np.load(filepath, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    if int(arrays.get('format_version', -1)) not in (FOREST_FORMAT_VERSION, QUANTIZED_FORMAT_VERSION):
+        raise ValueError(f"Unsupported forest format in {filepath}")
+    return arrays
+
+
+class ForestEngine:
+    """Vectorized evaluation of a flattened RandomForest"""
+
+    def __init__(self, arrays):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.leaf_slot = arrays['leaf_slot']
+        self.leaf_value = arrays['leaf_value']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.leaf_scale = float(arrays.get('leaf_scale', 1.0))
+        self.classes = [str(c) for c in arrays['classes']]
+        self._nodes = None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right,
+                                      self.leaf_slot, self.leaf_value, self.roots))
+
+    def apply(self, X, roots=None):
+        """Return the leaf node reached in each tree, shape (n_samples, n_trees)"""
+        roots = self.roots if roots is None else roots
+        X = _as_input(X)
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.broadcast_to(roots, (X.shape[0], len(roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            next_nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            if np.array_equal(next_nodes, nodes):
+                break
+            nodes = next_nodes
+        return nodes
+
+    def predict_proba(self, X):
+        """Class probabilities averaged over all trees, shape (n_samples, n_classes)"""
+        leaves = self.apply(X)
+        votes = self.leaf_value[self.leaf_slot[leaves]]
+        # Summing over the tree axis adds trees in order, like the forest does
+        return votes.sum(axis=1, dtype=np.float64) / (self.n_trees * self.leaf_scale)
+
+    def _node_lists(self):
+        # Walking one node at a time is much faster on tuples in a list than on array elements.
+        # Leaves keep only their nonzero (class, value) pairs; most leaves hold one class
+        if self._nodes is None:
+            nodes = list(zip(self.feature.tolist(), self.threshold.tolist(), self.left.tolist(), self.right.tolist()))
+            leaf_classes = [[(c, v) for c, v in enumerate(row) if v] for row in self.leaf_value.tolist()]
+            self._nodes = (nodes, self.leaf_slot.tolist(), leaf_classes)
+        return self._nodes
+
+    def predict_proba_early(self, features, top_k=1, margin=0.0, min_trees=EARLY_EXIT_MIN_TREES):
+        """Class probabilities for one input from as few trees as decide its top_k ranking.
+
+        Trees are walked one at a time. Evaluation stops once every gap
+        between the input's top_k + 1 vote totals is larger than the number
+        of trees left (a tree adds at most 1 to a class), so the top_k
+        ranking is the one the full forest gives. With a margin, it also
+        stops once at least min_trees trees put the leading class's
+        averaged probability margin ahead of the runner-up.
+
+        The probabilities are averaged over the trees evaluated only, so
+        they are partial averages, not the full forest's.
+
+        Returns (probabilities, trees evaluated).
+        """
+        x = _as_input(features)[0].tolist()
+        nodes, leaf_slot, leaf_classes = self._node_lists()
+        n_trees = self.n_trees
+        totals = [0.0] * self.leaf_value.shape[1]
+        ranks = min(top_k + 1, len(totals))
+        scale = self.leaf_scale
+        done = 0
+        # Trees needed before a stopping rule can hold; each tree widens a gap by at most 1
+        next_check = min(n_trees // 2 + 1, min_trees if margin else n_trees)
+        for node in self.roots.tolist():
+            # Leaves point to themselves
+            f, threshold, left, right = nodes[node]
+            while left != node:
+                node = left if x[f] <= threshold else right
+                f, threshold, left, right = nodes[node]
+            for c, value in leaf_classes[leaf_slot[node]]:
+                totals[c] += value
+            done += 1
+            if done < next_check or done == n_trees or ranks < 2:
+                continue
+            ranked = heapq.nlargest(ranks, totals)
+            gap = min(ranked[i] - ranked[i + 1] for i in range(ranks - 1)) / scale
+            trees_left = n_trees - done
+            if gap > trees_left:
+                break
+            # The gap can reach trees_left after (trees_left - gap) / 2 more trees at the earliest
+            wait = int((trees_left - gap) // 2) + 1
+            if margin and done >= min_trees:
+                lead = (ranked[0] - ranked[1]) / scale
+                if lead >= margin * done:
+                    break
+                if margin < 1:
+                    wait = min(wait, max(1, math.ceil((margin * done - lead) / (1 - margin))))
+            next_check = done + wait
+        return np.asarray(totals) / (done * scale), done
+
+    def predict(self, X):
+        return [self.classes[i] for i in np.argmax(self.predict_proba(X), axis=1)]
+
+
+def _as_input(X):
+    # Trees compare float32 inputs against float64 thresholds, as scikit-learn does
+    X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+    return X.astype(np.float64)
+
+
+class ForestModel:
+    """Serve RandomForest predictions from exported arrays, without scikit-learn"""
+
+    def __init__(self, arrays=None, early_exit_margin=None, early_exit_top_k=1):
+        self.feature_columns = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+        self.crop_labels = []
+        self.engine = None
+        # None evaluates every tree; see ForestEngine.predict_proba_early
+        self.early_exit_margin = early_exit_margin
+        self.early_exit_top_k = early_exit_top_k
+        if arrays is not None:
+            self._set_arrays(arrays)
+
+    def _set_arrays(self, arrays):
+        self.engine = ForestEngine(arrays)
+        self.crop_labels = list(self.engine.classes)
+        if len(arrays.get('feature_columns', [])):
+            self.feature_columns = [str(c) for c in arrays['feature_columns']]
+
+    def predict_crop(self, features):
+        """Predict crop based on input features"""
+        if len(features) != len(self.feature_columns):
+            raise ValueError("Exactly 7 features required: N, P, K, temperature, humidity, ph, rainfall")
+        return self.predict_batch([features])[0]
+
+    def predict_batch(self, features_list):
+        """Predict crops for many inputs with one pass over the forest"""
+        if self.engine is None:
+            raise ValueError("Model not loaded yet. Please load an exported forest first.")
+        if not len(features_list):
+            return []
+        return forest_predictions(self.engine, features_list, self.crop_labels,
+                                  self.early_exit_margin, self.early_exit_top_k)
+
+    def load_model(self, filepath='crop_forest.npz'):
+        """Load exported forest arrays from .npz or a compiled model artifact"""
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"Model file {filepath} not found")
+        import model_artifact
+        if model_artifact.is_artifact(filepath):
+            arrays = model_artifact.forest_from_artifact(*model_artifact.read_artifact(filepath))
+            if arrays is None:
+                raise ValueError(f"{filepath} does not contain a forest model")
+        else:
+            arrays = load_forest(filepath)
+        self._set_arrays(arrays)
+        print(f"Forest loaded from {filepath}")
+
+
+def forest_predictions(engine, features_list, crop_labels, early_exit_margin=None, early_exit_top_k=1):
+    """Prediction responses from a ForestEngine.
+
+    With an early_exit_margin (0 for the exact bound only), a single input
+    walks trees one at a time until its top early_exit_top_k ranking is
+    decided or the margin is reached (see ForestEngine.predict_proba_early),
+    and every prediction reports its trees_evaluated. Batches are cheaper
+    in one vectorized pass over every tree.
+    """
+    if early_exit_margin is None:
+        return format_predictions(engine.predict_proba(features_list), crop_labels)
+    if len(features_list) == 1:
+        probabilities, trees = engine.predict_proba_early(features_list[0], early_exit_top_k, early_exit_margin)
+        probabilities = probabilities[np.newaxis, :]
+        evaluated = [trees]
+    else:
+        probabilities = engine.predict_proba(features_list)
+        evaluated = [engine.n_trees] * len(probabilities)
+    predictions = format_predictions(probabilities, crop_labels)
+    for prediction, trees in zip(predictions, evaluated):
+        prediction['trees_evaluated'] = trees
+    return predictions
+
+
+def format_predictions(probabilities, crop_labels):
+    """Build the prediction response for each row of class probabilities.
+
+    The recommended crop and the top 3 both come from the same
+    probabilities, so the forest is evaluated only once.
+    """
+    top_indices = np.argsort(probabilities, axis=1)[:, -3:][:, ::-1]
+    best = np.argmax(probabilities, axis=1)
+    predictions = []
+    for row, top, label in zip(probabilities.tolist(), top_indices.tolist(), best.tolist()):
+        predictions.append({
+            'recommended_crop': crop_labels[label],
+            'top_predictions': [
+                {'crop': crop_labels[idx], 'probability': round(row[idx] * 100, 2)}
+                for idx in top
+            ]
+        })
+    return predictions
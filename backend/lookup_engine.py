@@ -0,0 +1,85 @@
+import numpy as np
+
+from similarity_engine import SimilarityEngine
+
+# Input range covered by the tables for each feature; matches the API's
+# validation limits (N, P, K, temperature, humidity, ph, rainfall)
+FEATURE_RANGES = [(0, 200), (0, 200), (0, 200), (0, 50), (0, 100), (0, 14), (0, 500)]
+
+
+class LookupTableEngine(SimilarityEngine):
+    """Similarity scoring from precomputed per-feature lookup tables.
+
+    The similarity score is a weighted sum of independent 1-D terms
+    max(0, 1 - |x_i - c_i| / scale_i), so each feature's weighted
+    contribution to every crop's score is tabulated once over a grid of
+    `resolution` points spanning the feature's range. Scoring an input is
+    then 7 table gathers plus a sum over the catalog.
+
+    Inputs are snapped to the nearest grid point, at most step_i / 2 away.
+    Each term changes by at most |dx| / scale_i, so for inputs inside
+    FEATURE_RANGES the score differs from the exact engine by at most
+
+        max_error = sum_i(weight_i * step_i / (2 * scale_i)) / sum(weights)
+
+    (about 0.0014, i.e. 0.14 percentage points, at the default resolution
+    of 1000). Inputs outside the ranges are clamped to the nearest edge.
+    """
+
+    def __init__(self, crop_requirements, resolution=1000, ranges=None, scales=None, weights=None):
+        super().__init__(crop_requirements, scales=scales, weights=weights)
+        if resolution < 2:
+            raise ValueError("Lookup table resolution must be at least 2")
+        self.resolution = resolution
+        if ranges is None:
+            ranges = FEATURE_RANGES
+        ranges = np.asarray(ranges, dtype=np.float64)
+        self.lows = ranges[:, 0]
+        self.steps = (ranges[:, 1] - ranges[:, 0]) / (resolution - 1)
+
+        # One (n_features * resolution, n_crops) table; feature i owns rows
+        # [i * resolution, (i + 1) * resolution)
+        n_features = self.requirements.shape[1]
+        grid = self.lows[:, None] + self.steps[:, None] * np.arange(resolution)
+        diff = np.abs(grid[:, :, None] - self.requirements.T[:, None, :])
+        terms = np.maximum(0.0, 1.0 - diff / self.scales[:, None, None])
+        terms *= (self.weights / self.weight_sum)[:, None, None]
+        self.table = np.ascontiguousarray(terms.reshape(n_features * resolution, -1))
+        self.offsets = np.arange(n_features) * resolution
+        # Plain-Python copies for the single-input fast path
+        self._lows = self.lows.tolist()
+        self._steps = self.steps.tolist()
+        self._offsets = self.offsets.tolist()
+
+    @property
+    def max_error(self):
+        """Upper bound on |lookup score - exact score| for in-range inputs"""
+        return float(np.sum(self.weights * self.steps / (2 * self.scales)) / self.weight_sum)
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def score(self, inputs):
+        """Score inputs against every crop using table gathers.
+
+        Accepts a single feature vector of shape (7,) or a batch of shape
+        (n, 7) and returns an array of shape (n_crops,) or (n, n_crops).
+        """
+        X = np.asarray(inputs, dtype=np.float64)
+        if X.shape[-1] != self.requirements.shape[1]:
+            raise ValueError("Exactly 7 features required: N, P, K, temperature, humidity, ph, rainfall")
+
+        last = self.resolution - 1
+        if X.ndim == 1:
+            # Computing 7 row indices in Python beats numpy call overhead
+            rows = [
+                offset + min(max(int((value - low) / step + 0.5), 0), last)
+                for value, low, step, offset in zip(X.tolist(), self._lows, self._steps, self._offsets)
+            ]
+            return np.add.reduce(self.table.take(rows, axis=0), axis=0)
+
+        idx = np.floor((X - self.lows) / self.steps + 0.5).astype(np.intp)
+        np.clip(idx, 0, last, out=idx)
+        idx += self.offsets
+        return self.table[idx].sum(axis=1)
@@ -0,0 +1,297 @@
+"""In-process metrics with Prometheus text exposition.
+
+Counters and histograms keep one shard per thread, so recording a value
+never takes a lock; shards are only merged when /metrics is scraped.
+Shards of finished threads are folded into a shared total, so a server
+that starts a thread per request keeps one shard per live thread.
+Gauges are read from callbacks at scrape time.
+"""
+import bisect
+import threading
+import time
+import weakref
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Sharded:
+    """Per-thread storage; a thread only ever writes its own shard"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._local = threading.local()
+        # (weak reference to the owning thread, shard)
+        self._shards = []
+        # Merged shards of threads that have finished
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            # Only taken once per thread
+            with self._lock:
+                self._fold_finished()
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+            self._local.shard = shard
+        return shard
+
+    def _fold_finished(self):
+        """Merge the shards of finished threads into _retired; caller holds _lock"""
+        live = []
+        for ref, shard in self._shards:
+            thread = ref()
+            if thread is not None and thread.is_alive():
+                live.append((ref, shard))
+            else:
+                # The thread is gone, so nothing writes this shard any more
+                for labels, value in shard.items():
+                    self._retired[labels] = self._merge(self._retired.get(labels), value)
+        self._shards = live
+
+    def sample_label_names(self, sample_name):
+        return self.label_names
+
+    def _snapshots(self):
+        with self._lock:
+            self._fold_finished()
+            shards = [shard for _, shard in self._shards]
+            # _merge builds new values, so a shallow copy is a consistent snapshot
+            retired = dict(self._retired)
+        # Copying a dict is atomic under the GIL
+        return [retired] + [dict(shard) for shard in shards]
+
+
+class Counter(_Sharded):
+    kind = 'counter'
+
+    @staticmethod
+    def _merge(total, value):
+        return value if total is None else total + value
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self):
+        totals = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def samples(self):
+        return [(self.name, labels, value) for labels, value in sorted(self.values().items())]
+
+
+class Histogram(_Sharded):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names, buckets=None):
+        super().__init__(name, help_text, label_names)
+        self.buckets = list(buckets or LATENCY_BUCKETS)
+
+    @staticmethod
+    def _merge(total, state):
+        return list(state) if total is None else [a + b for a, b in zip(total, state)]
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # Per-bucket counts (last slot is +Inf), then sum
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def values(self):
+        """Merged (bucket counts, sum) per label set"""
+        merged = {}
+        for shard in self._snapshots():
+            for labels, state in shard.items():
+                state = list(state)
+                total = merged.get(labels)
+                if total is None:
+                    merged[labels] = state
+                else:
+                    merged[labels] = [a + b for a, b in zip(total, state)]
+        return {labels: (state[:-1], state[-1]) for labels, state in merged.items()}
+
+    def samples(self):
+        samples = []
+        bounds = [_format_value(bound) for bound in self.buckets] + ['+Inf']
+        for labels, (counts, total) in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                samples.append((self.name + '_bucket', labels + (bound,), cumulative))
+            samples.append((self.name + '_sum', labels, total))
+            samples.append((self.name + '_count', labels, cumulative))
+        return samples
+
+    def sample_label_names(self, sample_name):
+        if sample_name.endswith('_bucket'):
+            return self.label_names + ('le',)
+        return self.label_names
+
+
+class Gauge:
+    """Value read from a callback at scrape time.
+
+    The callback returns a number, or a dict mapping label tuples to numbers.
+    Use kind='counter' for values that only grow, such as counters kept by
+    another component.
+    """
+
+    def __init__(self, name, help_text, label_names, callback, kind='gauge'):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.callback = callback
+
+    def samples(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [(self.name, labels, v) for labels, v in sorted(value.items())]
+
+    def sample_label_names(self, sample_name):
+        return self.label_names
+
+
+class StageTimer:
+    """Time consecutive stages of one request.
+
+    Each mark(stage) records the time since the previous mark.
+    """
+
+    def __init__(self):
+        self.started = self._last = time.perf_counter()
+        self.stages = []
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class Metrics:
+    """Registry of the serving metrics, rendered by /metrics"""
+
+    def __init__(self, namespace='kisan'):
+        self.namespace = namespace
+        self._metrics = []
+        self._services = {}
+        self.requests = self.counter(
+            'http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status'))
+        self.errors = self.counter(
+            'http_errors_total', 'HTTP responses with status >= 400 by route and status', ('route', 'status'))
+        self.latency = self.histogram(
+            'http_request_duration_seconds', 'Request latency by route', ('route',))
+        self.stages = self.histogram(
+            'request_stage_duration_seconds', 'Time spent in each stage of a prediction request',
+            ('route', 'stage'))
+        self.inference = self.histogram(
+            'inference_duration_seconds', 'Model inference time per call by engine and call kind',
+            ('engine', 'kind'))
+        self.inference_items = self.counter(
+            'inference_items_total', 'Inputs scored by the model by engine', ('engine',))
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter(self._full_name(name), help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=None):
+        return self._register(Histogram(self._full_name(name), help_text, label_names, buckets))
+
+    def gauge(self, name, help_text, callback, label_names=(), kind='gauge'):
+        return self._register(Gauge(self._full_name(name), help_text, label_names, callback, kind))
+
+    def _full_name(self, name):
+        return f'{self.namespace}_{name}' if self.namespace else name
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def observe_request(self, route, method, status, duration):
+        self.requests.inc(route, method, str(status))
+        if status >= 400:
+            self.errors.inc(route, str(status))
+        self.latency.observe(duration, route)
+
+    def observe_stages(self, route, timer):
+        for stage, duration in timer.stages:
+            self.stages.observe(duration, route, stage)
+
+    def observe_inference(self, engine, kind, duration, items=1):
+        self.inference.observe(duration, engine, kind)
+        self.inference_items.inc(engine, amount=items)
+
+    def watch_service(self, name, service):
+        """Export a ModelService's cache statistics and readiness, read at scrape time.
+
+        Each service is exported under its own engine label, so several can be watched.
+        """
+        if not self._services:
+            for key, metric_name, kind, help_text in (
+                    ('hits', 'hits_total', 'counter', 'Cache hits'),
+                    ('misses', 'misses_total', 'counter', 'Cache misses'),
+                    ('coalesced', 'coalesced_total', 'counter', 'Misses served by a computation already in flight'),
+                    ('evictions', 'evictions_total', 'counter', 'Entries evicted to stay within maxsize'),
+                    ('size', 'size', 'gauge', 'Entries currently cached'),
+                    ('hit_ratio', 'hit_ratio', 'gauge', 'Fraction of lookups served from the cache')):
+                self.gauge(f'prediction_cache_{metric_name}', help_text,
+                           lambda key=key: {(name,): s.cache.stats()[key] for name, s in self._services.items()},
+                           ('engine',), kind=kind)
+            self.gauge('model_ready', 'Whether a model is loaded and serving',
+                       lambda: {(name,): s.ready for name, s in self._services.items()}, ('engine',))
+            self.gauge('model_reloads_total', 'Successful model reloads',
+                       lambda: {(name,): s.reloads for name, s in self._services.items()}, ('engine',),
+                       kind='counter')
+        self._services[name] = service
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for sample_name, labels, value in metric.samples():
+                label_names = metric.sample_label_names(sample_name)
+                lines.append(sample_name + _format_labels(label_names, labels) + ' ' + _format_value(value))
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
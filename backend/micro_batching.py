@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+class MicroBatcher:
+    """Collect concurrent single predictions into vectorized batches.
+
+    Callers await submit(features). A collector task takes the first queued
+    request, keeps gathering until the batch reaches max_batch_size or
+    max_wait_ms has passed since that first request, then scores the whole
+    batch with one predict_batch call in a worker thread and resolves every
+    caller's future with its own result.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=64, max_wait_ms=2.0):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._task = None
+        self.batches = 0
+        self.items = 0
+        self.failures = 0
+        self.max_observed_batch = 0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+
+    def start(self):
+        """Start the collector task on the running event loop"""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._collect())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, features):
+        """Queue one input and wait for its prediction"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((features, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Take whatever else is already queued without waiting
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._run(loop, batch)
+
+    async def _run(self, loop, batch):
+        started = time.perf_counter()
+        self._record(batch, started)
+        features_list = [features for features, _, _ in batch]
+        try:
+            predictions = await loop.run_in_executor(None, self.predict_batch, features_list)
+        except Exception as e:
+            self.failures += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), prediction in zip(batch, predictions):
+            if not future.done():
+                future.set_result(prediction)
+
+    def _record(self, batch, started):
+        size = len(batch)
+        self.batches += 1
+        self.items += size
+        self.max_observed_batch = max(self.max_observed_batch, size)
+        for i, bound in enumerate(BATCH_SIZE_BUCKETS):
+            if size <= bound:
+                self.batch_size_counts[i] += 1
+                break
+        else:
+            self.batch_size_counts[-1] += 1
+        for _, _, queued_at in batch:
+            wait = started - queued_at
+            self.total_queue_wait += wait
+            self.max_queue_wait = max(self.max_queue_wait, wait)
+
+    def stats(self):
+        histogram = {f'<={bound}': count for bound, count in zip(BATCH_SIZE_BUCKETS, self.batch_size_counts)}
+        histogram[f'>{BATCH_SIZE_BUCKETS[-1]}'] = self.batch_size_counts[-1]
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': self.batches,
+            'items': self.items,
+            'failures': self.failures,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'max_observed_batch_size': self.max_observed_batch,
+            'batch_size_histogram': histogram,
+            'mean_queue_wait_ms': round(self.total_queue_wait / self.items * 1000, 3) if self.items else 0.0,
+            'max_queue_wait_ms': round(self.max_queue_wait * 1000, 3)
+        }
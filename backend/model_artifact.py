@@ -0,0 +1,256 @@
+"""Compiled binary model artifact that can be memory-mapped.
+
+Layout (all integers little-endian):
+
+    offset 0   magic            8 bytes, b'KISANMDL'
+    offset 8   format version   uint32
+    offset 12  header length    uint32
+    offset 16  header crc32     uint32
+    offset 20  payload crc32    uint32 (everything after the header)
+    offset 24  payload offset   uint64
+    offset 32  header           UTF-8 JSON: model metadata and an array table
+                                {name: {dtype, shape, offset, nbytes}}
+    ...        arrays           raw C-order data, each 64-byte aligned
+
+Loading with mmap returns read-only NumPy views straight onto the file, so
+the OS page cache is shared between every worker process that loads the
+same artifact and startup does no parsing beyond the small JSON header.
+
+Convert existing model files with:
+    python -m model_artifact crop_model.json crop_forest.npz -o crop_model.kmdl
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+MAGIC = b'KISANMDL'
+FORMAT_VERSION = 1
+# Artifacts holding a forest with integer-quantized leaves (see
+# forest_engine.QUANTIZED_FORMAT_VERSION), so older readers reject them
+QUANTIZED_FORMAT_VERSION = 2
+ALIGNMENT = 64
+ARTIFACT_EXTENSION = '.kmdl'
+_PREAMBLE = struct.Struct('<8sIIIIQ')
+
+FOREST_ARRAYS = ['feature', 'threshold', 'left', 'right', 'leaf_slot', 'leaf_value', 'roots']
+
+
+class ArtifactError(ValueError):
+    """Raised when a model artifact is malformed or fails its checksum"""
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_artifact(filepath, metadata, arrays):
+    """Write metadata and named arrays to a model artifact.
+
+    The file is written to a temporary path and renamed into place, so
+    readers never see a partially written artifact.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    table = {}
+    # Array offsets depend on the header size, which depends on the offsets;
+    # iterate until the header length is stable
+    header_bytes = b''
+    while True:
+        payload_offset = _align(_PREAMBLE.size + len(header_bytes))
+        offset = payload_offset
+        for name, array in arrays.items():
+            table[name] = {
+                'dtype': array.dtype.str,
+                'shape': list(array.shape),
+                'offset': offset,
+                'nbytes': array.nbytes
+            }
+            offset = _align(offset + array.nbytes)
+        new_header = json.dumps({'metadata': metadata, 'arrays': table}, sort_keys=True).encode('utf-8')
+        stable = len(new_header) == len(header_bytes)
+        header_bytes = new_header
+        if stable:
+            break
+
+    payload = bytearray(offset - payload_offset)
+    for name, array in arrays.items():
+        start = table[name]['offset'] - payload_offset
+        payload[start:start + array.nbytes] = array.tobytes()
+
+    quantized = metadata.get('forest', {}).get('format_version', 1) != 1
+    version = QUANTIZED_FORMAT_VERSION if quantized else FORMAT_VERSION
+    preamble = _PREAMBLE.pack(MAGIC, version, len(header_bytes), zlib.crc32(header_bytes),
+                              zlib.crc32(payload), payload_offset)
+    padding = b'\0' * (payload_offset - _PREAMBLE.size - len(header_bytes))
+
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(preamble)
+        f.write(header_bytes)
+        f.write(padding)
+        f.write(payload)
+    os.replace(tmp_path, filepath)
+
+
+def is_artifact(filepath):
+    """True if filepath starts with the artifact magic bytes"""
+    try:
+        with open(filepath, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def read_artifact(filepath, use_mmap=True, verify=True):
+    """Read a model artifact.
+
+    Returns (metadata, arrays). With use_mmap the arrays are read-only
+    views onto a shared memory map of the file; otherwise they are loaded
+    into private memory. verify checks the payload crc32, which touches
+    every page once.
+    """
+    with open(filepath, 'rb') as f:
+        if use_mmap:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = f.read()
+
+    if len(buffer) < _PREAMBLE.size:
+        raise ArtifactError(f"{filepath} is too short to be a model artifact")
+    magic, version, header_length, header_crc, payload_crc, payload_offset = _PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ArtifactError(f"{filepath} is not a model artifact")
+    if version not in (FORMAT_VERSION, QUANTIZED_FORMAT_VERSION):
+        raise ArtifactError(f"Unsupported model artifact version {version} in {filepath}")
+
+    header_bytes = bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_length])
+    if zlib.crc32(header_bytes) != header_crc:
+        raise ArtifactError(f"Header checksum mismatch in {filepath}")
+    if verify and zlib.crc32(memoryview(buffer)[payload_offset:]) != payload_crc:
+        raise ArtifactError(f"Payload checksum mismatch in {filepath}")
+
+    header = json.loads(header_bytes)
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        if spec['offset'] + spec['nbytes'] > len(buffer):
+            raise ArtifactError(f"Array {name} extends past the end of {filepath}")
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                     offset=spec['offset']).reshape(spec['shape'])
+    return header['metadata'], arrays
+
+
+def similarity_section(crop_requirements, feature_columns, crop_labels):
+    """Metadata and arrays for the similarity model's requirements table"""
+    crop_names = list(crop_requirements.keys())
+    metadata = {
+        'feature_columns': list(feature_columns),
+        'crop_labels': list(crop_labels),
+        'crop_names': crop_names
+    }
+    requirements = np.asarray([crop_requirements[crop] for crop in crop_names], dtype=np.float64)
+    return metadata, {'similarity/requirements': requirements}
+
+
+def forest_section(forest_arrays):
+    """Metadata and arrays for a flattened forest (see forest_engine.export_forest)"""
+    metadata = {
+        'format_version': int(forest_arrays.get('format_version', 1)),
+        'classes': [str(c) for c in forest_arrays['classes']],
+        'feature_columns': [str(c) for c in forest_arrays['feature_columns']],
+        'max_depth': int(forest_arrays['max_depth'])
+    }
+    if 'leaf_scale' in forest_arrays:
+        metadata['leaf_scale'] = float(forest_arrays['leaf_scale'])
+    return metadata, {f'forest/{name}': forest_arrays[name] for name in FOREST_ARRAYS}
+
+
+def similarity_from_artifact(metadata, arrays):
+    """Return (crop_names, requirements array, section metadata) or None"""
+    section = metadata.get('similarity')
+    if section is None:
+        return None
+    return section['crop_names'], arrays['similarity/requirements'], section
+
+
+def forest_from_artifact(metadata, arrays):
+    """Return forest arrays in the export_forest layout, or None"""
+    section = metadata.get('forest')
+    if section is None:
+        return None
+    format_version = section.get('format_version', 1)
+    if format_version not in (1, QUANTIZED_FORMAT_VERSION):
+        raise ArtifactError(f"Unsupported forest format version {format_version}")
+    forest_arrays = {name: arrays[f'forest/{name}'] for name in FOREST_ARRAYS}
+    forest_arrays['format_version'] = np.int64(format_version)
+    forest_arrays['classes'] = np.asarray(section['classes'])
+    forest_arrays['feature_columns'] = np.asarray(section['feature_columns'], dtype=str)
+    forest_arrays['max_depth'] = np.int64(section['max_depth'])
+    if 'leaf_scale' in section:
+        forest_arrays['leaf_scale'] = np.float64(section['leaf_scale'])
+    return forest_arrays
+
+
+def convert(json_path=None, forest_path=None, output_path='crop_model' + ARTIFACT_EXTENSION):
+    """Build an artifact from a similarity JSON file and/or a forest (.npz or .pkl)"""
+    metadata = {}
+    arrays = {}
+
+    if json_path:
+        with open(json_path, 'r') as f:
+            model_data = json.load(f)
+        section, section_arrays = similarity_section(
+            model_data['crop_requirements'], model_data['feature_columns'], model_data['crop_labels']
+        )
+        metadata['similarity'] = section
+        arrays.update(section_arrays)
+
+    if forest_path:
+        if forest_path.endswith('.pkl'):
+            import joblib
+            from forest_engine import export_forest
+            model_data = joblib.load(forest_path)
+            forest_arrays = export_forest(model_data['model'], model_data['feature_columns'])
+        else:
+            from forest_engine import load_forest
+            forest_arrays = load_forest(forest_path)
+        section, section_arrays = forest_section(forest_arrays)
+        metadata['forest'] = section
+        arrays.update(section_arrays)
+
+    if not metadata:
+        raise ValueError("Nothing to convert: give a similarity JSON file and/or a forest file")
+    write_artifact(output_path, metadata, arrays)
+    return output_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert model files to a memory-mappable artifact")
+    parser.add_argument('inputs', nargs='+', help="crop_model.json and/or crop_model.pkl / crop_forest.npz")
+    parser.add_argument('-o', '--output', default='crop_model' + ARTIFACT_EXTENSION,
+                        help=f"Output artifact (default: crop_model{ARTIFACT_EXTENSION})")
+    args = parser.parse_args(argv)
+
+    json_path = next((path for path in args.inputs if path.endswith('.json')), None)
+    forest_path = next((path for path in args.inputs if path.endswith(('.pkl', '.npz'))), None)
+    unknown = [path for path in args.inputs if path not in (json_path, forest_path)]
+    if unknown:
+        parser.error(f"Unrecognized input files: {', '.join(unknown)}")
+
+    try:
+        output = convert(json_path, forest_path, args.output)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Model artifact written to {output} ({os.path.getsize(output):,} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
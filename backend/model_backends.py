@@ -0,0 +1,46 @@
+"""Registry of the model backends a ModelService can serve.
+
+Each backend names a factory that builds an unloaded model with the
+predict_crop/predict_batch/crop_labels interface, the model file it reads
+by default (None for backends without a file) and whether a missing file
+should be created from the model's built-in defaults. Model modules are
+imported inside the factories, so an unused backend costs nothing.
+"""
+
+# name -> {'factory': callable(service), 'default_path': str or None, 'save_defaults': bool}
+MODEL_BACKENDS = {}
+
+
+def register_backend(name, factory, default_path=None, save_defaults=False):
+    """Make a backend available to ModelService and ENGINE_TIERS"""
+    MODEL_BACKENDS[name] = {'factory': factory, 'default_path': default_path, 'save_defaults': save_defaults}
+
+
+def get_backend(name):
+    try:
+        return MODEL_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown model backend: {name} (available: {', '.join(MODEL_BACKENDS)})")
+
+
+def _rule_based_model(service):
+    from rule_based_model import RuleBasedModel
+    return RuleBasedModel()
+
+
+def _similarity_model(service):
+    from crop_model_simple import CropRecommendationModel
+    # Deterministic scoring so identical inputs can be served from the cache
+    return CropRecommendationModel(
+        deterministic=True, engine_mode=service.engine_mode, lookup_resolution=service.lookup_resolution
+    )
+
+
+def _forest_model(service):
+    from forest_engine import ForestModel
+    return ForestModel(early_exit_margin=service.early_exit_margin, early_exit_top_k=service.early_exit_top_k)
+
+
+register_backend('rules', _rule_based_model)
+register_backend('similarity', _similarity_model, default_path='crop_model.json', save_defaults=True)
+register_backend('forest', _forest_model, default_path='crop_forest.npz')
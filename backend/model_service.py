@@ -0,0 +1,357 @@
+import hashlib
+import os
+import threading
+import time
+
+from model_backends import get_backend
+from prediction_cache import PredictionCache
+
+# Readiness states reported by /api/health
+STATE_COLD = 'cold'
+STATE_LOADING = 'loading'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+
+# Input used to exercise the scoring path during warm-up
+WARM_UP_FEATURES = [60, 30, 30, 25, 60, 6.5, 150]
+
+# Version reported by backends that have no model file
+BUILTIN_VERSION = 'builtin'
+
+
+class ModelUnavailableError(RuntimeError):
+    """Raised when a prediction is requested but the model could not be loaded"""
+
+
+def file_version(filepath):
+    """Short content hash identifying a model file"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def _file_mtime(filepath):
+    """Modification time of filepath, or None if it has none or does not exist"""
+    if filepath is None:
+        return None
+    try:
+        return os.path.getmtime(filepath)
+    except OSError:
+        return None
+
+
+class ModelService:
+    """Owns the serving model, its prediction cache and its readiness state.
+
+    Nothing is imported or read from disk until warm_up() runs, either
+    explicitly, in a background thread, or on the first prediction.
+
+    New model versions are loaded and warmed up off the request path and
+    then swapped in with a single reference assignment. A request that
+    already holds the old model finishes on it; the prediction cache is
+    cleared at the swap.
+
+    backend names an entry in model_backends.MODEL_BACKENDS; model_path
+    defaults to that backend's file.
+    """
+
+    def __init__(self, model_path=None, engine_mode='exact', lookup_resolution=1000,
+                 cache_size=4096, cache_ttl=300, watch_interval=0, metrics=None, backend='similarity',
+                 early_exit_margin=None, early_exit_top_k=1, retry_interval=30):
+        self.backend = backend
+        self._backend = get_backend(backend)
+        self.model_path = model_path or self._backend['default_path']
+        self.engine_mode = engine_mode
+        self.lookup_resolution = lookup_resolution
+        # Forest backend: stop walking trees for a single input once its top
+        # early_exit_top_k crops are decided or the margin is reached (None: all trees)
+        self.early_exit_margin = early_exit_margin
+        self.early_exit_top_k = early_exit_top_k
+        self.watch_interval = watch_interval
+        # Seconds after a failed warm-up before the next use tries again (0: never)
+        self.retry_interval = retry_interval
+        self.cache = PredictionCache(maxsize=cache_size, ttl=cache_ttl)
+        # (model, version) swapped as one reference so readers never mix them
+        self._active = (None, None)
+        self.state = STATE_COLD
+        self.error = None
+        self.timings = {}
+        self.reloads = 0
+        self.reload_error = None
+        self.reloading = False
+        self._failed_at = None
+        self._model_mtime = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.watch_service(self.engine_label, self)
+
+    @property
+    def engine_label(self):
+        """Name used for this service in metrics and responses"""
+        if self.backend == 'similarity':
+            return f'similarity/{self.engine_mode}'
+        if self.backend == 'forest' and self.early_exit_margin is not None:
+            return 'forest/early-exit'
+        return self.backend
+
+    @property
+    def model(self):
+        return self._active[0]
+
+    @property
+    def model_version(self):
+        return self._active[1]
+
+    @property
+    def ready(self):
+        return self.state == STATE_READY
+
+    def warm_up(self):
+        """Load the model and run one prediction so the first request is fast.
+
+        Safe to call from several threads; only the first call does the work.
+        After a failure, calls return False until retry_interval has passed,
+        then load again. The file watcher starts either way, so a fixed
+        model file is picked up without a request. Returns True if the
+        model is ready.
+        """
+        with self._lock:
+            if self.state == STATE_READY:
+                return True
+            if self.state == STATE_FAILED and not self._retry_due():
+                return False
+            self.state = STATE_LOADING
+            try:
+                model, version, mtime, timings = self._load_and_warm(self.model_path)
+                self._swap(model, version, mtime)
+                self.timings.update(timings)
+                self.error = None
+                self.state = STATE_READY
+            except Exception as e:
+                print(f"Error initializing model: {e}")
+                self._active = (None, None)
+                self.error = str(e)
+                self._failed_at = time.monotonic()
+                # The watcher reloads once the file changes from the one that failed
+                self._model_mtime = _file_mtime(self.model_path)
+                self.state = STATE_FAILED
+        if self.watch_interval:
+            self.start_watching()
+        return self.ready
+
+    def _retry_due(self):
+        return bool(self.retry_interval) and time.monotonic() - self._failed_at >= self.retry_interval
+
+    def start_background_warm_up(self):
+        """Warm up in a daemon thread; /api/health reports progress"""
+        thread = threading.Thread(target=self.warm_up, name='model-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def create_model(self):
+        """A new, unloaded model of the configured backend"""
+        # Backends import their model module here so creating the app stays cheap
+        try:
+            return self._backend['factory'](self)
+        except ImportError as e:
+            raise ModelUnavailableError(f"Crop model not available: {e}")
+
+    def _load_and_warm(self, model_path):
+        """Build a fully warmed model from model_path without touching the live one"""
+        started = time.perf_counter()
+        model = self.create_model()
+
+        if model_path is None:
+            mtime, version = None, BUILTIN_VERSION
+        else:
+            # Check if model exists, if not save it
+            if not os.path.exists(model_path):
+                if not self._backend['save_defaults']:
+                    raise FileNotFoundError(f"Model file {model_path} not found")
+                print("Saving model data...")
+                if model_path.endswith('.kmdl'):
+                    model.save_artifact(model_path)
+                else:
+                    model.save_model(model_path)
+            else:
+                print("Loading existing model...")
+                model.load_model(model_path)
+            mtime = os.path.getmtime(model_path)
+            version = file_version(model_path)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        # Builds the scoring engine (and lookup tables) before any request sees it
+        warm_started = time.perf_counter()
+        model.predict_crop(WARM_UP_FEATURES)
+        timings = {
+            'load_ms': round(load_ms, 2),
+            'warm_up_ms': round((time.perf_counter() - warm_started) * 1000, 2)
+        }
+        return model, version, mtime, timings
+
+    def _swap(self, model, version, mtime):
+        self._model_mtime = mtime
+        self._active = (model, version)
+        # Entries are keyed by version, so this only frees memory early
+        self.cache.clear()
+
+    def reload(self, model_path=None):
+        """Load, warm and atomically swap in a new model version.
+
+        Runs in the caller's thread; in-flight requests keep using the
+        model they already hold. Returns the new model version.
+        """
+        with self._reload_lock:
+            model_path = model_path or self.model_path
+            self.reloading = True
+            try:
+                model, version, mtime, timings = self._load_and_warm(model_path)
+            except Exception as e:
+                self.reload_error = str(e)
+                print(f"Model reload failed, keeping version {self.model_version}: {e}")
+                raise
+            finally:
+                self.reloading = False
+            self.model_path = model_path
+            self._swap(model, version, mtime)
+            self.timings.update(timings)
+            self.reload_error = None
+            self.reloads += 1
+            self.state = STATE_READY
+            self.error = None
+            print(f"Model version {version} is now active")
+            return version
+
+    def reload_in_background(self, model_path=None):
+        """Start reload() in a daemon thread and return the thread"""
+        def run():
+            try:
+                self.reload(model_path)
+            except Exception:
+                pass
+        thread = threading.Thread(target=run, name='model-reload', daemon=True)
+        thread.start()
+        return thread
+
+    def check_for_update(self):
+        """Reload if the model file changed on disk. Returns True if it did."""
+        if self.model_path is None:
+            return False
+        try:
+            mtime = os.path.getmtime(self.model_path)
+        except OSError:
+            return False
+        if mtime == self._model_mtime or self._reload_lock.locked():
+            return False
+        try:
+            self.reload()
+        except Exception:
+            # Do not retry the same broken file on every poll
+            self._model_mtime = mtime
+            return False
+        return True
+
+    def start_watching(self):
+        """Poll the model file every watch_interval seconds in a daemon thread"""
+        if self._watcher is not None or not self.watch_interval or self.model_path is None:
+            return
+        def watch():
+            while not self._stop_watching.wait(self.watch_interval):
+                self.check_for_update()
+        self._watcher = threading.Thread(target=watch, name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+
+    def get_model(self):
+        """Return the ready model, warming up on first use"""
+        return self.get_active()[0]
+
+    def get_active(self):
+        """Return the (model, version) pair currently serving"""
+        if self.state != STATE_READY:
+            self.warm_up()
+        active = self._active
+        if active[0] is None:
+            raise ModelUnavailableError(self.error or 'Model not available')
+        return active
+
+    def predict(self, features):
+        """Predict one input through the prediction cache. Returns (prediction, version).
+
+        The model is run on the quantized features so every input that maps
+        to the same cache entry gets the same answer, whichever arrives first.
+        The version is the one that produced the answer, even if a reload
+        swaps in another model meanwhile.
+        """
+        model, version = self.get_active()
+        if not self.cache.enabled:
+            return self._infer(model, features), version
+
+        key = self.cache.make_key(features, version)
+        return self.cache.get_or_compute(key, lambda: self._infer(model, self.cache.quantize(features))), version
+
+    def predict_batch(self, features_list):
+        """Predict many inputs, running the model once over all cache misses. Returns (predictions, version)."""
+        model, version = self.get_active()
+        if not self.cache.enabled:
+            return self._infer_batch(model, features_list), version
+
+        keys = [self.cache.make_key(features, version) for features in features_list]
+        predictions = [self.cache.get(key) for key in keys]
+        misses = [i for i, prediction in enumerate(predictions) if prediction is None]
+        if misses:
+            computed = self._infer_batch(model, [self.cache.quantize(features_list[i]) for i in misses])
+            for i, prediction in zip(misses, computed):
+                self.cache.put(keys[i], prediction)
+                predictions[i] = prediction
+        return predictions, version
+
+    def _infer(self, model, features):
+        if self.metrics is None:
+            return model.predict_crop(features)
+        started = time.perf_counter()
+        prediction = model.predict_crop(features)
+        self.metrics.observe_inference(self.engine_label, 'single', time.perf_counter() - started)
+        return prediction
+
+    def _infer_batch(self, model, features_list):
+        if self.metrics is None or not features_list:
+            return model.predict_batch(features_list)
+        started = time.perf_counter()
+        predictions = model.predict_batch(features_list)
+        self.metrics.observe_inference(
+            self.engine_label, 'batch', time.perf_counter() - started, items=len(features_list)
+        )
+        return predictions
+
+    def status(self):
+        """Readiness details for /api/health"""
+        status = {
+            'state': self.state,
+            'ready': self.ready,
+            'model_path': self.model_path,
+            'model_version': self.model_version,
+            'backend': self.backend,
+            'engine': self.engine_mode,
+            'reloads': self.reloads,
+            'reloading': self.reloading,
+            'watch_interval': self.watch_interval,
+            'retry_interval': self.retry_interval,
+            'timings': dict(self.timings)
+        }
+        if self.backend == 'forest' and self.early_exit_margin is not None:
+            status['early_exit_margin'] = self.early_exit_margin
+            status['early_exit_top_k'] = self.early_exit_top_k
+        if self.error:
+            status['error'] = self.error
+        if self.reload_error:
+            status['reload_error'] = self.reload_error
+        return status
@@ -0,0 +1,282 @@
+"""Incremental updates of the similarity model's crop requirements from harvest feedback.
+
+Each crop keeps running statistics (Welford's algorithm): a count, the mean
+of every feature and the sum of squared deviations, so one observation is
+an O(1) update. The model's current requirements act as prior_weight
+pseudo-observations, so a handful of reports cannot swing a centroid.
+
+Checkpoints write the means as the new crop_requirements to the model file
+and the statistics to a sidecar file next to it (<model file>.online.json),
+then hot-reload the serving model. A model file replaced by anything other
+than a checkpoint starts the statistics afresh from its requirements.
+
+Every worker process keeps its own learner. Each also keeps the observations
+it has not checkpointed yet apart, and checkpoints hold an exclusive lock on
+<model file>.online.lock: a checkpoint folds its observations into whatever
+the model file and sidecar hold by then, so workers never overwrite each
+other's feedback. Without fcntl (Windows) there is no lock, and online
+learning needs exactly one worker process.
+"""
+import contextlib
+import json
+import math
+import os
+import threading
+
+from model_service import file_version
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def sidecar_path(model_path):
+    return model_path + '.online.json'
+
+
+def lock_path(model_path):
+    return model_path + '.online.lock'
+
+
+@contextlib.contextmanager
+def checkpoint_lock(model_path, shared=False):
+    """Advisory lock that serializes checkpoints of model_path across processes"""
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path(model_path), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CropStats:
+    """Running mean and spread of the inputs one crop did well in"""
+
+    def __init__(self, centroid, prior_weight=20, observations=0, m2=None):
+        self.count = float(prior_weight) + observations
+        self.mean = [float(value) for value in centroid]
+        self.m2 = list(m2) if m2 is not None else [0.0] * len(self.mean)
+        self.observations = observations
+
+    def update(self, features):
+        self.count += 1
+        self.observations += 1
+        for i, value in enumerate(features):
+            delta = value - self.mean[i]
+            self.mean[i] += delta / self.count
+            self.m2[i] += delta * (value - self.mean[i])
+
+    def merge(self, other):
+        """Fold in the observations of another CropStats (Chan et al.'s pairwise update)"""
+        if not other.observations:
+            return
+        total = self.count + other.count
+        for i, mean in enumerate(other.mean):
+            delta = mean - self.mean[i]
+            self.mean[i] += delta * other.count / total
+            self.m2[i] += other.m2[i] + delta * delta * self.count * other.count / total
+        self.count = total
+        self.observations += other.observations
+
+    def spread(self):
+        """Standard deviation per feature, with the prior counted as zero-spread observations"""
+        return [math.sqrt(m2 / self.count) for m2 in self.m2]
+
+    def to_dict(self):
+        return {'observations': self.observations, 'mean': self.mean, 'm2': self.m2}
+
+
+class OnlineCentroidLearner:
+    """Fold harvest outcomes into a ModelService's similarity model and publish checkpoints"""
+
+    def __init__(self, service, prior_weight=20, checkpoint_interval=60):
+        self.service = service
+        self.prior_weight = prior_weight
+        self.checkpoint_interval = checkpoint_interval
+        self.stats = {}
+        # Observations not checkpointed yet, on their own so a checkpoint can add them to another process's
+        self.unsaved = {}
+        # Model version the statistics were started from or last checkpointed to
+        self.base_version = None
+        self.pending = 0
+        self.checkpoints = 0
+        self.last_checkpoint_error = None
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _sync(self):
+        # Caller holds self._lock
+        model, version = self.service.get_active()
+        if version == self.base_version:
+            return model
+        if not hasattr(model, 'crop_requirements'):
+            raise ValueError(f"Online learning needs the similarity backend, not {self.service.backend}")
+        model_path = self.service.model_path
+        # No checkpoint is half-written while the shared lock is held
+        with checkpoint_lock(model_path, shared=True):
+            saved = self._read_sidecar(version)
+            try:
+                current = file_version(model_path)
+            except OSError:
+                current = None
+        stats = self._stats_from(model, saved)
+        if saved or current != version:
+            # A checkpoint, maybe another process's: unsaved observations still apply on top of it
+            self._merge(stats, self.unsaved)
+        elif self.pending:
+            print(f"Model changed to {version}; dropping {self.pending} unsaved feedback observations")
+            self.unsaved = {}
+        self.stats = stats
+        self.unsaved = {crop: self.unsaved.get(crop) or CropStats([0.0] * len(s.mean), 0)
+                        for crop, s in stats.items()}
+        self.pending = sum(s.observations for s in self.unsaved.values())
+        self.base_version = version
+        return model
+
+    def _stats_from(self, model, saved):
+        """Statistics for every crop of model, resumed from the sidecar's where it has them"""
+        stats = {}
+        for crop, centroid in model.crop_requirements.items():
+            state = saved.get(crop)
+            if state is not None:
+                stats[crop] = CropStats(state['mean'], self.prior_weight, state['observations'], state['m2'])
+            else:
+                stats[crop] = CropStats(centroid, self.prior_weight)
+        return stats
+
+    @staticmethod
+    def _merge(stats, unsaved):
+        for crop, new in unsaved.items():
+            if crop in stats:
+                stats[crop].merge(new)
+
+    def _read_sidecar(self, version):
+        """Statistics saved with this model version, or {}"""
+        try:
+            with open(sidecar_path(self.service.model_path), 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if saved.get('model_version') != version:
+            return {}
+        return saved.get('crops', {})
+
+    def observe_many(self, observations):
+        """Record (features, crop) pairs; returns {index: error} for the ones rejected"""
+        errors = {}
+        with self._lock:
+            self._sync()
+            for i, (features, crop) in enumerate(observations):
+                stats = self.stats.get(crop)
+                if stats is None:
+                    errors[i] = f"Unknown crop: {crop}"
+                    continue
+                stats.update(features)
+                self.unsaved[crop].update(features)
+                self.pending += 1
+        return errors
+
+    def checkpoint(self):
+        """Write the current centroids to the model file and hot-reload it.
+
+        Returns the new model version, or None if there was nothing to save.
+        """
+        with self._checkpoint_lock:
+            with self._lock:
+                model = self._sync()
+                if not self.pending:
+                    return None
+                base_version = self.base_version
+                stats = self.stats
+                unsaved = self.unsaved
+                # Observations that arrive while writing stay pending
+                self.unsaved = {crop: CropStats([0.0] * len(s.mean), 0) for crop, s in unsaved.items()}
+                requirements = {crop: [round(v, 4) for v in s.mean] for crop, s in stats.items()}
+                crops = {crop: s.to_dict() for crop, s in stats.items()}
+            model_path = self.service.model_path
+            replaced = False
+            try:
+                # The exclusive lock is never taken while holding self._lock: _sync takes them the other way
+                with checkpoint_lock(model_path):
+                    current = file_version(model_path)
+                    if current != base_version:
+                        # Another process checkpointed since: add these observations to its statistics
+                        model = self.service.create_model()
+                        model.load_model(model_path)
+                        stats = self._stats_from(model, self._read_sidecar(current))
+                        self._merge(stats, unsaved)
+                        requirements = {crop: [round(v, 4) for v in s.mean] for crop, s in stats.items()}
+                        crops = {crop: s.to_dict() for crop, s in stats.items()}
+                    new_model = self.service.create_model()
+                    new_model.feature_columns = list(model.feature_columns)
+                    new_model.crop_labels = list(model.crop_labels)
+                    new_model.crop_requirements = requirements
+                    tmp_path = model_path + '.tmp'
+                    if model_path.endswith('.kmdl'):
+                        new_model.save_artifact(tmp_path)
+                    else:
+                        new_model.save_model(tmp_path)
+                    version = file_version(tmp_path)
+                    self._write_sidecar(model_path, version, crops)
+                    os.replace(tmp_path, model_path)
+                    replaced = True
+                    self.service.reload(model_path)
+            except Exception as e:
+                self.last_checkpoint_error = str(e)
+                if not replaced:
+                    with self._lock:
+                        self._merge(unsaved, self.unsaved)
+                        self.unsaved = unsaved
+                        self.pending = sum(s.observations for s in unsaved.values())
+                raise
+            # Restarts the statistics from the sidecar just written, plus what arrived meanwhile
+            with self._lock:
+                self._sync()
+            self.checkpoints += 1
+            self.last_checkpoint_error = None
+            return version
+
+    def _write_sidecar(self, model_path, version, crops):
+        tmp_path = sidecar_path(model_path) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'model_version': version, 'prior_weight': self.prior_weight, 'crops': crops}, f)
+        os.replace(tmp_path, sidecar_path(model_path))
+
+    def start(self):
+        """Checkpoint every checkpoint_interval seconds in a daemon thread"""
+        if self._thread is not None or not self.checkpoint_interval:
+            return
+        def run():
+            while not self._stop.wait(self.checkpoint_interval):
+                try:
+                    self.checkpoint()
+                except Exception as e:
+                    self.last_checkpoint_error = str(e)
+                    print(f"Online learning checkpoint failed: {e}")
+        self._thread = threading.Thread(target=run, name='online-checkpoint', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        with self._lock:
+            status = {
+                'base_version': self.base_version,
+                'pending': self.pending,
+                'checkpoints': self.checkpoints,
+                'prior_weight': self.prior_weight,
+                'checkpoint_interval': self.checkpoint_interval,
+                'observations': {crop: s.observations for crop, s in self.stats.items() if s.observations},
+                'spread': {crop: [round(v, 4) for v in s.spread()]
+                           for crop, s in self.stats.items() if s.observations}
+            }
+        if self.last_checkpoint_error:
+            status['last_checkpoint_error'] = self.last_checkpoint_error
+        return status
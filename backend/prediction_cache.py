@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Quantization step per feature (N, P, K, temperature, humidity, ph, rainfall).
+# Inputs that round to the same grid point share one cache entry.
+DEFAULT_QUANTUM = [1.0, 1.0, 1.0, 0.1, 0.5, 0.01, 1.0]
+
+
+class _InFlight:
+    """A computation another thread is already running for the same key"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class PredictionCache:
+    """Bounded LRU cache with TTL for deterministic predictions.
+
+    Keys are feature vectors quantized to a fixed grid plus the model
+    version, so reloading the model never serves stale results. Concurrent
+    misses for the same key are coalesced: the first caller computes the
+    value while the others wait for it.
+    """
+
+    def __init__(self, maxsize=4096, ttl=300, quantum=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.quantum = list(quantum or DEFAULT_QUANTUM)
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def quantize(self, features):
+        """Snap features to the cache grid"""
+        return [round(round(value / step) * step, 6) for value, step in zip(features, self.quantum)]
+
+    def make_key(self, features, version=0):
+        return (version,) + tuple(self.quantize(features))
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        with self._lock:
+            value = self._lookup(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing it at most once.
+
+        If another thread is already computing the same key, wait for its
+        result instead of running compute again.
+        """
+        if not self.enabled:
+            return compute()
+
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                self.misses += 1
+                in_flight = self._in_flight[key] = _InFlight()
+                owner = True
+            else:
+                self.coalesced += 1
+                owner = False
+
+        if not owner:
+            in_flight.event.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.value
+
+        try:
+            in_flight.value = compute()
+        except Exception as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if in_flight.error is None:
+                    self._store(key, in_flight.value)
+            in_flight.event.set()
+        return in_flight.value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _lookup(self, key):
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if self.ttl and expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value):
+        # Caller holds the lock
+        if not self.enabled:
+            return
+        self._entries[key] = (value, time.monotonic() + (self.ttl or 0))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
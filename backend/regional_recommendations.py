@@ -0,0 +1,329 @@
+"""Precomputed crop recommendations keyed by region and climate bucket.
+
+Regional data (REGION_DATA_PATH) describes each district: its climate
+normals and typical soil profiles. A request whose location names a known
+region may omit any feature the region provides, and its prediction is
+served from a table keyed on (region, bucket), where the bucket is the
+input snapped to a coarse grid. Every input in a bucket gets the
+prediction for the bucket centre, so the answer does not depend on which
+request filled the entry, and responses mark it "approximate".
+
+The ranking and scores are the centre's, not the caller's. An input is at
+most width_i / 2 from the centre in each feature, and each similarity
+term changes by at most |dx| / scale_i, so a similarity score differs
+from live scoring by at most
+
+    max_score_error = sum_i(weight_i * width_i / (2 * scale_i)) / sum(weights)
+
+(about 0.022, i.e. 2.2 percentage points, with BUCKET_WIDTHS). Crops
+that close together can swap places: on 20,000 inputs drawn around the
+sample crops' requirements, the similarity model's top crop differed
+from live scoring for 8% of them and the top-3 order for 31%. The forest
+has no such bound; its top crop differed for 14%.
+
+Entries are tagged with the model version that produced them. When the
+model or the regional data changes, only the affected entries are
+recomputed, in the background; until then they are scored live.
+
+Example regional data file:
+
+    {"regions": [
+        {"name": "Pune", "aliases": ["Pune District"],
+         "temperature": 24.5, "humidity": 62, "rainfall": 72,
+         "soil_profiles": [{"N": 80, "P": 40, "K": 40, "ph": 6.8}]}
+    ]}
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+
+from feature_schema import FEATURE_SCHEMA
+
+# Bucket width per feature (N, P, K, temperature, humidity, ph, rainfall)
+BUCKET_WIDTHS = [5.0, 5.0, 5.0, 0.5, 2.0, 0.1, 10.0]
+
+# Budget for background precomputation, long enough for the slowest tier
+PRECOMPUTE_BUDGET_MS = 1000
+
+# Stale entries recomputed per model call during a refresh
+REFRESH_CHUNK_SIZE = 256
+
+
+def max_score_error(widths, scales=None, weights=None):
+    """Largest similarity score difference between an input and its bucket centre"""
+    # similarity_engine needs numpy, which the rules-only server does without
+    from similarity_engine import FEATURE_SCALES, FEATURE_WEIGHTS
+    scales = FEATURE_SCALES if scales is None else scales
+    weights = FEATURE_WEIGHTS if weights is None else weights
+    return sum(w * width / (2 * s) for w, width, s in zip(weights, widths, scales)) / sum(weights)
+
+
+def normalize_location(location):
+    """Lower-case a location and collapse its whitespace"""
+    return ' '.join(str(location).lower().split())
+
+
+class Region:
+    """One region's feature defaults and the inputs precomputed for it"""
+
+    def __init__(self, record, feature_names):
+        self.name = str(record['name'])
+        self.aliases = [str(alias) for alias in record.get('aliases', [])]
+        self.defaults = {name: float(record[name]) for name in feature_names if name in record}
+        self.seeds = []
+        for profile in record.get('soil_profiles') or [{}]:
+            values = dict(self.defaults)
+            values.update({name: float(profile[name]) for name in feature_names if name in profile})
+            if len(values) == len(feature_names):
+                self.seeds.append([values[name] for name in feature_names])
+        self.digest = hashlib.sha256(json.dumps(record, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def complete(self, data):
+        """Return data with missing features filled from the region's defaults"""
+        missing = [name for name in self.defaults if name not in data]
+        if not missing:
+            return data
+        data = dict(data)
+        for name in missing:
+            data[name] = self.defaults[name]
+        return data
+
+
+def load_regions(filepath, feature_names):
+    """Read a regional data file into {normalized name or alias: Region}"""
+    with open(filepath, 'r') as f:
+        records = json.load(f)['regions']
+    regions = {}
+    for record in records:
+        region = Region(record, feature_names)
+        for name in [region.name] + region.aliases:
+            regions[normalize_location(name)] = region
+    return regions
+
+
+class RegionalTable:
+    """Location-keyed table of precomputed predictions in front of an InferenceRouter.
+
+    Lookups are one dict access. Missing or stale entries are scored live
+    on the bucket centre and stored; a background thread precomputes every
+    region's soil profiles and recomputes stale entries in batches.
+    """
+
+    def __init__(self, router, regions_path='', max_entries=200000, refresh_interval=30,
+                 schema=None, widths=None):
+        self.router = router
+        self.regions_path = regions_path
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+        self.schema = list(schema or FEATURE_SCHEMA)
+        self.feature_names = [feature.name for feature in self.schema]
+        self.widths = list(widths or BUCKET_WIDTHS)
+        self.regions = {}
+        self._regions_mtime = None
+        # (region name, bucket) -> (prediction, info)
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._refresher = None
+        self._stop_refreshing = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.refreshed = 0
+        self.load_error = None
+
+    @property
+    def enabled(self):
+        return bool(self.regions_path)
+
+    def start(self):
+        """Load the regional data and start precomputing; later calls do nothing"""
+        if self._started or not self.enabled:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.check_regions()
+        if self.refresh_interval:
+            self._refresher = threading.Thread(target=self._refresh_loop, name='regional-refresh', daemon=True)
+            self._refresher.start()
+
+    def stop(self):
+        self._stop_refreshing.set()
+
+    def resolve(self, location):
+        """Return the Region a location names, or None"""
+        if not location or not self.enabled:
+            return None
+        if not self._started:
+            self.start()
+        key = normalize_location(location)
+        region = self.regions.get(key)
+        if region is None and ',' in key:
+            # "Pune, Maharashtra" -> "pune"
+            region = self.regions.get(key.split(',')[0].strip())
+        return region
+
+    def bucket(self, features):
+        return tuple(math.floor(value / width) for value, width in zip(features, self.widths))
+
+    def center(self, bucket):
+        """Features at the centre of a bucket, clipped to the schema ranges"""
+        return [
+            round(min(max((index + 0.5) * width, feature.low), feature.high), 6)
+            for index, width, feature in zip(bucket, self.widths, self.schema)
+        ]
+
+    def lookup(self, region, features):
+        """Return (key, entry) for features in region; entry is None on a miss"""
+        key = (region.name, self.bucket(features))
+        return key, self.get(key)
+
+    def predict(self, region, features, predict):
+        """Return (prediction, info) for features in region.
+
+        The prediction is the bucket centre's (see max_score_error).
+        predict(features) -> (prediction, info) scores a missing entry.
+        """
+        key, entry = self.lookup(region, features)
+        if entry is not None:
+            return entry
+        prediction, info = predict(self.center(key[1]))
+        self.put(key, prediction, info)
+        return prediction, info
+
+    def predict_batch(self, regions, features_list, predict_batch):
+        """Return (predictions, info) for many inputs; regions holds a Region or None per input.
+
+        Inputs without a region and missing entries are scored together
+        with one predict_batch(features_list) -> (predictions, info) call.
+        """
+        predictions = [None] * len(features_list)
+        keys = [None] * len(features_list)
+        live = []
+        info = None
+        for i, (region, features) in enumerate(zip(regions, features_list)):
+            if region is None:
+                live.append(i)
+                continue
+            keys[i], entry = self.lookup(region, features)
+            if entry is None:
+                live.append(i)
+            else:
+                predictions[i], info = entry
+        if live or info is None:
+            computed, info = predict_batch(
+                [self.center(keys[i][1]) if keys[i] else features_list[i] for i in live]
+            )
+            for i, prediction in zip(live, computed):
+                predictions[i] = prediction
+                if keys[i] is not None:
+                    self.put(keys[i], prediction, info)
+        return predictions, info
+
+    def get(self, key):
+        """Return the current (prediction, info) for key, or None"""
+        entry = self._entries.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if not self._is_current(entry[1]):
+                self.stale += 1
+                return None
+            self.hits += 1
+        return entry
+
+    def put(self, key, prediction, info):
+        # Answers degraded by a latency budget are not kept
+        if info['fallback']:
+            return
+        with self._lock:
+            if key in self._entries or len(self._entries) < self.max_entries:
+                self._entries[key] = (prediction, info)
+
+    def _is_current(self, info):
+        service = self.router.services.get(info['engine'])
+        return service is not None and service.model_version == info['model_version']
+
+    def check_regions(self):
+        """Reload the regional data if the file changed, dropping entries of changed regions.
+
+        Returns True if the data was reloaded.
+        """
+        try:
+            mtime = os.path.getmtime(self.regions_path)
+            if mtime == self._regions_mtime:
+                return False
+            regions = load_regions(self.regions_path, self.feature_names)
+        except Exception as e:
+            self.load_error = str(e)
+            print(f"Error loading regional data from {self.regions_path}: {e}")
+            return False
+        self._regions_mtime = mtime
+        current = {region.name: region.digest for region in regions.values()}
+        with self._lock:
+            previous = {region.name: region.digest for region in self.regions.values()}
+            changed = {name for name, digest in previous.items() if current.get(name) != digest}
+            if changed:
+                self._entries = {key: entry for key, entry in self._entries.items() if key[0] not in changed}
+            self.regions = regions
+        self.load_error = None
+        print(f"Loaded {len(current)} regions from {self.regions_path}")
+        return True
+
+    def refresh(self):
+        """Compute missing seed entries and recompute stale ones. Returns the number computed."""
+        keys = set()
+        for region in set(self.regions.values()):
+            for features in region.seeds:
+                keys.add((region.name, self.bucket(features)))
+        entries = self._entries
+        todo = [key for key in keys if key not in entries]
+        todo.extend(key for key, (_, info) in list(entries.items()) if not self._is_current(info))
+        computed = 0
+        for start in range(0, len(todo), REFRESH_CHUNK_SIZE):
+            chunk = todo[start:start + REFRESH_CHUNK_SIZE]
+            predictions, info = self.router.predict_batch(
+                [self.center(bucket) for _, bucket in chunk], PRECOMPUTE_BUDGET_MS
+            )
+            for key, prediction in zip(chunk, predictions):
+                self.put(key, prediction, info)
+            computed += len(chunk)
+        self.refreshed += computed
+        return computed
+
+    def _refresh_loop(self):
+        while True:
+            self.check_regions()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Regional refresh failed: {e}")
+            if self._stop_refreshing.wait(self.refresh_interval):
+                return
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            stats = {
+                'enabled': self.enabled,
+                'regions': len(set(region.name for region in self.regions.values())),
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'refreshed': self.refreshed,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'bucket_widths': self.widths
+            }
+        # The bound only holds for similarity scores
+        if 'similarity' in self.router.services:
+            stats['max_score_error'] = round(max_score_error(self.widths), 4)
+        if self.load_error:
+            stats['load_error'] = self.load_error
+        return stats
@@ -0,0 +1,134 @@
+"""Opt-in per-request profiling and Server-Timing headers.
+
+A request is profiled when an admin asks for it (X-Profile header with a
+valid X-Admin-Token) or when it is picked by PROFILE_SAMPLE_RATE. The
+request thread runs under cProfile and the functions with the most self
+time are kept in a bounded ring buffer, served by /api/admin/profiles.
+Requests that are not profiled pay for one random() call at most.
+
+Only one request is profiled at a time; others arriving meanwhile are
+not profiled themselves. Work done in other threads (slower engine tiers,
+micro-batches) shows up as the time spent waiting for it.
+
+Under the threaded WSGI server the profile covers only the request's own
+thread. Under asgi_app the profiler runs on the event-loop thread for as
+long as the request is in flight, including across its awaits, so the top
+frames also include every other request's coroutine that ran meanwhile.
+"""
+import cProfile
+import itertools
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+
+# Reasons a request was profiled
+REASON_ADMIN = 'admin'
+REASON_SAMPLED = 'sampled'
+
+
+def server_timing(timer, total=None):
+    """Server-Timing header value for a StageTimer's stages, in milliseconds"""
+    metrics = [f'{stage};dur={duration * 1000:.3f}' for stage, duration in timer.stages]
+    if total is not None:
+        metrics.append(f'total;dur={total * 1000:.3f}')
+    return ', '.join(metrics)
+
+
+def _frame_name(key):
+    filename, line, function = key
+    if filename == '~':
+        # Built-in functions have no source location
+        return function
+    return f'{os.path.basename(filename)}:{line}({function})'
+
+
+def top_frames(profile, limit=20):
+    """The functions with the most self time in a finished cProfile.Profile"""
+    stats = pstats.Stats(profile).stats
+    ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {
+            'function': _frame_name(key),
+            'calls': calls,
+            'self_ms': round(self_time * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3)
+        }
+        for key, (_, calls, self_time, cumulative, _) in ranked
+    ]
+
+
+class RequestProfiler:
+    """Decide which requests to profile and keep their results in a ring buffer"""
+
+    def __init__(self, sample_rate=0.0, capacity=100, frames=20):
+        self.sample_rate = sample_rate
+        self.capacity = capacity
+        self.frames = frames
+        self._profiles = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._active = threading.Lock()
+        self.profiled = 0
+        self.skipped = 0
+
+    def reason(self, admin_requested):
+        """Why the current request should be profiled, or None"""
+        if admin_requested:
+            return REASON_ADMIN
+        if self.sample_rate and random.random() < self.sample_rate:
+            return REASON_SAMPLED
+        return None
+
+    def start(self):
+        """Start profiling the calling thread; returns None if another request is being profiled"""
+        if not self._active.acquire(blocking=False):
+            self.skipped += 1
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except Exception:
+            self._active.release()
+            self.skipped += 1
+            return None
+        return profile
+
+    def abort(self, profile):
+        """Stop a profile started by start() without recording it, e.g. when the request failed"""
+        profile.disable()
+        self._active.release()
+
+    def finish(self, profile, route, method, status, reason, duration, timer=None):
+        """Stop a profile started by start() and record it. Returns the profile id."""
+        profile.disable()
+        self._active.release()
+        record = {
+            'id': next(self._ids),
+            'timestamp': round(time.time(), 3),
+            'route': route,
+            'method': method,
+            'status': status,
+            'reason': reason,
+            'duration_ms': round(duration * 1000, 3),
+            'stages': {stage: round(d * 1000, 3) for stage, d in timer.stages} if timer is not None else {},
+            'top_frames': top_frames(profile, self.frames)
+        }
+        self._profiles.append(record)
+        self.profiled += 1
+        return record['id']
+
+    def recent(self, limit=None):
+        """Recorded profiles, newest first"""
+        profiles = list(self._profiles)[::-1]
+        return profiles[:limit] if limit else profiles
+
+    def stats(self):
+        return {
+            'sample_rate': self.sample_rate,
+            'capacity': self.capacity,
+            'stored': len(self._profiles),
+            'profiled': self.profiled,
+            'skipped': self.skipped
+        }
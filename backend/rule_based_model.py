@@ -0,0 +1,54 @@
+"""Rule-based mock model that needs no ML dependencies"""
+
+# Mock crop data for testing
+MOCK_CROPS = [
+    'rice', 'maize', 'chickpea', 'kidneybeans', 'pigeonpeas', 'mothbeans',
+    'mungbean', 'blackgram', 'lentil', 'pomegranate', 'banana', 'mango',
+    'grapes', 'watermelon', 'muskmelon', 'apple', 'orange', 'papaya',
+    'coconut', 'cotton', 'jute', 'coffee'
+]
+
+
+def get_mock_prediction(features):
+    """Simple mock prediction based on input values"""
+    n, p, k, temp, humidity, ph, rainfall = features
+
+    # Simple rule-based prediction
+    if temp > 30 and humidity > 70 and rainfall > 150:
+        return 'rice'
+    elif temp > 25 and humidity > 60 and rainfall > 100:
+        return 'maize'
+    elif temp < 25 and humidity < 60 and rainfall < 100:
+        return 'chickpea'
+    elif temp > 30 and humidity > 65:
+        return 'banana'
+    elif temp > 25 and humidity > 50:
+        return 'mango'
+    elif temp > 30 and humidity < 50:
+        return 'cotton'
+    else:
+        return 'maize'  # default
+
+
+class RuleBasedModel:
+    """Same interface as CropRecommendationModel, answering from fixed rules"""
+
+    def __init__(self):
+        self.feature_columns = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+        self.crop_labels = list(MOCK_CROPS)
+
+    def predict_crop(self, features):
+        if len(features) != len(self.feature_columns):
+            raise ValueError("Exactly 7 features required: N, P, K, temperature, humidity, ph, rainfall")
+        recommended_crop = get_mock_prediction(features)
+        return {
+            'recommended_crop': recommended_crop,
+            'top_predictions': [
+                {'crop': recommended_crop, 'probability': 85.5},
+                {'crop': 'maize', 'probability': 12.3},
+                {'crop': 'rice', 'probability': 2.2}
+            ]
+        }
+
+    def predict_batch(self, features_list):
+        return [self.predict_crop(features) for features in features_list]
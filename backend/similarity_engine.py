@@ -0,0 +1,120 @@
+import numpy as np
+
+# Per-feature normalizers and weights used by the similarity score
+# (N, P, K, temperature, humidity, ph, rainfall)
+FEATURE_SCALES = [100.0, 100.0, 100.0, 20.0, 50.0, 3.0, 150.0]
+FEATURE_WEIGHTS = [1.0, 1.0, 1.0, 1.5, 1.2, 1.3, 1.4]
+
+
+class SimilarityEngine:
+    """Vectorized similarity scoring over the whole crop catalog.
+
+    The crop requirements are kept as a contiguous (n_crops x 7) float array
+    so one or many inputs can be scored against every crop in a single
+    broadcasted operation. Scores are bit-for-bit identical to
+    CropRecommendationModel.calculate_similarity.
+    """
+
+    def __init__(self, crop_requirements, scales=None, weights=None):
+        self.crop_names = list(crop_requirements.keys())
+        self.requirements = np.ascontiguousarray(
+            [crop_requirements[crop] for crop in self.crop_names], dtype=np.float64
+        ).reshape(len(self.crop_names), -1)
+        if scales is None:
+            scales = FEATURE_SCALES
+        if weights is None:
+            weights = FEATURE_WEIGHTS
+        self.scales = np.asarray(scales, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        # Python's sum() so the divisor matches the scalar implementation exactly
+        self.weight_sum = sum(float(w) for w in weights)
+
+    @classmethod
+    def from_arrays(cls, crop_names, requirements, scales=None, weights=None):
+        """Build an engine around an existing (n_crops x 7) array without copying it"""
+        engine = cls.__new__(cls)
+        engine.crop_names = list(crop_names)
+        engine.requirements = np.asarray(requirements, dtype=np.float64)
+        if scales is None:
+            scales = FEATURE_SCALES
+        if weights is None:
+            weights = FEATURE_WEIGHTS
+        engine.scales = np.asarray(scales, dtype=np.float64)
+        engine.weights = np.asarray(weights, dtype=np.float64)
+        engine.weight_sum = sum(float(w) for w in weights)
+        return engine
+
+    @property
+    def n_crops(self):
+        return self.requirements.shape[0]
+
+    def score(self, inputs):
+        """Score inputs against every crop.
+
+        Accepts a single feature vector of shape (7,) or a batch of shape
+        (n, 7) and returns an array of shape (n_crops,) or (n, n_crops).
+        """
+        X = np.asarray(inputs, dtype=np.float64)
+        single = X.ndim == 1
+        X = np.atleast_2d(X)
+        if X.shape[1] != self.requirements.shape[1]:
+            raise ValueError("Exactly 7 features required: N, P, K, temperature, humidity, ph, rainfall")
+
+        diff = np.abs(X[:, None, :] - self.requirements[None, :, :])
+        per_feature = np.maximum(0.0, 1.0 - diff / self.scales)
+        per_feature *= self.weights
+        # Reducing over the 7-wide innermost axis sums left to right, the same
+        # order as the per-feature loop in calculate_similarity
+        scores = per_feature.sum(axis=2) / self.weight_sum
+        return scores[0] if single else scores
+
+    def top_k(self, scores, k=3):
+        """Return (indices, scores) of the k best crops per row.
+
+        Uses partial selection instead of a full sort. Ties are broken by
+        catalog order, matching the stable sorted() used by predict_crop.
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        single = scores.ndim == 1
+        scores = np.atleast_2d(scores)
+        n_rows, n_crops = scores.shape
+        k = min(k, n_crops)
+
+        if k == n_crops:
+            candidates = np.broadcast_to(np.arange(n_crops), scores.shape).copy()
+        else:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+
+        # Order the k candidates by score (desc), then catalog index (asc)
+        order = np.lexsort((candidates, -candidate_scores), axis=1)
+        indices = np.take_along_axis(candidates, order, axis=1)
+        top_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+        # argpartition picks arbitrarily among crops tied with the k-th score;
+        # redo the (rare) rows where that choice differs from a stable sort
+        kth = top_scores[:, -1:]
+        tied_total = (scores == kth).sum(axis=1)
+        tied_taken = (top_scores == kth).sum(axis=1)
+        for row in np.nonzero(tied_total != tied_taken)[0]:
+            stable = np.argsort(-scores[row], kind='stable')[:k]
+            indices[row] = stable
+            top_scores[row] = scores[row, stable]
+
+        if single:
+            return indices[0], top_scores[0]
+        return indices, top_scores
+
+    def rank(self, inputs, k=3):
+        """Score inputs and return the top-k as lists of (crop, score) per input."""
+        X = np.asarray(inputs, dtype=np.float64)
+        if X.ndim == 1:
+            # One row: a stable Python sort of the catalog beats top_k's numpy call overhead
+            scores = self.score(X).tolist()
+            order = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:k]
+            return [(self.crop_names[i], scores[i]) for i in order]
+        indices, top_scores = self.top_k(self.score(X), k)
+        return [
+            [(self.crop_names[i], float(s)) for i, s in zip(row_idx, row_scores)]
+            for row_idx, row_scores in zip(indices.tolist(), top_scores.tolist())
+        ]
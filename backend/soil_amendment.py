@@ -0,0 +1,321 @@
+"""Cheapest soil amendment that makes a target crop the recommendation.
+
+The similarity score is a weighted sum of one term per feature,
+w_i * max(0, 1 - |x_i - r_ci| / s_i), so along each feature every crop's
+score is piecewise linear with breakpoints at r_ci and r_ci +/- s_i. The
+goal (the target crop ahead of every other crop, or reaching a score) is a
+set of constraints that are linear between breakpoints, and so is the
+amendment cost sum_i cost_i * |x_i - x0_i|.
+
+The breakpoints of the amendable features (N, P, K, pH) split their box
+into cells, and inside a cell the problem is a small linear program. The
+optimizer therefore:
+
+1. scores every combination of breakpoints in one vectorized pass, which
+   gives the cheapest feasible cell corner;
+2. bounds every cell in one pass: a cell is skipped when some constraint
+   fails at all its corners, or when its nearest corner already costs more
+   than the best answer;
+3. solves the remaining cells exactly, cheapest first, by enumerating the
+   vertices of their linear programs.
+
+The answer is the cheapest amendment up to floating-point rounding.
+
+Climate features (temperature, humidity, rainfall) are never changed.
+
+Example request body for POST /api/amendment:
+
+    {"N": 40, "P": 30, "K": 30, "temperature": 26, "humidity": 60,
+     "ph": 6.5, "rainfall": 120, "crop": "maize",
+     "costs": {"N": 1.5, "ph": 40}, "bounds": {"ph": [5.5, 8]}}
+"""
+import itertools
+
+import numpy as np
+
+from feature_schema import FEATURE_SCHEMA
+
+AMENDABLE_FEATURES = ['N', 'P', 'K', 'ph']
+
+GOAL_RANK = 'rank'
+GOAL_SCORE = 'score'
+
+# Strict lead (in score units) so the target wins rather than ties
+EPSILON = 1e-6
+# Rounding slack when checking constraints, well below EPSILON
+_TOLERANCE = 1e-9
+
+
+def default_costs(engine, schema=None):
+    """Cost per unit of change: 100 / scale, so moving any feature across its scale costs 100"""
+    schema = list(schema or FEATURE_SCHEMA)
+    return {feature.name: 100.0 / float(scale) for feature, scale in zip(schema, engine.scales)}
+
+
+class AmendmentProblem:
+    """Scores and goal constraints of one request, split into per-feature terms"""
+
+    def __init__(self, engine, base, target, features, costs, bounds, goal=GOAL_RANK, lead=0.0,
+                 target_score=None, schema=None):
+        schema = list(schema or FEATURE_SCHEMA)
+        names = [feature.name for feature in schema]
+        self.engine = engine
+        self.base = np.asarray(base, dtype=np.float64)
+        self.target = engine.crop_names.index(target)
+        self.columns = [names.index(name) for name in features]
+        self.costs = np.asarray([costs[name] for name in features], dtype=np.float64)
+        self.lows = np.asarray([bounds[name][0] for name in features], dtype=np.float64)
+        self.highs = np.asarray([bounds[name][1] for name in features], dtype=np.float64)
+
+        # Constraint k holds when scores @ A[k] - b[k] >= 0
+        n_crops = engine.n_crops
+        if goal == GOAL_SCORE:
+            A = np.zeros((1, n_crops))
+            A[0, self.target] = 1.0
+            b = np.asarray([target_score / 100.0])
+        else:
+            others = [c for c in range(n_crops) if c != self.target]
+            A = np.zeros((len(others), n_crops))
+            A[:, self.target] = 1.0
+            A[np.arange(len(others)), others] = -1.0
+            b = np.full(len(others), lead / 100.0 + EPSILON)
+        self.A = A
+
+        # Features that are not amended contribute a constant
+        fixed = [i for i in range(len(self.base)) if i not in self.columns]
+        constant = sum((self.term(i, self.base[i:i + 1])[0] for i in fixed), np.zeros(n_crops))
+        self.constant = constant @ A.T - b
+
+        self.candidates = [self.breakpoints(j) for j in range(len(self.columns))]
+        self.constraint_terms = [self.term(column, values) @ A.T
+                                 for column, values in zip(self.columns, self.candidates)]
+
+    def term(self, column, values):
+        """Weighted score term of one feature for each value, shape (len(values), n_crops)"""
+        engine = self.engine
+        diff = np.abs(np.asarray(values, dtype=np.float64)[:, None] - engine.requirements[None, :, column])
+        return np.maximum(0.0, 1.0 - diff / engine.scales[column]) * (engine.weights[column] / engine.weight_sum)
+
+    def breakpoints(self, j):
+        """Sorted values of amendable feature j where some crop's term changes slope, plus the ends"""
+        column = self.columns[j]
+        requirements = self.engine.requirements[:, column]
+        scale = self.engine.scales[column]
+        values = np.concatenate([requirements, requirements - scale, requirements + scale,
+                                 [self.lows[j], self.highs[j], self.base[column]]])
+        values = values[(values >= self.lows[j]) & (values <= self.highs[j])]
+        return np.unique(values)
+
+    def cost(self, values):
+        return float(np.sum(self.costs * np.abs(np.asarray(values) - self.base[self.columns])))
+
+    def margins(self, values):
+        """Constraint values at one amended point, shape (n_constraints,)"""
+        total = self.constant.copy()
+        for column, value in zip(self.columns, values):
+            total += self.term(column, [value])[0] @ self.A.T
+        return total
+
+    def _total(self, arrays):
+        """Sum per-feature arrays (n_j, ...) over every combination, shape (n_0, ..., n_m-1, ...)"""
+        m = len(arrays)
+        total = 0.0
+        for j, values in enumerate(arrays):
+            view = [1] * m
+            view[j] = len(values)
+            total = total + values.reshape(view + list(values.shape[1:]))
+        return total
+
+    def search(self):
+        """Cheapest feasible amended values, as (values, None), or (None, best grid margin).
+
+        Breakpoints split the box into cells; inside a cell every constraint
+        and the cost are linear. The breakpoint grid gives a first answer.
+        Then every cell that can hold a feasible point, and whose nearest
+        corner costs less than the best answer so far, is solved exactly
+        (see solve_cell), cheapest corner first.
+        """
+        m = len(self.columns)
+        x0 = self.base[self.columns]
+        shape = tuple(len(values) for values in self.candidates)
+        margin = (self.constant + self._total(self.constraint_terms)).min(axis=-1)
+        grid_cost = self._total([cost * np.abs(values - start)
+                                 for cost, values, start in zip(self.costs, self.candidates, x0)])
+        best, best_cost = None, np.inf
+        feasible = np.flatnonzero(margin.ravel() >= -_TOLERANCE)
+        if len(feasible):
+            flat = feasible[np.argmin(grid_cost.ravel()[feasible])]
+            index = np.unravel_index(flat, shape)
+            best = np.asarray([self.candidates[j][index[j]] for j in range(m)])
+            best_cost = float(grid_cost.ravel()[flat])
+
+        # Cell ends per feature; a feature with a single allowed value has one flat cell
+        self.cell_lows = [values[:-1] if len(values) > 1 else values for values in self.candidates]
+        self.cell_highs = [values[1:] if len(values) > 1 else values for values in self.candidates]
+        self.term_lows = [terms[:-1] if len(terms) > 1 else terms for terms in self.constraint_terms]
+        self.term_highs = [terms[1:] if len(terms) > 1 else terms for terms in self.constraint_terms]
+        # A linear function's extremes over a box are at its corners, and the
+        # corner extremes of a separable sum are the sums of per-feature extremes
+        highest = self.constant + self._total([np.maximum(a, b) for a, b in zip(self.term_lows, self.term_highs)])
+        self.cell_min = self.constant + self._total([np.minimum(a, b) for a, b in zip(self.term_lows, self.term_highs)])
+        lower_bound = self._total([cost * np.maximum(0.0, np.maximum(lows - start, start - highs))
+                                   for cost, lows, highs, start in zip(self.costs, self.cell_lows, self.cell_highs, x0)])
+        open_cells = np.flatnonzero(((highest >= -_TOLERANCE).all(axis=-1) & (lower_bound < best_cost)).ravel())
+        bounds = lower_bound.ravel()[open_cells]
+        for flat in open_cells[np.argsort(bounds, kind='stable')].tolist():
+            if lower_bound.ravel()[flat] >= best_cost:
+                break
+            values, cost = self.solve_cell(np.unravel_index(flat, lower_bound.shape))
+            if values is not None and cost < best_cost:
+                best, best_cost = values, cost
+
+        if best is None:
+            return None, float(margin.max())
+        return best, None
+
+    def solve_cell(self, index):
+        """Cheapest feasible point of one cell, as (values, cost) or (None, None).
+
+        An optimum of a linear program is at a vertex: each feature is at an
+        end of its interval or free, with as many constraints tight as there
+        are free features. Corners were already scored on the grid, so only
+        vertices with at least one free feature are enumerated here.
+        """
+        m = len(self.columns)
+        x0 = self.base[self.columns]
+        lows = np.asarray([self.cell_lows[j][index[j]] for j in range(m)])
+        widths = np.asarray([self.cell_highs[j][index[j]] for j in range(m)]) - lows
+        # Constraints satisfied at every corner hold in the whole cell
+        rows = np.flatnonzero(self.cell_min[index] < -_TOLERANCE)
+        at_low = self.constant[rows] + sum(self.term_lows[j][index[j]][rows] for j in range(m))
+        slopes = np.zeros((len(rows), m))
+        for j in range(m):
+            if widths[j] > 0:
+                slopes[:, j] = (self.term_highs[j][index[j]][rows] - self.term_lows[j][index[j]][rows]) / widths[j]
+
+        best, best_cost = None, None
+        for r in range(1, min(m, len(rows)) + 1):
+            tight = np.asarray(list(itertools.combinations(range(len(rows)), r)))
+            for free in itertools.combinations(range(m), r):
+                free = list(free)
+                fixed = [j for j in range(m) if j not in free]
+                system = slopes[tight][:, :, free]
+                solvable = np.abs(np.linalg.det(system)) > 1e-12
+                if not solvable.any():
+                    continue
+                picked = tight[solvable]
+                # Every combination of interval ends for the fixed features
+                corners = np.asarray(list(itertools.product(*[(0.0, widths[j]) for j in fixed])), dtype=np.float64)
+                rhs = -at_low[picked][:, :, None] - np.einsum('nrf,pf->nrp', slopes[picked][:, :, fixed], corners)
+                offsets = np.empty((len(picked), len(corners), m))
+                offsets[:, :, free] = np.linalg.solve(system[solvable], rhs).transpose(0, 2, 1)
+                offsets[:, :, fixed] = corners
+                inside = ((offsets >= -1e-9) & (offsets <= widths + 1e-9)).all(axis=-1)
+                offsets = np.clip(offsets, 0.0, widths)
+                ok = inside & ((at_low + offsets @ slopes.T).min(axis=-1) >= -_TOLERANCE)
+                if not ok.any():
+                    continue
+                points = lows + offsets[ok]
+                costs = (self.costs * np.abs(points - x0)).sum(axis=-1)
+                i = int(np.argmin(costs))
+                if best_cost is None or costs[i] < best_cost:
+                    best, best_cost = points[i], float(costs[i])
+        return best, best_cost
+
+
+def parse_options(data, crop_names, schema=None):
+    """Read crop, goal, lead, target_score, features, costs and bounds from a request body.
+
+    Returns (options, error); options are keyword arguments for optimize_amendment.
+    """
+    schema = {feature.name: feature for feature in (schema or FEATURE_SCHEMA)}
+    target = data.get('crop')
+    if target not in crop_names:
+        return None, f'"crop" must be one of: {", ".join(crop_names)}'
+    options = {'target': target}
+
+    goal = data.get('goal', GOAL_RANK)
+    if goal not in (GOAL_RANK, GOAL_SCORE):
+        return None, f'goal must be "{GOAL_RANK}" or "{GOAL_SCORE}"'
+    options['goal'] = goal
+    try:
+        if goal == GOAL_SCORE:
+            if 'target_score' not in data:
+                return None, 'target_score (0-100) is required for the score goal'
+            options['target_score'] = float(data['target_score'])
+            if not (0 <= options['target_score'] <= 100):
+                return None, 'target_score must be between 0 and 100'
+        options['lead'] = float(data.get('lead', 0))
+        if options['lead'] < 0:
+            return None, 'lead must not be negative'
+    except (TypeError, ValueError):
+        return None, 'target_score and lead must be numeric'
+
+    features = data.get('features', AMENDABLE_FEATURES)
+    if not isinstance(features, list) or not features or \
+            any(not isinstance(name, str) or name not in AMENDABLE_FEATURES for name in features) or \
+            len(set(features)) != len(features):
+        return None, f'features must list some of: {", ".join(AMENDABLE_FEATURES)}'
+    options['features'] = features
+
+    costs = data.get('costs', {})
+    bounds = data.get('bounds', {})
+    if not isinstance(costs, dict) or not isinstance(bounds, dict):
+        return None, 'costs and bounds must be objects keyed by feature'
+    options['costs'], options['bounds'] = {}, {}
+    for name, cost in costs.items():
+        if name not in AMENDABLE_FEATURES:
+            return None, f'Unknown cost feature: {name}'
+        if isinstance(cost, bool) or not isinstance(cost, (int, float)) or not np.isfinite(cost) or cost < 0:
+            return None, f'Cost for {name} must be a non-negative number'
+        options['costs'][name] = float(cost)
+    for name, pair in bounds.items():
+        if name not in AMENDABLE_FEATURES:
+            return None, f'Unknown bounds feature: {name}'
+        try:
+            low, high = (float(v) for v in pair)
+        except (TypeError, ValueError):
+            return None, f'Bounds for {name} must be [low, high]'
+        if low > high or low < schema[name].low or high > schema[name].high:
+            return None, f'Bounds for {name} must be [low, high] within {schema[name].low}-{schema[name].high}'
+        options['bounds'][name] = (low, high)
+    return options, None
+
+
+def optimize_amendment(engine, base, target, features=None, costs=None, bounds=None,
+                       goal=GOAL_RANK, lead=0.0, target_score=None, schema=None):
+    """Find the cheapest change to the amendable features that meets the goal.
+
+    engine is a SimilarityEngine; base the 7 current feature values. costs
+    maps a feature to its cost per unit of change (default_costs() for the
+    rest) and bounds to a (low, high) pair inside the schema's range.
+    Returns {'feasible', 'cost', 'amended', 'changes'}, or {'feasible': False,
+    'shortfall'} with the score points still missing at the closest point.
+    """
+    schema = list(schema or FEATURE_SCHEMA)
+    features = list(features or AMENDABLE_FEATURES)
+    unit_costs = default_costs(engine, schema)
+    unit_costs.update(costs or {})
+    limits = {feature.name: (float(feature.low), float(feature.high)) for feature in schema}
+    limits.update(bounds or {})
+
+    problem = AmendmentProblem(engine, base, target, features, unit_costs, limits, goal, lead, target_score, schema)
+    current = problem.base[problem.columns]
+    if (current >= problem.lows).all() and (current <= problem.highs).all() \
+            and problem.margins(current).min() >= -_TOLERANCE:
+        best = current
+    else:
+        best, gap = problem.search()
+        if best is None:
+            return {'feasible': False, 'shortfall': round(-gap * 100, 4)}
+
+    amended = problem.base.copy()
+    amended[problem.columns] = np.round(best, 6)
+    return {
+        'feasible': True,
+        'cost': round(problem.cost(amended[problem.columns]), 4),
+        'amended': amended.tolist(),
+        'changes': {name: round(float(amended[column] - problem.base[column]), 6)
+                    for name, column in zip(features, problem.columns) if amended[column] != problem.base[column]}
+    }
+
@@ -0,0 +1,85 @@
+"""Startup-time budget check for the backend.
+
+Measures, in a fresh interpreter, how long it takes to import the app,
+warm up the model and answer the first /api/predict request, and fails
+if the total goes over the budget.
+
+Usage:
+    python startup_benchmark.py --budget-ms 1500
+    STARTUP_BUDGET_MS=800 python startup_benchmark.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = 1500
+
+# Runs in the child interpreter; prints one JSON line of timings
+_CHILD = r'''
+import json, time
+t0 = time.perf_counter()
+import wsgi as app_module
+t1 = time.perf_counter()
+service = app_module.app.extensions['model_service']
+service.warm_up()
+t2 = time.perf_counter()
+client = app_module.app.test_client()
+response = client.post('/api/predict', json={
+    'N': 60, 'P': 30, 'K': 30, 'temperature': 25, 'humidity': 60, 'ph': 6.5, 'rainfall': 150
+})
+t3 = time.perf_counter()
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'warm_up_ms': (t2 - t1) * 1000,
+    'first_prediction_ms': (t3 - t2) * 1000,
+    'total_ms': (t3 - t0) * 1000,
+    'status_code': response.status_code,
+}))
+'''
+
+
+def measure_once(env=None):
+    """Run the startup sequence in a fresh interpreter and return its timings"""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, '-c', _CHILD], cwd=backend_dir, env=env or os.environ.copy(),
+        capture_output=True, text=True, check=True
+    )
+    # The app prints load messages; the timings are the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check import + first-prediction time against a budget")
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.environ.get('STARTUP_BUDGET_MS', DEFAULT_BUDGET_MS)),
+                        help=f"Budget for import + warm-up + first prediction (default: {DEFAULT_BUDGET_MS})")
+    parser.add_argument('--runs', type=int, default=3, help="Fresh interpreters to measure; the median is checked")
+    args = parser.parse_args(argv)
+
+    runs = []
+    for _ in range(args.runs):
+        timings = measure_once()
+        if timings['status_code'] != 200:
+            print(f"First prediction failed with status {timings['status_code']}")
+            return 1
+        runs.append(timings)
+
+    print(f"{'stage':<22}{'median ms':>12}{'max ms':>12}")
+    for stage in ('import_ms', 'warm_up_ms', 'first_prediction_ms', 'total_ms'):
+        values = [run[stage] for run in runs]
+        print(f"{stage:<22}{statistics.median(values):>12.1f}{max(values):>12.1f}")
+
+    total = statistics.median(run['total_ms'] for run in runs)
+    if total > args.budget_ms:
+        print(f"FAIL: startup took {total:.1f} ms, budget is {args.budget_ms:.0f} ms")
+        return 1
+    print(f"OK: startup took {total:.1f} ms, budget is {args.budget_ms:.0f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Prebuilt, precompressed JSON responses with strong ETags.
+
+Used for endpoints whose body only changes with the model (/api/crops,
+/api/crop-info). Each body is serialized, hashed and compressed once per
+model version; requests then only pick a variant or answer 304.
+"""
+import gzip
+import hashlib
+import threading
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Preferred order when the client accepts several encodings
+ENCODINGS = ['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip']
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 256
+
+
+def parse_accept_encoding(header):
+    """Encodings the client accepts (q > 0), lower-cased"""
+    accepted = set()
+    for part in (header or '').split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(token)
+    return accepted
+
+
+class PrebuiltResponse:
+    """A serialized body with its compressed variants and their ETags"""
+
+    def __init__(self, body, max_age=300):
+        self.digest = hashlib.sha256(body).hexdigest()[:20]
+        self.cache_control = f'public, max-age={max_age}'
+        self.variants = {None: body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            # mtime=0 keeps the gzip bytes, and so the ETag, reproducible
+            self.variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+            if BROTLI_AVAILABLE:
+                self.variants['br'] = brotli.compress(body, quality=11)
+
+    def etag(self, encoding=None):
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def select(self, accept_encoding):
+        """Return (encoding, body) of the smallest variant the client accepts"""
+        accepted = parse_accept_encoding(accept_encoding)
+        for encoding in ENCODINGS:
+            if encoding in self.variants and (encoding in accepted or '*' in accepted):
+                return encoding, self.variants[encoding]
+        return None, self.variants[None]
+
+    def not_modified(self, if_none_match):
+        """Whether If-None-Match names any variant of this body"""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag == '*':
+                return True
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag.strip('"').split('-')[0] == self.digest:
+                return True
+        return False
+
+    def respond(self, if_none_match=None, accept_encoding=None):
+        """Return (status, headers, body) for a request with these headers"""
+        encoding, body = self.select(accept_encoding)
+        headers = {
+            'ETag': self.etag(encoding),
+            'Cache-Control': self.cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+        if self.not_modified(if_none_match):
+            return 304, headers, b''
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return 200, headers, body
+
+
+class ResponseCache:
+    """Prebuilt responses keyed by name, rebuilt when the model version changes"""
+
+    def __init__(self, dumps, max_age=300):
+        self.dumps = dumps
+        self.max_age = max_age
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, version, build):
+        """Return the response for (name, version), calling build() for its payload once"""
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry[0] != version:
+                entry = (version, PrebuiltResponse(self.dumps(build()), self.max_age))
+                self._entries[name] = entry
+            return entry[1]
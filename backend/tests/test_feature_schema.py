@@ -0,0 +1,126 @@
+"""FeatureValidator against the hand-written validation it replaced.
+
+Run from backend/: python -m unittest discover tests
+"""
+import contextlib
+import io
+import math
+import os
+import tempfile
+import unittest
+
+from feature_schema import FeatureValidator
+
+try:
+    import flask
+    import numpy as np
+except ImportError:
+    flask = np = None
+
+FEATURE_COLUMNS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+FEATURE_RANGES = [
+    (0, 200, 'N (Nitrogen) must be between 0 and 200'),
+    (0, 200, 'P (Phosphorus) must be between 0 and 200'),
+    (0, 200, 'K (Potassium) must be between 0 and 200'),
+    (0, 50, 'Temperature must be between 0 and 50°C'),
+    (0, 100, 'Humidity must be between 0 and 100%'),
+    (0, 14, 'pH must be between 0 and 14'),
+    (0, 500, 'Rainfall must be between 0 and 500mm'),
+]
+
+VALID = {'N': 60, 'P': 30, 'K': 30, 'temperature': 25, 'humidity': 60, 'ph': 6.5, 'rainfall': 150}
+
+
+def legacy_validate(data):
+    """validate_parameters as app.py had it before the schema"""
+    if not isinstance(data, dict):
+        return None, 'Input parameters must be a JSON object'
+    for field in FEATURE_COLUMNS:
+        if field not in data:
+            return None, f'Missing required field: {field}'
+    try:
+        features = [float(data[field]) for field in FEATURE_COLUMNS]
+    except (ValueError, TypeError):
+        return None, 'All parameters must be numeric values'
+    for value, (low, high, message) in zip(features, FEATURE_RANGES):
+        if not (low <= value <= high):
+            return None, message
+    return features, None
+
+
+def payloads():
+    yield from (None, [], [VALID], 'N=60', 42)
+    yield dict(VALID)
+    yield dict(VALID, location='Pune', extra=[1, 2])
+    for name in FEATURE_COLUMNS:
+        yield {key: value for key, value in VALID.items() if key != name}
+        for value in ('abc', None, [1], {}, '', '12', True, float('nan'), float('inf'), -0.0, -1e-9, 1e9):
+            yield dict(VALID, **{name: value})
+    for low, high in ((0, 0), (200, 50), (201, 51), (-1, 'x')):
+        yield dict(VALID, N=low, temperature=high)
+    # Several problems at once: the first check in order wins
+    yield {'N': 'x'}
+    yield {'N': 999, 'P': 'x', 'K': 30, 'temperature': 25, 'humidity': 60, 'ph': 6.5}
+    yield dict(VALID, N=999, ph='x')
+    yield dict(VALID, N=999, rainfall=-5)
+
+
+class FeatureValidatorTest(unittest.TestCase):
+
+    def test_matches_legacy_validation(self):
+        validator = FeatureValidator()
+        for data in payloads():
+            features, error = validator.validate(data)
+            expected_features, expected_error = legacy_validate(data)
+            self.assertEqual(error, expected_error, data)
+            self.assertEqual(features, expected_features, data)
+
+    def test_batch_reports_each_item(self):
+        validator = FeatureValidator()
+        items = list(payloads())
+        valid_indices, valid_features, errors = validator.validate_batch(items)
+        for i, data in enumerate(items):
+            features, error = legacy_validate(data)
+            if error:
+                self.assertEqual(errors[i], error)
+                self.assertNotIn(i, valid_indices)
+            else:
+                self.assertEqual(valid_features[valid_indices.index(i)], features)
+        self.assertEqual(len(valid_indices) + len(errors), len(items))
+
+
+@unittest.skipIf(flask is None or np is None, "needs flask and numpy")
+class PredictValidationTest(unittest.TestCase):
+
+    def setUp(self):
+        from app import create_app
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.app = create_app({'MODEL_PATH': os.path.join(tmp.name, 'crop_model.json'), 'JSON_ENGINE': 'std',
+                                   'WARM_UP': 'eager', 'MODEL_WATCH_INTERVAL': 0})
+        self.client = self.app.test_client()
+
+    def test_errors_match_legacy_validation(self):
+        for data in payloads():
+            # None sends no JSON body, and standard JSON has no NaN or infinity
+            if data is None or isinstance(data, dict) and not all(
+                    math.isfinite(value) for value in data.values() if isinstance(value, float)):
+                continue
+            response = self.client.post('/api/predict', json=data)
+            error = legacy_validate(data)[1]
+            if error:
+                self.assertEqual((response.status_code, response.get_json()), (400, {'error': error}), data)
+            else:
+                self.assertEqual(response.status_code, 200, data)
+
+    def test_echo_inputs_flag(self):
+        response = self.client.post('/api/predict', json=dict(VALID, location='Pune')).get_json()
+        self.assertEqual(response['input_parameters'], dict({k: float(v) for k, v in VALID.items()}, location='Pune'))
+        response = self.client.post('/api/predict?echo_inputs=false', json=VALID).get_json()
+        self.assertNotIn('input_parameters', response)
+        self.assertTrue(response['success'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""Forest compaction: the written forest matches the report, and quantized artifacts are marked.
+
+Run from backend/: python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import struct
+import tempfile
+import unittest
+
+try:
+    import numpy as np
+    from crop_model import training_dependencies_available
+except ImportError:
+    np = None
+
+if np is not None and training_dependencies_available():
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+else:
+    np = None
+
+
+@unittest.skipIf(np is None, "needs numpy, pandas, scikit-learn and joblib")
+class CompactionTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from crop_model import CropRecommendationModel
+        model = CropRecommendationModel()
+        df = model.create_sample_data(n_samples=1100, random_state=0)
+        cls.feature_columns = list(model.feature_columns)
+        cls.forest = RandomForestClassifier(n_estimators=20, random_state=0).fit(
+            df[cls.feature_columns].to_numpy(dtype=np.float32), df['label'].astype(str).to_numpy())
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def test_written_forest_is_the_one_reported(self):
+        from forest_compaction import compact_forest, load_holdout, main, split_holdout
+        from forest_engine import load_forest
+        model_path = os.path.join(self.tmp, 'crop_model.pkl')
+        joblib.dump({'model': self.forest, 'feature_columns': self.feature_columns}, model_path)
+        output = os.path.join(self.tmp, 'crop_forest.npz')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(main([model_path, '--trees', '8', '--samples', '600', '-o', output]), 0)
+        X, y = load_holdout(None, self.feature_columns, samples=600)
+        (X_rank, y_rank), _ = split_holdout(X, y)
+        expected = compact_forest(self.forest, self.feature_columns, n_trees=8, threshold_dtype='float32',
+                                  value_dtype='uint8', X=X_rank, y=y_rank)
+        written = load_forest(output)
+        for name in ('roots', 'threshold', 'leaf_value'):
+            np.testing.assert_array_equal(written[name], expected[name])
+
+    def test_quantized_artifact_is_marked(self):
+        import model_artifact
+        from forest_compaction import compact_forest
+        from forest_engine import ForestEngine
+        X = np.random.default_rng(0).uniform(0, 100, (50, 7))
+        for value_dtype, version in (('float64', 1), ('float16', 1), ('uint8', 2)):
+            arrays = compact_forest(self.forest, self.feature_columns, threshold_dtype='float32',
+                                    value_dtype=value_dtype)
+            path = os.path.join(self.tmp, f'{value_dtype}.kmdl')
+            section, section_arrays = model_artifact.forest_section(arrays)
+            model_artifact.write_artifact(path, {'forest': section}, section_arrays)
+            with open(path, 'rb') as f:
+                self.assertEqual(struct.unpack_from('<I', f.read(12), 8)[0], version, value_dtype)
+            loaded = model_artifact.forest_from_artifact(*model_artifact.read_artifact(path))
+            np.testing.assert_array_equal(ForestEngine(loaded).predict_proba(X), ForestEngine(arrays).predict_proba(X))
+
+        section['format_version'] = 3
+        with self.assertRaises(model_artifact.ArtifactError):
+            model_artifact.forest_from_artifact({'forest': section}, section_arrays)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""ForestEngine against scikit-learn's RandomForestClassifier.predict_proba.
+
+Run from backend/: python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+try:
+    import numpy as np
+    from sklearn.ensemble import RandomForestClassifier
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "needs numpy and scikit-learn")
+class ForestParityTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from crop_model import SAMPLE_CROP_REQUIREMENTS, SAMPLE_NOISE_STD
+        rng = np.random.default_rng(0)
+        crops = list(SAMPLE_CROP_REQUIREMENTS)
+        requirements = np.asarray([SAMPLE_CROP_REQUIREMENTS[crop] for crop in crops])
+        labels = np.repeat(np.arange(len(crops)), 40)
+        X = np.maximum(0.0, requirements[labels] + rng.normal(0.0, SAMPLE_NOISE_STD, (len(labels), 7)))
+        cls.forest = RandomForestClassifier(n_estimators=30, random_state=0).fit(X, np.asarray(crops)[labels])
+        cls.inputs = np.maximum(0.0, requirements[rng.integers(0, len(crops), 500)]
+                                + rng.normal(0.0, SAMPLE_NOISE_STD, (500, 7)) * 1.5)
+
+    def engine(self, **options):
+        from forest_engine import ForestEngine, export_forest
+        return ForestEngine(export_forest(self.forest, **options))
+
+    def test_predict_proba_matches_sklearn(self):
+        engine = self.engine()
+        np.testing.assert_array_equal(engine.predict_proba(self.inputs), self.forest.predict_proba(self.inputs))
+        self.assertEqual(engine.classes, [str(c) for c in self.forest.classes_])
+        self.assertEqual(engine.predict(self.inputs), self.forest.predict(self.inputs).tolist())
+
+    def test_single_input_matches_batch(self):
+        engine = self.engine()
+        batch = engine.predict_proba(self.inputs[:20])
+        for row, features in zip(batch, self.inputs[:20].tolist()):
+            np.testing.assert_array_equal(engine.predict_proba(features)[0], row)
+
+    def test_tree_subset_matches_sklearn_subset(self):
+        engine = self.engine(trees=range(10))
+        X = self.inputs.astype(np.float32)
+        expected = np.mean([tree.predict_proba(X) for tree in self.forest.estimators_[:10]], axis=0)
+        np.testing.assert_allclose(engine.predict_proba(self.inputs), expected, rtol=0, atol=1e-12)
+
+    def test_saved_forest_model_matches(self):
+        from forest_engine import ForestModel, export_forest, format_predictions, save_forest
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'crop_forest.npz')
+            save_forest(export_forest(self.forest), path)
+            model = ForestModel()
+            with contextlib.redirect_stdout(io.StringIO()):
+                model.load_model(path)
+        expected = format_predictions(self.forest.predict_proba(self.inputs), [str(c) for c in self.forest.classes_])
+        self.assertEqual(model.predict_batch(self.inputs.tolist()), expected)
+        self.assertEqual(model.predict_crop(self.inputs[0].tolist()), expected[0])
+
+    def test_early_exit_keeps_top_k_order(self):
+        engine = self.engine()
+        full = engine.predict_proba(self.inputs)
+        for top_k in (1, 3):
+            stopped = 0
+            for features, expected in zip(self.inputs, full):
+                probabilities, trees = engine.predict_proba_early(features, top_k=top_k)
+                order = np.argsort(-probabilities, kind='stable')[:top_k]
+                np.testing.assert_array_equal(order, np.argsort(-expected, kind='stable')[:top_k])
+                if trees == engine.n_trees:
+                    np.testing.assert_allclose(probabilities, expected, rtol=0, atol=1e-12)
+                stopped += trees < engine.n_trees
+            self.assertGreater(stopped, 0, top_k)
+
+    def test_early_exit_margin(self):
+        engine = self.engine()
+        for features in self.inputs[:100]:
+            probabilities, trees = engine.predict_proba_early(features, margin=0.5, min_trees=5)
+            self.assertGreaterEqual(trees, 5)
+            first, second = np.sort(probabilities)[::-1][:2]
+            if trees < engine.n_trees:
+                # Partial averages: the margin was reached, or the runner-up can no longer catch up
+                lead = first - second
+                self.assertTrue(lead >= 0.5 - 1e-12 or lead * trees > engine.n_trees - trees, (lead, trees))
+
+    def test_early_exit_reports_trees_evaluated(self):
+        from forest_engine import ForestModel, export_forest
+        model = ForestModel(export_forest(self.forest), early_exit_margin=0.0)
+        trees = [model.predict_crop(features)['trees_evaluated'] for features in self.inputs[:50].tolist()]
+        self.assertTrue(all(5 < n <= 30 for n in trees))
+        self.assertLess(min(trees), 30)
+        # Batches take one vectorized pass over every tree
+        batch = model.predict_batch(self.inputs[:2].tolist())
+        self.assertEqual([p['trees_evaluated'] for p in batch], [30, 30])
+        self.assertNotIn('trees_evaluated', ForestModel(export_forest(self.forest)).predict_crop(self.inputs[0].tolist()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+"""ModelService hot reload: atomic swaps and recovery from a failed first load.
+
+Run from backend/: python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from model_service import STATE_FAILED, ModelService, ModelUnavailableError
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Rice-like conditions; the second model version moves rice's requirements away from them
+RICE_FEATURES = [80, 40, 40, 25, 80, 6.5, 200]
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class ModelServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.model_path = os.path.join(self.tmp.name, 'crop_model.json')
+        # Loading and saving models prints progress
+        stack = contextlib.ExitStack()
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        self.addCleanup(stack.close)
+
+    def service(self, **options):
+        service = ModelService(model_path=self.model_path, **options)
+        self.addCleanup(service.stop_watching)
+        return service
+
+    def write_model(self, path, rice=None):
+        from crop_model_simple import CropRecommendationModel
+        model = CropRecommendationModel()
+        if rice is not None:
+            model.crop_requirements['rice'] = rice
+        model.save_model(path)
+
+    def test_reload_swaps_model_and_version_together(self):
+        self.write_model(self.model_path)
+        service = self.service(cache_size=0)
+        service.warm_up()
+        old_version = service.model_version
+        expected = {old_version: service.predict(RICE_FEATURES)[0]}
+        self.assertEqual(expected[old_version]['recommended_crop'], 'rice')
+
+        new_path = os.path.join(self.tmp.name, 'crop_model_v2.json')
+        self.write_model(new_path, rice=[0, 0, 0, 10, 10, 4.0, 20])
+        seen = []
+        errors = []
+        stop = threading.Event()
+
+        def predict():
+            while not stop.is_set():
+                try:
+                    seen.append(service.predict(RICE_FEATURES))
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=predict) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        new_version = service.reload(new_path)
+        time.sleep(0.05)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        expected[new_version] = service.predict(RICE_FEATURES)[0]
+        self.assertNotEqual(expected[new_version]['recommended_crop'], 'rice')
+        self.assertEqual(errors, [])
+        # Every answer is the one its reported version gives
+        for prediction, version in seen:
+            self.assertEqual(prediction, expected[version])
+        self.assertEqual(seen[-1][1], new_version)
+        self.assertEqual(service.reloads, 1)
+
+    def test_failed_reload_keeps_serving_version(self):
+        self.write_model(self.model_path)
+        service = self.service()
+        service.warm_up()
+        version = service.model_version
+        broken = os.path.join(self.tmp.name, 'broken.json')
+        with open(broken, 'w') as f:
+            f.write('{')
+        with self.assertRaises(ValueError):
+            service.reload(broken)
+        self.assertEqual(service.model_version, version)
+        self.assertTrue(service.ready)
+        self.assertIn('reload_error', service.status())
+
+    def test_failed_warm_up_retries_after_interval(self):
+        with open(self.model_path, 'w') as f:
+            f.write('{')
+        service = self.service(retry_interval=30)
+        self.assertFalse(service.warm_up())
+        self.assertEqual(service.state, STATE_FAILED)
+        self.write_model(self.model_path)
+        # Within the interval the failure is reported without loading again
+        with self.assertRaises(ModelUnavailableError):
+            service.get_active()
+        service._failed_at -= 30
+        self.assertEqual(service.get_active()[1], service.model_version)
+        self.assertTrue(service.ready)
+        self.assertNotIn('error', service.status())
+
+    def test_watcher_recovers_from_failed_warm_up(self):
+        with open(self.model_path, 'w') as f:
+            f.write('{')
+        # Back-date the broken file so the fixed one gets a different mtime
+        os.utime(self.model_path, (time.time() - 60, time.time() - 60))
+        service = self.service(watch_interval=0.01, retry_interval=0)
+        self.assertFalse(service.warm_up())
+        self.write_model(self.model_path)
+        deadline = time.monotonic() + 5
+        while not service.ready and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(service.ready)
+        self.assertEqual(service.predict(RICE_FEATURES)[0]['recommended_crop'], 'rice')
+
+
+if __name__ == '__main__':
+    unittest.main()
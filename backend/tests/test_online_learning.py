@@ -0,0 +1,96 @@
+"""OnlineCentroidLearner: running statistics and checkpoints shared by several workers.
+
+Run from backend/: python -m unittest discover tests
+"""
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from model_service import ModelService
+from online_learning import CropStats, OnlineCentroidLearner, sidecar_path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RICE_FEATURES = [80, 40, 40, 25, 80, 6.5, 200]
+MAIZE_FEATURES = [80, 45, 20, 22, 65, 6.2, 80]
+
+
+class CropStatsTest(unittest.TestCase):
+
+    def test_merge_matches_sequential_updates(self):
+        rows = [[i, 2 * i + 1, (i * 7) % 5] for i in range(12)]
+        sequential = CropStats([1.0, 2.0, 3.0], prior_weight=5)
+        for row in rows:
+            sequential.update(row)
+        merged = CropStats([1.0, 2.0, 3.0], prior_weight=5)
+        for row in rows[:4]:
+            merged.update(row)
+        unsaved = CropStats([0.0] * 3, prior_weight=0)
+        for row in rows[4:]:
+            unsaved.update(row)
+        merged.merge(unsaved)
+        self.assertEqual((merged.count, merged.observations), (sequential.count, sequential.observations))
+        for got, expected in zip(merged.mean + merged.m2, sequential.mean + sequential.m2):
+            self.assertAlmostEqual(got, expected, places=9)
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class SharedCheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.model_path = os.path.join(tmp.name, 'crop_model.json')
+        stack = contextlib.ExitStack()
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        self.addCleanup(stack.close)
+
+    def worker(self):
+        """A learner with its own ModelService, as each worker process has"""
+        service = ModelService(model_path=self.model_path, watch_interval=0)
+        service.warm_up()
+        return OnlineCentroidLearner(service, prior_weight=20, checkpoint_interval=0)
+
+    def saved_observations(self):
+        with open(sidecar_path(self.model_path)) as f:
+            crops = json.load(f)['crops']
+        return {crop: state['observations'] for crop, state in crops.items() if state['observations']}
+
+    def test_workers_do_not_overwrite_each_other(self):
+        first, second = self.worker(), self.worker()
+        first.observe_many([(RICE_FEATURES, 'rice')] * 3)
+        second.observe_many([(MAIZE_FEATURES, 'maize')] * 2 + [(RICE_FEATURES, 'rice')])
+        first.checkpoint()
+        # second still serves the version it loaded; its checkpoint adds to first's
+        version = second.checkpoint()
+        self.assertEqual(self.saved_observations(), {'rice': 4, 'maize': 2})
+        self.assertEqual((second.pending, second.service.model_version), (0, version))
+        # Once first's service picks up the new file it resumes from the combined statistics
+        first.service.reload()
+        first.observe_many([(MAIZE_FEATURES, 'maize')])
+        self.assertEqual(first.status()['observations'], {'rice': 4, 'maize': 3})
+        first.checkpoint()
+        self.assertEqual(self.saved_observations(), {'rice': 4, 'maize': 3})
+
+    def test_replaced_model_file_drops_unsaved_observations(self):
+        from crop_model_simple import CropRecommendationModel
+        learner = self.worker()
+        learner.observe_many([(RICE_FEATURES, 'rice')] * 2)
+        learner.checkpoint()
+        learner.observe_many([(RICE_FEATURES, 'rice')])
+        model = CropRecommendationModel()
+        model.crop_requirements['rice'] = [70, 40, 40, 24, 80, 6.4, 190]
+        model.save_model(self.model_path)
+        learner.service.reload()
+        self.assertIsNone(learner.checkpoint())
+        self.assertEqual(learner.status()['observations'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
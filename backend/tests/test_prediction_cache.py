@@ -0,0 +1,127 @@
+"""Prediction cache: hits agree with computed answers, TTL and LRU bounds.
+
+Run from backend/: python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from prediction_cache import PredictionCache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class PredictionCacheTest(unittest.TestCase):
+
+    def test_ttl_expires_entries(self):
+        cache = PredictionCache(maxsize=8, ttl=10)
+        with mock.patch('prediction_cache.time.monotonic', return_value=100.0):
+            cache.put('key', 'value')
+        with mock.patch('prediction_cache.time.monotonic', return_value=109.9):
+            self.assertEqual(cache.get('key'), 'value')
+        with mock.patch('prediction_cache.time.monotonic', return_value=110.1):
+            self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.stats()['expirations'], 1)
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = PredictionCache(maxsize=2, ttl=0)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_keys_include_version_and_quantize(self):
+        cache = PredictionCache()
+        features = [60.2, 30, 30, 25.04, 60.2, 6.504, 150.4]
+        self.assertEqual(cache.make_key(features, 'v1'), cache.make_key([60, 30, 30, 25.0, 60.0, 6.5, 150], 'v1'))
+        self.assertNotEqual(cache.make_key(features, 'v1'), cache.make_key(features, 'v2'))
+
+    def test_concurrent_misses_compute_once(self):
+        cache = PredictionCache()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        # Let every thread reach the cache before the owner finishes
+        for _ in range(5000):
+            if cache.stats()['coalesced'] == 7:
+                break
+            threading.Event().wait(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_failed_compute_is_not_cached(self):
+        cache = PredictionCache()
+
+        def fail():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            cache.get_or_compute('key', fail)
+        self.assertEqual(cache.get_or_compute('key', lambda: 'value'), 'value')
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class CachedPredictionTest(unittest.TestCase):
+
+    def setUp(self):
+        from model_service import ModelService
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        model_path = os.path.join(self.tmp.name, 'crop_model.json')
+        self.cached = ModelService(model_path=model_path)
+        self.uncached = ModelService(model_path=model_path, cache_size=0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.cached.warm_up()
+            self.uncached.warm_up()
+        rng = np.random.default_rng(0)
+        self.inputs = np.column_stack([
+            rng.uniform(0, 150, 200), rng.uniform(0, 150, 200), rng.uniform(0, 200, 200), rng.uniform(5, 45, 200),
+            rng.uniform(10, 100, 200), rng.uniform(3.5, 9.5, 200), rng.uniform(20, 300, 200)
+        ]).tolist()
+
+    def test_hits_agree_with_computed_answers(self):
+        quantize = self.cached.cache.quantize
+        expected = [self.uncached.predict(quantize(features))[0] for features in self.inputs]
+        first = [self.cached.predict(features)[0] for features in self.inputs]
+        second = [self.cached.predict(features)[0] for features in self.inputs]
+        self.assertEqual(first, expected)
+        self.assertEqual(second, expected)
+        self.assertEqual(self.cached.cache.stats()['hits'], len(self.inputs))
+
+    def test_batch_agrees_with_single_predictions(self):
+        # Half of the batch is already cached by single predictions
+        singles = [self.cached.predict(features)[0] for features in self.inputs[::2]]
+        predictions, version = self.cached.predict_batch(self.inputs)
+        self.assertEqual(predictions[::2], singles)
+        self.assertEqual(version, self.cached.model_version)
+        self.cached.cache.clear()
+        self.assertEqual([self.cached.predict(features)[0] for features in self.inputs], predictions)
+
+
+if __name__ == '__main__':
+    unittest.main()
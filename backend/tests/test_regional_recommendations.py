@@ -0,0 +1,73 @@
+"""Regional table answers: the bucket-centre approximation and how responses flag it.
+
+Run from backend/: python -m unittest discover tests
+"""
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from regional_recommendations import BUCKET_WIDTHS, RegionalTable, max_score_error
+
+try:
+    import flask
+    import numpy as np
+except ImportError:
+    flask = np = None
+
+REGIONS = {'regions': [{'name': 'Pune', 'temperature': 24.5, 'humidity': 62, 'rainfall': 72,
+                        'soil_profiles': [{'N': 80, 'P': 40, 'K': 40, 'ph': 6.8}]}]}
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class BucketErrorTest(unittest.TestCase):
+
+    def test_scores_within_max_score_error(self):
+        from crop_model_simple import CropRecommendationModel
+        from similarity_engine import SimilarityEngine
+        engine = SimilarityEngine(CropRecommendationModel(deterministic=True).crop_requirements)
+        table = RegionalTable(router=None)
+        rng = np.random.default_rng(0)
+        highs = [200, 200, 200, 50, 100, 14, 500]
+        inputs = (rng.uniform(0, 1, (5000, 7)) * highs).tolist()
+        # Values at the top of a range have their centre clipped back onto it
+        inputs.append(highs)
+        centres = [table.center(table.bucket(features)) for features in inputs]
+        error = np.abs(engine.score(inputs) - engine.score(centres)).max()
+        self.assertLessEqual(error, max_score_error(BUCKET_WIDTHS) + 1e-12)
+        self.assertAlmostEqual(max_score_error(BUCKET_WIDTHS), 0.0222, places=4)
+
+
+@unittest.skipIf(flask is None or np is None, "needs flask and numpy")
+class ApproximateFlagTest(unittest.TestCase):
+
+    def setUp(self):
+        from app import create_app
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        regions_path = os.path.join(tmp.name, 'regions.json')
+        with open(regions_path, 'w') as f:
+            json.dump(REGIONS, f)
+        with contextlib.redirect_stdout(io.StringIO()):
+            app = create_app({'MODEL_PATH': os.path.join(tmp.name, 'crop_model.json'), 'WARM_UP': 'eager',
+                              'MODEL_WATCH_INTERVAL': 0, 'REGION_DATA_PATH': regions_path,
+                              'REGIONAL_REFRESH_INTERVAL': 0})
+        self.client = app.test_client()
+        self.features = {'N': 81, 'P': 41, 'K': 39, 'temperature': 24.6, 'humidity': 61, 'ph': 6.82, 'rainfall': 75}
+
+    def test_regional_answers_are_flagged(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            regional = self.client.post('/api/predict', json=dict(self.features, location='Pune')).get_json()
+        self.assertEqual((regional['region'], regional['approximate']), ('Pune', True))
+        live = self.client.post('/api/predict', json=self.features).get_json()
+        self.assertNotIn('approximate', live)
+
+        batch = self.client.post('/api/predict/batch', json=[dict(self.features, location='pune'),
+                                                              self.features]).get_json()
+        self.assertEqual([item.get('approximate') for item in batch['results']], [True, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
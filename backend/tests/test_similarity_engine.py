@@ -0,0 +1,87 @@
+"""SimilarityEngine against the scalar calculate_similarity loop.
+
+Run from backend/: python -m unittest discover tests
+"""
+import unittest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class SimilarityParityTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from crop_model_simple import CropRecommendationModel
+        cls.model = CropRecommendationModel(deterministic=True)
+
+    def scalar_ranking(self, features, requirements):
+        """Crops ranked the way predict_crop ranked them before the engine existed"""
+        scores = {crop: self.model.calculate_similarity(features, values) for crop, values in requirements.items()}
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+    def random_inputs(self, n, seed=0):
+        rng = np.random.default_rng(seed)
+        return np.column_stack([
+            rng.uniform(0, 150, n), rng.uniform(0, 150, n), rng.uniform(0, 200, n), rng.uniform(5, 45, n),
+            rng.uniform(10, 100, n), rng.uniform(3.5, 9.5, n), rng.uniform(20, 300, n)
+        ]).tolist()
+
+    def test_scores_are_identical(self):
+        from similarity_engine import SimilarityEngine
+        engine = SimilarityEngine(self.model.crop_requirements)
+        inputs = self.random_inputs(500)
+        scores = engine.score(inputs)
+        for row, features in zip(scores, inputs):
+            expected = [self.model.calculate_similarity(features, self.model.crop_requirements[crop])
+                        for crop in engine.crop_names]
+            self.assertEqual(row.tolist(), expected)
+
+    def test_rank_matches_sorted_order(self):
+        from similarity_engine import SimilarityEngine
+        engine = SimilarityEngine(self.model.crop_requirements)
+        inputs = self.random_inputs(500, seed=1)
+        for features, ranked in zip(inputs, engine.rank(inputs, k=3)):
+            self.assertEqual(ranked, self.scalar_ranking(features, self.model.crop_requirements)[:3])
+
+    def test_ties_keep_catalog_order(self):
+        from similarity_engine import SimilarityEngine
+        requirements = dict(self.model.crop_requirements)
+        # Duplicated requirements tie on every input, inside and at the edge of the top 3
+        requirements['rice_copy'] = list(requirements['rice'])
+        requirements['coffee_copy'] = list(requirements['coffee'])
+        requirements['maize_copy'] = list(requirements['maize'])
+        engine = SimilarityEngine(requirements)
+        inputs = [requirements['rice'], requirements['maize'], requirements['coffee'],
+                  # Far from every crop: all scores are 0
+                  [500, 500, 500, 90, 0, 0, 2000]]
+        for k in (1, 2, 3, len(requirements)):
+            for features, ranked in zip(inputs, engine.rank(inputs, k=k)):
+                expected = self.scalar_ranking(features, requirements)[:k]
+                self.assertEqual(ranked, expected, (features, k))
+                self.assertEqual(engine.rank(features, k=k), expected, (features, k))
+
+    def test_predict_matches_scalar_path(self):
+        inputs = self.random_inputs(200, seed=2)
+        expected = [self.model._format_prediction(self.scalar_ranking(features, self.model.crop_requirements))
+                    for features in inputs]
+        self.assertEqual([self.model.predict_crop(features) for features in inputs], expected)
+        self.assertEqual(self.model.predict_batch(inputs), expected)
+
+    def test_lookup_engine_within_error_bound(self):
+        from lookup_engine import LookupTableEngine
+        from similarity_engine import SimilarityEngine
+        exact = SimilarityEngine(self.model.crop_requirements)
+        lookup = LookupTableEngine(self.model.crop_requirements)
+        inputs = self.random_inputs(500, seed=3)
+        error = np.abs(lookup.score(inputs) - exact.score(inputs)).max()
+        self.assertLessEqual(error, lookup.max_error + 1e-12)
+        for features in inputs[:50]:
+            self.assertEqual(lookup.score(features).tolist(), lookup.score([features])[0].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Soil-amendment optimizer against brute force over small grids.
+
+Run from backend/: python -m unittest discover tests
+"""
+import unittest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class AmendmentBruteForceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from crop_model_simple import CropRecommendationModel
+        cls.engine = CropRecommendationModel().engine
+
+    def brute_force(self, base, target, features, bounds, steps, goal=None):
+        """Cheapest grid point meeting the goal, or None"""
+        from soil_amendment import EPSILON, default_costs
+        costs = default_costs(self.engine)
+        columns = [FEATURES.index(name) for name in features]
+        axes = [np.linspace(bounds[name][0], bounds[name][1], steps) for name in features]
+        X = np.tile(np.asarray(base, dtype=np.float64), (steps ** len(features), 1))
+        for column, grid in zip(columns, np.meshgrid(*axes, indexing='ij')):
+            X[:, column] = grid.ravel()
+        scores = self.engine.score(X)
+        t = self.engine.crop_names.index(target)
+        if goal is None:
+            ok = scores[:, t] - np.delete(scores, t, axis=1).max(axis=1) >= EPSILON
+        else:
+            ok = scores[:, t] >= goal / 100.0
+        if not ok.any():
+            return None
+        weights = np.asarray([costs[name] for name in features])
+        return float((np.abs(X[ok][:, columns] - np.asarray(base)[columns]) * weights).sum(axis=1).min())
+
+    def check(self, base, target, features, bounds, steps=81, goal=None):
+        from soil_amendment import optimize_amendment
+        options = {'goal': 'score', 'target_score': goal} if goal is not None else {}
+        result = optimize_amendment(self.engine, base, target, features=features, bounds=bounds, **options)
+        expected = self.brute_force(base, target, features, bounds, steps, goal)
+        if expected is not None:
+            self.assertTrue(result['feasible'], (base, target, features))
+            self.assertLessEqual(result['cost'], expected + 1e-4, (base, target, features))
+        if result['feasible']:
+            scores = self.engine.score(np.asarray([result['amended']]))[0]
+            t = self.engine.crop_names.index(target)
+            if goal is None:
+                self.assertGreater(scores[t], np.delete(scores, t).max())
+            else:
+                self.assertGreaterEqual(scores[t], goal / 100.0 - 1e-9)
+            for name in features:
+                value = result['amended'][FEATURES.index(name)]
+                self.assertTrue(bounds[name][0] - 1e-6 <= value <= bounds[name][1] + 1e-6)
+        return result
+
+    def test_cheaper_than_coordinate_search(self):
+        # A coordinate-wise search stopped at cost 68.80 here; N=25, P=125.75 costs 68.55
+        base = [77.971, 141.33, 17.627, 8.448, 51.26, 5.664, 332.673]
+        result = self.check(base, 'kidneybeans', ['N', 'P'], {'N': (0.0, 200.0), 'P': (0.0, 200.0)}, steps=801)
+        self.assertTrue(result['feasible'])
+        self.assertLess(result['cost'], 68.551)
+
+    def test_matches_brute_force_on_small_grids(self):
+        rng = np.random.default_rng(0)
+        pairs = [['N', 'P'], ['N', 'ph'], ['P', 'K'], ['K', 'ph']]
+        feasible = 0
+        for case in range(24):
+            base = [rng.uniform(0, 150), rng.uniform(0, 150), rng.uniform(0, 200), rng.uniform(10, 40),
+                    rng.uniform(20, 100), rng.uniform(4, 9), rng.uniform(20, 300)]
+            ranked = np.argsort(-self.engine.score(np.asarray([base]))[0], kind='stable')
+            target = self.engine.crop_names[ranked[1 + case % 3]]
+            features = pairs[case % len(pairs)]
+            bounds = {}
+            for name in features:
+                value = base[FEATURES.index(name)]
+                width = 2.0 if name == 'ph' else 40.0
+                high = 14.0 if name == 'ph' else 200.0
+                bounds[name] = (max(0.0, value - width), min(high, value + width))
+            feasible += self.check(base, target, features, bounds)['feasible']
+        self.assertGreater(feasible, 0)
+
+    def test_score_goal_matches_brute_force(self):
+        base = [40, 30, 30, 26, 60, 6.5, 120]
+        self.check(base, 'kidneybeans', ['N', 'ph'], {'N': (0.0, 100.0), 'ph': (4.0, 9.0)}, steps=201, goal=97)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""Prebuilt catalog responses: ETags, 304s and encoding selection.
+
+Run from backend/: python -m unittest discover tests
+"""
+import contextlib
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import static_responses
+from static_responses import PrebuiltResponse, ResponseCache, parse_accept_encoding
+
+try:
+    import flask
+    import numpy as np
+except ImportError:
+    flask = np = None
+
+BODY = json.dumps({'success': True, 'crops': ['crop'] * 100}).encode('utf-8')
+
+
+class PrebuiltResponseTest(unittest.TestCase):
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(parse_accept_encoding('gzip, deflate;q=0.5, br;q=0, identity'),
+                         {'gzip', 'deflate', 'identity'})
+        self.assertEqual(parse_accept_encoding('GZip;q=bad'), set())
+        self.assertEqual(parse_accept_encoding(None), set())
+
+    def test_encoding_selection(self):
+        with mock.patch.object(static_responses, 'ENCODINGS', ['gzip']):
+            response = PrebuiltResponse(BODY)
+            self.assertEqual(response.select('gzip, deflate'), ('gzip', response.variants['gzip']))
+            self.assertEqual(response.select('*'), ('gzip', response.variants['gzip']))
+            self.assertEqual(response.select('gzip;q=0'), (None, BODY))
+            self.assertEqual(response.select(None), (None, BODY))
+        self.assertEqual(gzip.decompress(response.variants['gzip']), BODY)
+
+    def test_small_bodies_are_not_compressed(self):
+        response = PrebuiltResponse(b'{"success": true}')
+        self.assertEqual(response.select('gzip, br'), (None, b'{"success": true}'))
+
+    def test_etag_and_not_modified(self):
+        response = PrebuiltResponse(BODY)
+        status, headers, body = response.respond(None, 'gzip')
+        self.assertEqual((status, headers['Content-Encoding'], body), (200, 'gzip', response.variants['gzip']))
+        self.assertEqual(headers['ETag'], f'"{response.digest}-gzip"')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        identity_etag = response.respond()[1]['ETag']
+        self.assertEqual(identity_etag, f'"{response.digest}"')
+        # Any variant's tag, weak or in a list, revalidates the body
+        for tag in (headers['ETag'], identity_etag, f'W/{identity_etag}', f'"other", {identity_etag}', '*'):
+            status, headers, body = response.respond(tag, 'gzip')
+            self.assertEqual((status, body), (304, b''), tag)
+            self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(response.respond('"other"', None)[0], 200)
+        # Compression is reproducible, so rebuilding gives the same tags
+        self.assertEqual(PrebuiltResponse(BODY).respond(None, 'gzip')[1]['ETag'], f'"{response.digest}-gzip"')
+
+    def test_cache_rebuilds_on_new_version(self):
+        builds = []
+        cache = ResponseCache(lambda payload: json.dumps(payload).encode('utf-8'))
+
+        def build(value):
+            builds.append(value)
+            return {'value': value}
+
+        first = cache.get('crops', 'v1', lambda: build(1))
+        self.assertIs(cache.get('crops', 'v1', lambda: build(2)), first)
+        second = cache.get('crops', 'v2', lambda: build(3))
+        self.assertNotEqual(second.digest, first.digest)
+        self.assertEqual(builds, [1, 3])
+
+
+@unittest.skipIf(flask is None or np is None, "needs flask and numpy")
+class CatalogEndpointTest(unittest.TestCase):
+
+    def setUp(self):
+        from app import create_app
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with contextlib.redirect_stdout(io.StringIO()):
+            app = create_app({'MODEL_PATH': os.path.join(tmp.name, 'crop_model.json'), 'MODEL_WATCH_INTERVAL': 0})
+        self.client = app.test_client()
+
+    def test_etag_revalidation(self):
+        for path in ('/api/crops', '/api/crop-info'):
+            plain = self.client.get(path)
+            self.assertEqual(plain.status_code, 200)
+            self.assertNotIn('Content-Encoding', plain.headers)
+            response = self.client.get(path, headers={'Accept-Encoding': 'gzip'})
+            body = response.data
+            if len(plain.data) >= static_responses.MIN_COMPRESS_BYTES:
+                self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+                body = gzip.decompress(body)
+            self.assertEqual(json.loads(body), plain.get_json())
+            etag = response.headers['ETag']
+            revalidated = self.client.get(path, headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+            self.assertEqual((revalidated.status_code, revalidated.data), (304, b''))
+            self.assertEqual(revalidated.headers['ETag'], etag)
+            self.assertEqual(self.client.get(path, headers={'If-None-Match': plain.headers['ETag']}).status_code, 304)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""InferenceRouter deadlines and circuit breakers with stand-in tiers.
+
+Run from backend/: python -m unittest discover tests
+"""
+import threading
+import time
+import unittest
+
+from tiered_inference import BREAKER_CLOSED, BREAKER_OPEN, InferenceRouter
+
+
+class StubService:
+    """Tier answering after delay seconds, or raising error"""
+
+    def __init__(self, name, delay=0.0, error=None, release=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.release = release
+
+    def predict(self, features):
+        if self.release is not None:
+            self.release.wait(10)
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {'recommended_crop': self.name}, 'v1'
+
+
+class InferenceRouterTest(unittest.TestCase):
+
+    def router(self, *services, **options):
+        router = InferenceRouter([(service.name, service) for service in services], **options)
+        self.addCleanup(lambda: router._pool and router._pool.shutdown(wait=False))
+        return router
+
+    def test_refined_answer_within_budget(self):
+        router = self.router(StubService('fast'), StubService('slow', delay=0.01), budget_ms=1000)
+        prediction, info = router.predict([1])
+        self.assertEqual((prediction['recommended_crop'], info['fallback']), ('slow', False))
+
+    def test_falls_back_when_budget_runs_out(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        router = self.router(StubService('fast'), StubService('slow', release=release), budget_ms=20)
+        prediction, info = router.predict([1])
+        self.assertEqual((prediction['recommended_crop'], info['engine'], info['fallback']), ('fast', 'fast', True))
+
+    def test_failed_primary_does_not_wait_past_budget(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        router = self.router(StubService('fast', error=RuntimeError('primary down')),
+                             StubService('hung', release=release), budget_ms=5000)
+        started = time.perf_counter()
+        with self.assertRaisesRegex(RuntimeError, 'primary down'):
+            router.predict([1], budget_ms=30)
+        self.assertLess(time.perf_counter() - started, 2)
+
+    def test_failed_primary_served_by_refinement(self):
+        router = self.router(StubService('fast', error=RuntimeError('primary down')), StubService('slow'),
+                             budget_ms=1000)
+        self.assertEqual(router.predict([1])[0]['recommended_crop'], 'slow')
+
+    def test_deployment_budget_judges_breakers(self):
+        router = self.router(StubService('fast'), StubService('slow', delay=0.02), budget_ms=1000,
+                             failure_threshold=2)
+        # A request's own budget only limits its wait: the refinements still finish within the deployment one
+        for _ in range(3):
+            self.assertEqual(router.predict([1], budget_ms=0)[0]['recommended_crop'], 'fast')
+        router._pool.shutdown(wait=True)
+        self.assertEqual(router.breakers['slow'].state, BREAKER_CLOSED)
+
+        router = self.router(StubService('fast'), StubService('slow', delay=0.02), budget_ms=5, failure_threshold=2)
+        for _ in range(2):
+            router.predict([1], budget_ms=1000)
+        self.assertEqual(router.breakers['slow'].state, BREAKER_OPEN)
+        self.assertEqual(router.predict([1], budget_ms=1000)[0]['recommended_crop'], 'fast')
+
+    def test_primary_tier_has_no_breaker(self):
+        primary = StubService('fast', error=RuntimeError('primary down'))
+        router = self.router(primary, failure_threshold=1)
+        for _ in range(3):
+            with self.assertRaisesRegex(RuntimeError, 'primary down'):
+                router.predict([1])
+        primary.error = None
+        self.assertEqual(router.predict([1])[0]['recommended_crop'], 'fast')
+        self.assertNotIn('fast', router.breakers)
+
+if __name__ == '__main__':
+    unittest.main()
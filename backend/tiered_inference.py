@@ -0,0 +1,221 @@
+"""Tiered inference across several model backends under a latency budget.
+
+Tiers are ordered fastest first. The first tier is always computed in the
+request thread; the others run in a bounded thread pool at the same time.
+When the budget runs out the most refined answer that has finished is
+returned, falling back to the first tier. Slower tiers that keep failing
+or overrunning the deployment budget are skipped until a cooldown passes.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# Circuit breaker states
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """Stop sending work to a tier after failure_threshold consecutive failures.
+
+    After cooldown seconds one trial call is let through; its outcome closes
+    the breaker again or restarts the cooldown.
+    """
+
+    def __init__(self, failure_threshold=3, cooldown=10):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return BREAKER_CLOSED
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return BREAKER_HALF_OPEN
+        return BREAKER_OPEN
+
+    def allow(self):
+        """Whether a call may be made now"""
+        with self._lock:
+            state = self.state
+            if state == BREAKER_CLOSED:
+                return True
+            if state == BREAKER_HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class InferenceRouter:
+    """Answer from the fastest tier and refine with slower tiers within a budget.
+
+    services maps a tier name to its ModelService, fastest first. A
+    refinement call that raises, or takes longer than budget_ms, counts as
+    a failure for its tier's circuit breaker. A request's own budget_ms
+    only limits how long that request waits, so a client cannot open a
+    breaker shared by all traffic. The first tier has no breaker: it is
+    always called, as the answer to fall back to. At most pool_size
+    refinements run at once; further ones are shed and the request is
+    served by the faster tiers.
+    """
+
+    def __init__(self, services, budget_ms=50, pool_size=4, failure_threshold=3, cooldown=10, metrics=None):
+        if not services:
+            raise ValueError("At least one engine tier is required")
+        self.services = dict(services)
+        self.tiers = list(self.services)
+        self.budget_ms = budget_ms
+        self.pool_size = pool_size
+        self.breakers = {name: CircuitBreaker(failure_threshold, cooldown) for name in self.tiers[1:]}
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._pool = None
+        if len(self.tiers) > 1:
+            self._pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='tier')
+        self.outcomes = None
+        if metrics is not None:
+            self.outcomes = metrics.counter(
+                'tier_outcomes_total', 'Tiered inference outcomes by engine tier', ('engine', 'outcome'))
+            metrics.gauge('tier_breaker_open', 'Whether an engine tier is skipped by its circuit breaker',
+                          lambda: {(self.services[name].engine_label,): b.state != BREAKER_CLOSED
+                                   for name, b in self.breakers.items()},
+                          ('engine',))
+
+    @property
+    def primary(self):
+        """Service of the fastest tier"""
+        return self.services[self.tiers[0]]
+
+    def predict(self, features, budget_ms=None):
+        """Return (prediction, info) for one input"""
+        return self._route('predict', features, budget_ms)
+
+    def predict_batch(self, features_list, budget_ms=None):
+        """Return (predictions, info) for many inputs, all from the same tier"""
+        return self._route('predict_batch', features_list, budget_ms)
+
+    def _route(self, method, arg, budget_ms):
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        deadline = time.perf_counter() + budget_ms / 1000.0
+
+        # Most refined tier last, so it is checked first below
+        refinements = []
+        for name in self.tiers[1:]:
+            # Slot first: allow() may start a half-open trial, which must then run
+            if not self._slots.acquire(blocking=False):
+                self._count(name, 'shed')
+            elif not self.breakers[name].allow():
+                self._slots.release()
+                self._count(name, 'skipped')
+            else:
+                future = self._pool.submit(self._call, name, method, arg)
+                future.add_done_callback(lambda _: self._slots.release())
+                refinements.append((name, future))
+
+        primary = self.tiers[0]
+        primary_error = None
+        try:
+            result, version = getattr(self.services[primary], method)(arg)
+        except Exception as e:
+            primary_error = e
+            self._count(primary, 'error')
+            result = version = None
+
+        for name, future in reversed(refinements):
+            # Also bounded without a primary answer: a hung tier must not hold the request
+            timeout = max(deadline - time.perf_counter(), 0)
+            try:
+                refined, refined_version = future.result(timeout=timeout)
+            except FutureTimeoutError:
+                # Left to finish in the pool; its slot is released when it does
+                self._count(name, 'timeout')
+                continue
+            except Exception:
+                self._count(name, 'error')
+                continue
+            self._count(name, 'served')
+            return refined, self._info(name, refined_version)
+
+        if primary_error is not None:
+            raise primary_error
+        self._count(primary, 'served')
+        return result, self._info(primary, version)
+
+    def _call(self, name, method, arg):
+        """Run one refinement tier, recording the outcome in its circuit breaker. Returns (result, version)."""
+        breaker = self.breakers[name]
+        started = time.perf_counter()
+        try:
+            result = getattr(self.services[name], method)(arg)
+        except Exception:
+            breaker.record_failure()
+            raise
+        if (time.perf_counter() - started) * 1000 > self.budget_ms:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return result
+
+    def _info(self, name, version):
+        return {
+            'engine': name,
+            'model_version': version,
+            'fallback': name != self.tiers[-1]
+        }
+
+    def _count(self, name, outcome):
+        if self.outcomes is not None:
+            self.outcomes.inc(self.services[name].engine_label, outcome)
+
+    def warm_up(self):
+        """Warm up every tier. Returns True if the primary tier is ready."""
+        for service in self.services.values():
+            service.warm_up()
+        return self.primary.ready
+
+    def start_background_warm_up(self):
+        """Warm up every tier in its own daemon thread"""
+        return [service.start_background_warm_up() for service in self.services.values()]
+
+    def stop_watching(self):
+        for service in self.services.values():
+            service.stop_watching()
+
+    def status(self):
+        """Per-tier readiness and breaker state for /api/health"""
+        return {
+            'budget_ms': self.budget_ms,
+            'pool_size': self.pool_size,
+            'tiers': [
+                dict(self.services[name].status(), name=name,
+                     breaker=self.breakers[name].state if name in self.breakers else None)
+                for name in self.tiers
+            ]
+        }
+
+
+def parse_tiers(value):
+    """Split an ENGINE_TIERS setting such as 'similarity,forest' into backend names"""
+    tiers = [name.strip() for name in str(value).split(',') if name.strip()]
+    if not tiers:
+        raise ValueError("ENGINE_TIERS must name at least one backend")
+    if len(set(tiers)) != len(tiers):
+        raise ValueError(f"ENGINE_TIERS lists a backend twice: {value}")
+    return tiers
@@ -0,0 +1,188 @@
+"""Streaming ingestion of training data too large to load as a DataFrame.
+
+ingest_dataset() reads a CSV or Parquet file in chunks, converts the
+features to float32 and the crop names to small integer codes, and appends
+them to flat files on disk that are then memory-mapped. Only one chunk is
+held in memory at a time. stratified_split() splits by row index, so the
+dataset itself is never copied to make the split.
+
+StageMemory reports the peak resident memory of each training stage.
+"""
+import os
+import resource
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+DEFAULT_FEATURE_COLUMNS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# Rows read per chunk
+DEFAULT_CHUNK_SIZE = 200000
+
+FEATURES_FILE = 'features.f32'
+LABELS_FILE = 'labels.i16'
+
+
+def current_rss():
+    """Resident memory of this process in bytes (None where it cannot be read)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    # High-water mark instead of the current value; kilobytes on Linux, bytes on macOS
+    try:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (AttributeError, ValueError):
+        return None
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageMemory:
+    """Peak resident memory per stage, sampled by a background thread"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peaks = {}
+
+    @contextmanager
+    def stage(self, name):
+        peak = [current_rss() or 0]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(self.interval):
+                peak[0] = max(peak[0], current_rss() or 0)
+
+        sampler = threading.Thread(target=sample, name='memory-sampler', daemon=True)
+        sampler.start()
+        try:
+            yield
+        finally:
+            done.set()
+            sampler.join()
+            peak[0] = max(peak[0], current_rss() or 0)
+            self.peaks[name] = round(peak[0] / (1 << 20), 1)
+
+
+class TrainingDataset:
+    """Memory-mapped features (n x 7 float32) and label codes (int16)"""
+
+    def __init__(self, directory, n_rows, feature_columns, labels, dropped=0):
+        self.directory = directory
+        self.feature_columns = list(feature_columns)
+        self.labels = list(labels)
+        self.dropped = dropped
+        shape = (n_rows, len(self.feature_columns))
+        self.features = np.memmap(os.path.join(directory, FEATURES_FILE), dtype=np.float32, mode='r', shape=shape)
+        self.codes = np.memmap(os.path.join(directory, LABELS_FILE), dtype=np.int16, mode='r', shape=(n_rows,))
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.features.nbytes + self.codes.nbytes
+
+
+def _iter_chunks(path, columns, chunksize):
+    """Yield DataFrames of at most chunksize rows holding only the needed columns"""
+    import pandas as pd
+
+    if path.endswith('.parquet') or path.endswith('.pq'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet requires pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    dtypes = {column: np.float32 for column in columns[:-1]}
+    dtypes[columns[-1]] = str
+    yield from pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize)
+
+
+def ingest_dataset(path, directory=None, feature_columns=None, label_column='label',
+                   chunksize=DEFAULT_CHUNK_SIZE):
+    """Stream a CSV or Parquet file into a memory-mapped TrainingDataset.
+
+    Rows with a missing feature or label are dropped and counted. Label codes
+    follow the sorted crop names, the same order as the classes of a forest
+    trained on the names themselves.
+    """
+    import pandas as pd
+
+    feature_columns = list(feature_columns or DEFAULT_FEATURE_COLUMNS)
+    directory = directory or tempfile.mkdtemp(prefix='kisan-train-')
+    os.makedirs(directory, exist_ok=True)
+    columns = feature_columns + [label_column]
+    label_index = {}
+    n_rows = 0
+    dropped = 0
+
+    with open(os.path.join(directory, FEATURES_FILE), 'wb') as features_file, \
+            open(os.path.join(directory, LABELS_FILE), 'wb') as labels_file:
+        for chunk in _iter_chunks(path, columns, chunksize):
+            values = chunk[feature_columns].to_numpy(dtype=np.float32)
+            labels = chunk[label_column]
+            keep = ~np.isnan(values).any(axis=1) & labels.notna().to_numpy()
+            if not keep.all():
+                dropped += int((~keep).sum())
+                values = values[keep]
+                labels = labels[keep]
+
+            # Codes in order of first appearance; remapped to sorted order below
+            categorical = pd.Categorical(labels.astype(str))
+            for name in categorical.categories:
+                label_index.setdefault(name, len(label_index))
+            mapping = np.asarray([label_index[name] for name in categorical.categories], dtype=np.int16)
+            codes = mapping[categorical.codes] if len(mapping) else np.empty(0, dtype=np.int16)
+
+            np.ascontiguousarray(values).tofile(features_file)
+            codes.astype(np.int16).tofile(labels_file)
+            n_rows += len(codes)
+
+    if len(label_index) > np.iinfo(np.int16).max:
+        raise ValueError(f"Too many distinct labels: {len(label_index)}")
+    labels = sorted(label_index)
+    remap = np.empty(len(labels), dtype=np.int16)
+    for position, name in enumerate(labels):
+        remap[label_index[name]] = position
+    if n_rows:
+        codes = np.memmap(os.path.join(directory, LABELS_FILE), dtype=np.int16, mode='r+', shape=(n_rows,))
+        for start in range(0, n_rows, chunksize):
+            codes[start:start + chunksize] = remap[codes[start:start + chunksize]]
+        codes.flush()
+        del codes
+
+    return TrainingDataset(directory, n_rows, feature_columns, labels, dropped)
+
+
+def stratified_split(codes, test_size=0.2, random_state=42):
+    """Split row indices into (train, test), keeping each label's share in both.
+
+    Only index arrays are built; both come back sorted so reading the rows
+    from a memory map stays sequential.
+    """
+    codes = np.asarray(codes)
+    rng = np.random.default_rng(random_state)
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes.astype(np.int64))
+    train_parts, test_parts = [], []
+    start = 0
+    for count in counts:
+        rows = order[start:start + count]
+        start += count
+        if not count:
+            continue
+        shuffled = rows[rng.permutation(count)]
+        n_test = int(round(count * test_size))
+        test_parts.append(shuffled[:n_test])
+        train_parts.append(shuffled[n_test:])
+    train = np.sort(np.concatenate(train_parts)) if train_parts else np.empty(0, dtype=np.int64)
+    test = np.sort(np.concatenate(test_parts)) if test_parts else np.empty(0, dtype=np.int64)
+    return train, test
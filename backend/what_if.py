@@ -0,0 +1,158 @@
+"""What-if sweeps: how crop scores change as some inputs vary over a grid.
+
+A sweep holds every feature of a base input fixed except the swept ones,
+which take every combination of their grid values. The whole grid (plus
+the base input) is scored in one vectorized call to the model's engine,
+so a 41 x 26 sweep is a single (1067 x 7) batch rather than 1067
+predict_crop calls.
+
+Example request body for POST /api/what-if:
+
+    {"N": 40, "P": 30, "K": 30, "temperature": 26, "humidity": 60,
+     "ph": 6.5, "rainfall": 120,
+     "sweep": [{"feature": "N", "min": 0, "max": 200, "steps": 41},
+               {"feature": "ph", "min": 4, "max": 9, "steps": 26}]}
+"""
+import numpy as np
+
+from feature_schema import FEATURE_SCHEMA
+
+# Limits that keep a sweep interactive
+MAX_SWEEP_AXES = 3
+MAX_SWEEP_STEPS = 1000
+MAX_SWEEP_POINTS = 20000
+DEFAULT_SWEEP_STEPS = 21
+
+
+def grid_scorer(model):
+    """Return (crop_names, score) for a model whose engine scores a batch in one call.
+
+    score(X) takes an (n, 7) array and returns (n, n_crops) scores in [0, 1].
+    Raises ValueError for models that only predict one input at a time.
+    """
+    engine = getattr(model, 'engine', None)
+    # SimilarityEngine and LookupTableEngine
+    if engine is not None and hasattr(engine, 'score'):
+        return list(engine.crop_names), engine.score
+    # ForestEngine: class probabilities
+    if engine is not None and hasattr(engine, 'predict_proba'):
+        return list(engine.classes), engine.predict_proba
+    raise ValueError("This engine cannot score a sweep; use the similarity or forest engine")
+
+
+def parse_axes(sweep, schema=None):
+    """Turn the request's "sweep" list into [(feature index, name, values)].
+
+    Each entry is {"feature", "values"} or {"feature", "min", "max", "steps"};
+    min and max default to the feature's accepted range. Returns (axes, error).
+    """
+    schema = list(schema or FEATURE_SCHEMA)
+    index = {feature.name: i for i, feature in enumerate(schema)}
+    if not isinstance(sweep, list) or not sweep:
+        return None, 'sweep must be a non-empty list of {"feature", "min", "max", "steps"} objects'
+    if len(sweep) > MAX_SWEEP_AXES:
+        return None, f'At most {MAX_SWEEP_AXES} features can be swept at once'
+
+    axes = []
+    points = 1
+    for axis in sweep:
+        if not isinstance(axis, dict) or not isinstance(axis.get('feature'), str) or axis['feature'] not in index:
+            return None, f'Each sweep entry needs a "feature", one of: {", ".join(index)}'
+        name = axis['feature']
+        if any(name == existing for _, existing, _ in axes):
+            return None, f'Feature {name} is swept twice'
+        feature = schema[index[name]]
+        try:
+            if 'values' in axis:
+                values = np.asarray([float(v) for v in axis['values']], dtype=np.float64)
+            else:
+                low = float(axis.get('min', feature.low))
+                high = float(axis.get('max', feature.high))
+                steps = int(axis.get('steps', DEFAULT_SWEEP_STEPS))
+                if not (2 <= steps <= MAX_SWEEP_STEPS):
+                    return None, f'steps for {name} must be between 2 and {MAX_SWEEP_STEPS}'
+                if low > high:
+                    return None, f'min for {name} must not be greater than max'
+                values = np.linspace(low, high, steps)
+        except (TypeError, ValueError):
+            return None, f'Sweep values for {name} must be numeric'
+        if not np.isfinite(values).all():
+            return None, f'Sweep values for {name} must be finite numbers'
+        if not len(values) or len(values) > MAX_SWEEP_STEPS:
+            return None, f'Sweep for {name} must have between 1 and {MAX_SWEEP_STEPS} values'
+        if values.min() < feature.low or values.max() > feature.high:
+            return None, feature.message
+        points *= len(values)
+        axes.append((index[name], name, values))
+
+    if points > MAX_SWEEP_POINTS:
+        return None, f'Sweep has {points} points; at most {MAX_SWEEP_POINTS} allowed'
+    return axes, None
+
+
+def sweep_grid(crop_names, score, base, axes, top_k=3, crops=None):
+    """Score base with the axes' features set to every grid combination.
+
+    Returns a dict with:
+      axes       - [{"feature", "values"}]
+      base       - the base input's top_k as [{"crop", "score"}]
+      crops      - crops with curves: those asked for, or every crop in a top_k somewhere
+      scores     - {crop: grid of scores in percent}, nested in axis order
+      top_crops  - grid of each point's top_k crop names
+      changes    - every step along an axis where the top crop changes
+    """
+    shape = tuple(len(values) for _, _, values in axes)
+    n_points = int(np.prod(shape))
+    X = np.empty((n_points + 1, len(base)), dtype=np.float64)
+    X[:] = base
+    mesh = np.meshgrid(*[values for _, _, values in axes], indexing='ij')
+    for (column, _, _), grid in zip(axes, mesh):
+        X[:n_points, column] = grid.ravel()
+
+    scores = np.atleast_2d(score(X))
+    top_k = max(1, min(top_k, len(crop_names)))
+    # Stable, so ties go to catalog order as in predict_crop
+    ranked = np.argsort(-scores, axis=1, kind='stable')[:, :top_k]
+    base_ranked, ranked = ranked[-1], ranked[:-1]
+
+    if crops:
+        shown = [crop_names.index(crop) for crop in crops]
+    else:
+        shown = np.unique(ranked).tolist()
+    names = np.asarray(crop_names, dtype=object)
+    percent = np.round(scores[:n_points] * 100, 2)
+
+    return {
+        'axes': [{'feature': name, 'values': np.round(values, 6).tolist()} for _, name, values in axes],
+        'points': n_points,
+        'base': [{'crop': crop_names[i], 'score': round(float(scores[-1, i]) * 100, 2)}
+                 for i in base_ranked.tolist()],
+        'crops': [crop_names[i] for i in shown],
+        'scores': {crop_names[i]: percent[:, i].reshape(shape).tolist() for i in shown},
+        'top_crops': names[ranked].reshape(shape + (top_k,)).tolist(),
+        'changes': _top_changes(ranked[:, 0].reshape(shape), axes, crop_names)
+    }
+
+
+def _top_changes(top, axes, crop_names):
+    """Steps between neighbouring grid points along one axis where the top crop differs"""
+    changes = []
+    for a, (_, name, values) in enumerate(axes):
+        if top.shape[a] < 2:
+            continue
+        before = np.take(top, range(top.shape[a] - 1), axis=a)
+        after = np.take(top, range(1, top.shape[a]), axis=a)
+        for position in np.argwhere(before != after).tolist():
+            change = {
+                'feature': name,
+                'from_value': round(float(values[position[a]]), 6),
+                'to_value': round(float(values[position[a] + 1]), 6),
+                'from': crop_names[before[tuple(position)]],
+                'to': crop_names[after[tuple(position)]]
+            }
+            others = {other: round(float(axes[b][2][position[b]]), 6)
+                      for b, (_, other, _) in enumerate(axes) if b != a}
+            if others:
+                change['at'] = others
+            changes.append(change)
+    return changes
@@ -0,0 +1,8 @@
+"""WSGI entry point for the Flask app, e.g. gunicorn wsgi:app
+
+app.py itself creates no app at import time, so importing it (as
+app_simple.py and app_ml.py do) never builds a second model service.
+"""
+from app import create_app
+
+app = create_app()
@@ -77,24 +77,31 @@ const CropDashboard = ({ onBack }) => {
   const generateSmartAlerts = async () => {
     const alerts = [];
     
-    // Check each crop for potential issues
-    for (const crop of crops) {
-      if (crop.soilData) {
-        try {
-          // Get ML recommendation for this crop's soil data
-          const response = await fetch('/api/predict', {
-            method: 'POST',
-            headers: {
-              'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(crop.soilData)
-          });
-          
-          const data = await response.json();
-          
-          if (data.success) {
-            const recommendedCrop = data.prediction.recommended_crop;
-            const confidence = data.prediction.top_predictions[0]?.probability || 0;
+    // Check all crops for potential issues with a single batch request
+    const cropsWithSoil = crops.filter(crop => crop.soilData);
+    if (cropsWithSoil.length > 0) {
+      try {
+        // Get ML recommendations for every crop's soil data
+        const response = await fetch('/api/predict/batch', {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify({ items: cropsWithSoil.map(crop => crop.soilData) })
+        });
+        
+        const data = await response.json();
+        
+        if (data.success) {
+          data.results.forEach((result, index) => {
+            const crop = cropsWithSoil[index];
+            if (!result.success) {
+              console.error('Error generating alert for crop:', crop.name, result.error);
+              return;
+            }
+            
+            const recommendedCrop = result.prediction.recommended_crop;
+            const confidence = result.prediction.top_predictions[0]?.probability || 0;
             
             // Check if current crop matches recommendation
             if (recommendedCrop.toLowerCase() !== crop.name.toLowerCase()) {
@@ -116,10 +123,10 @@ const CropDashboard = ({ onBack }) => {
                 priority: 'medium'
               });
             }
-          }
-        } catch (error) {
-          console.error('Error generating alert for crop:', crop.name, error);
+          });
         }
+      } catch (error) {
+        console.error('Error generating crop alerts:', error);
       }
     }
     